@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Synthetic layer profiles and segment schedules for the benchmarks.
+
+The profiles mimic the shape of real networks: memory is the size of the
+parameters (float32), output size the size of the activations (float32), and
+runtime (ms) grows with the multiply-accumulate operations of the layer.
+"""
+
+import numpy as np
+
+from typing import Callable, Dict, Tuple
+
+import src.data_structures as ds
+
+# Bytes of a float32.
+FLOAT_BYTES = 4
+# Multiply-accumulate operations executed per millisecond by the device.
+MACS_PER_MS = 50_000_000
+
+
+def _table(
+    params: np.ndarray, activations: np.ndarray, macs: np.ndarray
+) -> ds.LayerTable:
+    """Builds the table of layers from parameters, activations, and MACs counts."""
+    return ds.LayerTable.from_columns(
+        memory=params.astype(np.int64) * FLOAT_BYTES,
+        n_params=params.astype(np.int64),
+        runtime=np.maximum(1, np.ceil(macs / MACS_PER_MS)).astype(np.int64),
+        output_size=activations.astype(np.int64) * FLOAT_BYTES,
+    )
+
+
+def resnet_like(num_layers: int, rng: np.random.Generator) -> ds.LayerTable:
+    """A ResNet-like profile: four stages of 3x3 convolutions, each halving the
+    resolution and doubling the channels, i.e., the activations shrink and the
+    parameters grow stage after stage."""
+    stage = np.minimum(np.arange(num_layers) * 4 // max(num_layers, 1), 3)
+    channels = 64 * 2**stage
+    side = 56 // 2**stage
+    # Every third layer is a 1x1 (bottleneck) convolution.
+    kernel = np.where(np.arange(num_layers) % 3 == 2, 1, 9)
+    params = kernel * channels * channels * rng.uniform(0.8, 1.2, num_layers)
+    activations = side * side * channels
+    macs = params * side * side
+    return _table(params, activations, macs)
+
+
+def mobilenet_like(num_layers: int, rng: np.random.Generator) -> ds.LayerTable:
+    """A MobileNetV2-like profile: inverted residual blocks of expansion (1x1),
+    depthwise (3x3), and projection (1x1) convolutions, i.e., the activations
+    alternate between wide (expanded) and narrow ones."""
+    position = np.arange(num_layers)
+    stage = np.minimum(position * 5 // max(num_layers, 1), 4)
+    channels = 16 * 2**stage
+    side = 112 // 2**stage
+    expanded = 6 * channels
+    role = position % 3
+    params = np.select(
+        [role == 0, role == 1],
+        [channels * expanded, 9 * expanded],
+        expanded * channels,
+    ) * rng.uniform(0.8, 1.2, num_layers)
+    activations = np.where(role == 2, channels, expanded) * side * side
+    macs = params * side * side
+    return _table(params, activations, macs)
+
+
+def transformer_like(num_layers: int, rng: np.random.Generator) -> ds.LayerTable:
+    """A transformer-like profile: blocks of attention, MLP expansion, and MLP
+    projection layers (4 d^2 parameters each) over a constant number of tokens,
+    where the expansion produces a 4x wider output."""
+    d_model, tokens = 768, 197
+    role = np.arange(num_layers) % 3
+    params = 4 * d_model * d_model * rng.uniform(0.95, 1.05, num_layers)
+    activations = np.where(role == 1, 4 * d_model, d_model) * tokens
+    # The attention also multiplies the tokens with each other.
+    macs = params * tokens + np.where(role == 0, 2 * tokens * tokens * d_model, 0)
+    return _table(params, activations, macs)
+
+
+# The generators of the profiles, by network family.
+NETWORKS: Dict[str, Callable[[int, np.random.Generator], ds.LayerTable]] = {
+    "resnet": resnet_like,
+    "mobilenet": mobilenet_like,
+    "transformer": transformer_like,
+}
+
+
+def _fits(prefix: np.ndarray, capacity: np.ndarray) -> bool:
+    """Checks if the layers fit in the segments, by filling each segment with as
+    many layers as possible, in order (which is optimal for feasibility).
+    Args:
+        prefix (np.ndarray): The (2 x L + 1) prefix sums of memory and runtime.
+        capacity (np.ndarray): The (2 x S) memory and time of the segments.
+    """
+    start = 0
+    for memory, time in capacity.T:
+        start = (
+            min(
+                np.searchsorted(prefix[0], prefix[0, start] + memory, side="right"),
+                np.searchsorted(prefix[1], prefix[1, start] + time, side="right"),
+            )
+            - 1
+        )
+        if start == prefix.shape[1] - 1:
+            return True
+    return False
+
+
+def segment_schedule(
+    layers: ds.LayerTable,
+    rng: np.random.Generator,
+    kind: str = "uniform",
+    slack: float = 1.5,
+    layers_per_segment: int = 8,
+) -> ds.SegmentTable:
+    """Generates the execution segments for a profile.
+
+    The relative sizes of the segments follow the schedule, and are scaled to
+    `slack` times the smallest scale at which all the layers fit. Each segment
+    fits at least the largest layer.
+
+    Args:
+        layers (ds.LayerTable): The profile the segments are generated for.
+        rng (np.random.Generator): The source of randomness.
+        kind (str): "uniform" (identical segments), "periodic" (a repeating
+            pattern of large and small segments), or "random".
+        slack (float): The ratio between the capacity and the needed one.
+        layers_per_segment (int): The average number of layers of a segment.
+    Returns:
+        ds.SegmentTable: The segments.
+    """
+    num_segments = max(1, int(np.ceil(len(layers) / layers_per_segment)))
+    if kind == "uniform":
+        weights = np.ones(num_segments)
+    elif kind == "periodic":
+        weights = np.resize([2.0, 1.0, 1.0, 0.5], num_segments)
+    elif kind == "random":
+        weights = rng.uniform(0.5, 1.5, num_segments)
+    else:
+        raise ValueError(f"Unknown schedule '{kind}'.")
+    prefix = np.stack([layers.prefix("memory"), layers.prefix("runtime")])
+    total = prefix[:, -1:].astype(np.float64)
+    largest = np.array(
+        [[layers.column("memory").max()], [layers.column("runtime").max()]]
+    )
+
+    def capacity(scale: float) -> np.ndarray:
+        return np.maximum(np.ceil(scale * total * weights / weights.sum()), largest)
+
+    # Bisect the scale, with all the layers fitting in the sole largest segment
+    # at the upper end.
+    low, high = 0.0, weights.sum() / weights.max()
+    for _ in range(32):
+        middle = (low + high) / 2
+        low, high = (low, middle) if _fits(prefix, capacity(middle)) else (middle, high)
+    avail_memory, avail_time = capacity(slack * high).astype(np.int64)
+    return ds.SegmentTable.from_columns(
+        avail_memory=avail_memory, avail_time=avail_time
+    )
+
+
+def instance(
+    network: str,
+    num_layers: int,
+    seed: int = 0,
+    schedule: str = "uniform",
+    slack: float = 1.5,
+    layers_per_segment: int = 8,
+) -> Tuple[ds.LayerTable, ds.SegmentTable]:
+    """Generates a benchmark instance.
+    Args:
+        network (str): The family of the profile, one of `NETWORKS`.
+        num_layers (int): The number of layers.
+        seed (int): The seed of the generator.
+        schedule (str): The kind of segment schedule, see `segment_schedule`.
+        slack (float): The ratio between the capacity and the demand.
+        layers_per_segment (int): The average number of layers of a segment.
+    Returns:
+        Tuple[ds.LayerTable, ds.SegmentTable]: The layers and the segments.
+    """
+    rng = np.random.default_rng(seed)
+    layers = NETWORKS[network](num_layers, rng)
+    return layers, segment_schedule(layers, rng, schedule, slack, layers_per_segment)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Guards the import time of the modules against regressions.
+
+Each module is imported in a fresh interpreter, which checks that none of the
+heavy dependencies (OR-Tools, matplotlib, pandas) is imported along with it,
+and reports the import time. Run it from the root of the repository:
+    python -m benchmarks.import_time --budget 300
+which exits with an error if a module imports a heavy dependency, or takes
+longer than the budget (ms, the best of --repeat runs).
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+from typing import Dict, List, Tuple
+
+# The modules which must import with the standard library and NumPy only.
+MODULES: List[str] = [
+    "src.data_structures",
+    "src.graph",
+    "src.presolve",
+    "src.quantize",
+    "src.dp_solver",
+    "src.greedy",
+    "src.validation",
+    "src.simulator",
+    "src.tenants",
+    "src.profiles",
+    "src.optimizer",
+    "src.cache",
+    "src.batch",
+    "src.portfolio",
+    "src.pareto",
+    "src.plot_support",
+    "src.server",
+]
+
+# The dependencies loaded on first use only.
+HEAVY: Tuple[str, ...] = ("ortools", "matplotlib", "pandas")
+
+# Run in the fresh interpreter: imports the module, and reports the time taken
+# and the heavy dependencies imported along with it.
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import numpy
+numpy_time = time.perf_counter() - start
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps(dict(numpy=numpy_time, module=elapsed, heavy=heavy)))
+"""
+
+
+def probe(module: str) -> Dict:
+    """Imports a module in a fresh interpreter, see `PROBE`."""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=None,
+        help="The maximum import time of a module (ms), NumPy excluded.",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':>20} {'numpy [ms]':>10} {'module [ms]':>11}  heavy")
+    for module in args.modules:
+        runs = [probe(module) for _ in range(args.repeat)]
+        best = min(runs, key=lambda run: run["module"])
+        heavy = sorted(set(name for run in runs for name in run["heavy"]))
+        print(
+            f"{module:>20} {best['numpy'] * 1000:10.1f} {best['module'] * 1000:11.1f}"
+            f"  {', '.join(heavy) or '-'}"
+        )
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)}")
+        if args.budget is not None and best["module"] * 1000 > args.budget:
+            failures.append(
+                f"{module} takes {best['module'] * 1000:.1f} ms, over {args.budget} ms"
+            )
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Compares the "element" and "linear" encodings of the output size objective.
+
+Run it from the root of the repository:
+    python -m benchmarks.output_encoding --layers 40 --segments 10 --instances 5
+"""
+
+import argparse
+import random
+import time
+
+from typing import List, Tuple
+
+import src.data_structures as ds
+import src.optimizer as optimizer
+
+
+def random_instance(
+    rng: random.Random, num_layers: int, num_segments: int
+) -> Tuple[List[ds.Layer], List[ds.Segment]]:
+    """Generates a random instance, with enough capacity to be feasible."""
+    layers = [
+        ds.Layer(l, rng.randint(1, 100), rng.randint(1, 10), rng.randint(1, 1000))
+        for l in range(num_layers)
+    ]
+    # Give the segments, on average, twice the capacity needed.
+    total_memory = sum(layer.memory for layer in layers)
+    total_time = sum(layer.runtime for layer in layers)
+    mean_memory = 2 * total_memory // num_segments
+    mean_time = 2 * total_time // num_segments
+    segments = [
+        ds.Segment(
+            s,
+            rng.randint(mean_memory // 2, 3 * mean_memory // 2),
+            rng.randint(mean_time // 2, 3 * mean_time // 2),
+        )
+        for s in range(num_segments)
+    ]
+    return layers, segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--layers", type=int, default=40)
+    parser.add_argument("--segments", type=int, default=10)
+    parser.add_argument("--instances", type=int, default=5)
+    parser.add_argument("--ordering", default="linear", choices=optimizer.ORDERINGS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    totals = {encoding: 0.0 for encoding in optimizer.OUTPUT_ENCODINGS}
+    print(f"{'instance':>8} {'encoding':>8} {'objective':>10} {'time [s]':>9}")
+    for instance in range(args.instances):
+        layers, segments = random_instance(rng, args.layers, args.segments)
+        objectives = set()
+        for encoding in optimizer.OUTPUT_ENCODINGS:
+            start = time.perf_counter()
+            result = optimizer.minimize_output_size(
+                layers,
+                segments,
+                ordering=args.ordering,
+                config=optimizer.SolverConfig(random_seed=args.seed),
+                return_result=True,
+                output_encoding=encoding,
+            )
+            elapsed = time.perf_counter() - start
+            totals[encoding] += elapsed
+            objectives.add(result.objective)
+            print(
+                f"{instance:8d} {encoding:>8} {result.objective:10.0f} {elapsed:9.3f}"
+            )
+        # Both encodings must agree on the optimal objective.
+        assert len(objectives) == 1, f"Objectives differ: {objectives}"
+    print()
+    for encoding, total in totals.items():
+        print(f"{encoding:>8}: {total:.3f} s in total")
+    print(f" speedup: {totals['element'] / max(totals['linear'], 1e-9):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
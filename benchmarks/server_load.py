@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Load-tests the planning server with concurrent clients.
+
+Run it from the root of the repository, against a server started in-process:
+    python -m benchmarks.server_load --requests 200 --concurrency 32 --distinct 8
+or against a running one, with --host/--port or --unix.
+"""
+
+import argparse
+import asyncio
+import collections
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.generators import NETWORKS, instance
+from src.server import PlanningClient, PlanningServer
+
+
+async def _client(
+    args: argparse.Namespace, connect, problems, queue: asyncio.Queue, results
+) -> None:
+    """Sends the requests taken from the queue, one at a time."""
+    client = await connect()
+    try:
+        while True:
+            try:
+                index = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            layers, segments = problems[index % len(problems)]
+            start = time.perf_counter()
+            response = await client.plan(
+                layers,
+                segments,
+                engine=args.engine,
+                deadline=args.deadline,
+                time_limit=args.time_limit,
+            )
+            results.append((response["status"], time.perf_counter() - start))
+    finally:
+        await client.close()
+
+
+async def run(args: argparse.Namespace) -> None:
+    problems = [
+        instance(args.network, args.layers, seed)
+        for seed in range(args.seed, args.seed + args.distinct)
+    ]
+    server, socket_dir = None, None
+    if args.port is None and args.unix is None:
+        server = PlanningServer(workers=args.workers, max_pending=args.max_pending)
+        socket_dir = tempfile.mkdtemp()
+        args.unix = await server.start_unix(os.path.join(socket_dir, "planner.sock"))
+    if args.unix is not None:
+        connect = lambda: PlanningClient.connect_unix(args.unix)
+    else:
+        connect = lambda: PlanningClient.connect_tcp(args.host, args.port)
+
+    queue = asyncio.Queue()
+    for index in range(args.requests):
+        queue.put_nowait(index)
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _client(args, connect, problems, queue, results)
+            for _ in range(args.concurrency)
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    latency = np.array([latency for _, latency in results])
+    print(f"{len(results)} requests in {elapsed:.3f} s")
+    print(f"throughput: {len(results) / max(elapsed, 1e-9):.1f} requests/s")
+    for status, count in sorted(collections.Counter(s for s, _ in results).items()):
+        print(f"{status:>10}: {count}")
+    for q in (50, 95, 99):
+        print(f"latency p{q}: {np.percentile(latency, q) * 1000:.1f} ms")
+    client = await connect()
+    print("server metrics:")
+    for name, value in (await client.metrics()).items():
+        print(f"    {name}: {value}")
+    await client.close()
+    if server is not None:
+        await server.close()
+        os.unlink(args.unix)
+        os.rmdir(socket_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--network", default="resnet", choices=list(NETWORKS))
+    parser.add_argument("--layers", type=int, default=50)
+    parser.add_argument(
+        "--distinct", type=int, default=4, help="Distinct problems, cycled over."
+    )
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--engine", default="dp", choices=["cp_sat", "dp"])
+    parser.add_argument("--deadline", type=float, help="Seconds per request.")
+    parser.add_argument("--time-limit", type=float, help="CP-SAT time limit.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="The port of a running server.")
+    parser.add_argument("--unix", help="The socket of a running server.")
+    parser.add_argument(
+        "--workers", type=int, help="Concurrent solves of the in-process server."
+    )
+    parser.add_argument(
+        "--max-pending", type=int, default=64, help="Of the in-process server."
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
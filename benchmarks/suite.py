@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Times model building, solving, and extraction of the CP-SAT optimizer, and the
+dynamic program of `src.dp_solver`.
+
+Run it from the root of the repository:
+    python -m benchmarks.suite --sizes 10 50 200 1000 5000 --output results.json
+    python -m benchmarks.suite --engines dp --sizes 1000 5000 20000
+and compare two runs (e.g., of two versions) with:
+    python -m benchmarks.suite --sizes 10 50 200 --baseline results.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+
+from typing import Any, Dict, List
+
+import numpy as np
+import ortools
+
+import src.data_structures as ds
+import src.dp_solver as dp_solver
+import src.optimizer as optimizer
+
+from benchmarks.generators import NETWORKS, instance
+
+# Bump it when the layout of the results changes.
+RESULTS_VERSION = 1
+
+
+def _revision() -> str:
+    """Returns the git commit of the repository, if any."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_case(
+    layers: ds.LayerTable,
+    segments: ds.SegmentTable,
+    objective: str,
+    config: optimizer.SolverConfig,
+    **options: Any,
+) -> Dict[str, Any]:
+    """Builds and solves a single case.
+
+    The build time covers the presolve, the model and the objective. The solve
+    time is the wall time of the CP-SAT search, and the extraction time the one
+    spent reading the solution, see `optimizer.SolveStats`.
+
+    Returns:
+        Dict[str, Any]: The timings (seconds), the size of the model, and the result.
+    """
+    # The import of OR-Tools (by the first case) is not part of the build.
+    optimizer.cp_model.load()
+    start = time.perf_counter()
+    model = optimizer.LoScModel(layers, segments, **options)
+    model.set_objective(objective)
+    build = time.perf_counter() - start
+    proto = model.model.Proto()
+    record = dict(
+        variables=len(proto.variables),
+        constraints=len(proto.constraints),
+        build_time=build,
+    )
+    start = time.perf_counter()
+    try:
+        result = model.solve(config)
+    except ds.NoSolutionError as error:
+        return dict(record, status=error.status, solve_time=time.perf_counter() - start)
+    stats = result.stats
+    return dict(
+        record,
+        status=result.status,
+        value=result.objective,
+        bound=result.bound,
+        gap=result.gap,
+        solve_time=stats.solve_time,
+        presolve_time=stats.presolve_time,
+        extract_time=stats.extract_time,
+        num_branches=stats.num_branches,
+        num_conflicts=stats.num_conflicts,
+        peak_rss=stats.peak_rss,
+        constraints_by_family=stats.constraints,
+        num_segments=len(result.allocations),
+    )
+
+
+def run_dp_case(
+    layers: ds.LayerTable, segments: ds.SegmentTable, objective: str
+) -> Dict[str, Any]:
+    """Solves a single case with the dynamic program, whose whole time is the
+    solve time (it neither builds a model, nor extracts a solution).
+
+    Returns:
+        Dict[str, Any]: The timings (seconds), and the result.
+    """
+    start = time.perf_counter()
+    try:
+        allocations = dp_solver.solve_dp(layers, segments, objective)
+    except ds.NoSolutionError:
+        return dict(
+            status="INFEASIBLE", build_time=0.0, solve_time=time.perf_counter() - start
+        )
+    solve = time.perf_counter() - start
+    if objective == "knapsack":
+        value = len(allocations)
+    else:
+        value = sum(allocation.get_output_size() for allocation in allocations)
+    return dict(
+        status="OPTIMAL",
+        value=value,
+        build_time=0.0,
+        solve_time=solve,
+        extract_time=0.0,
+        num_segments=len(allocations),
+    )
+
+
+def _case_key(result: Dict[str, Any]) -> tuple:
+    return (
+        result.get("engine", "cp_sat"),
+        result["network"],
+        result["layers"],
+        result["segments"],
+        result["schedule"],
+        result["objective"],
+    )
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any]) -> None:
+    """Prints the ratio between the times of the results and of a baseline run."""
+    previous = {_case_key(r): r for r in baseline["results"]}
+    print(f"\nCompared to {baseline.get('revision') or 'the baseline'}:")
+    for result in results:
+        old = previous.get(_case_key(result))
+        if old is None or "extract_time" not in old or "extract_time" not in result:
+            continue
+        ratios = [
+            result[t] / max(old[t], 1e-9)
+            for t in ("build_time", "solve_time", "extract_time")
+        ]
+        changed = (
+            "" if old.get("value") == result.get("value") else " (objective changed)"
+        )
+        print(
+            f"{'/'.join(map(str, _case_key(result))):>40} "
+            f"build {ratios[0]:5.2f}x solve {ratios[1]:5.2f}x extract {ratios[2]:5.2f}x{changed}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--networks", nargs="+", default=list(NETWORKS), choices=list(NETWORKS)
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 50, 200])
+    parser.add_argument(
+        "--schedules",
+        nargs="+",
+        default=["uniform"],
+        choices=["uniform", "periodic", "random"],
+    )
+    parser.add_argument(
+        "--objectives",
+        nargs="+",
+        default=list(optimizer.OBJECTIVES),
+        choices=optimizer.OBJECTIVES,
+    )
+    parser.add_argument(
+        "--engines", nargs="+", default=["cp_sat"], choices=["cp_sat", "dp"]
+    )
+    parser.add_argument("--ordering", default="linear", choices=optimizer.ORDERINGS)
+    parser.add_argument(
+        "--output-encoding", default="linear", choices=optimizer.OUTPUT_ENCODINGS
+    )
+    parser.add_argument("--slack", type=float, default=1.5)
+    parser.add_argument("--layers-per-segment", type=int, default=8)
+    parser.add_argument("--time-limit", type=float, default=60.0)
+    parser.add_argument("--workers", type=int, default=0, help="CP-SAT search threads.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Where to write the results (JSON).")
+    parser.add_argument(
+        "--baseline", help="Results (JSON) of a previous run to compare with."
+    )
+    args = parser.parse_args()
+
+    config = optimizer.SolverConfig(
+        num_workers=args.workers,
+        time_limit=args.time_limit,
+        random_seed=args.seed,
+        time_presolve=True,
+    )
+    results = []
+    print(
+        f"{'engine':>6} {'network':>11} {'layers':>6} {'schedule':>8} {'objective':>11} {'status':>10} "
+        f"{'build [s]':>9} {'solve [s]':>9} {'extract [s]':>11}"
+    )
+    for network in args.networks:
+        for size in args.sizes:
+            for schedule in args.schedules:
+                layers, segments = instance(
+                    network,
+                    size,
+                    args.seed,
+                    schedule,
+                    args.slack,
+                    args.layers_per_segment,
+                )
+                for engine in args.engines:
+                    for objective in args.objectives:
+                        if engine == "dp":
+                            result = run_dp_case(layers, segments, objective)
+                        else:
+                            result = run_case(
+                                layers,
+                                segments,
+                                objective,
+                                config,
+                                ordering=args.ordering,
+                                output_encoding=args.output_encoding,
+                            )
+                        result = dict(
+                            engine=engine,
+                            network=network,
+                            layers=size,
+                            segments=len(segments),
+                            schedule=schedule,
+                            objective=objective,
+                            **result,
+                        )
+                        results.append(result)
+                        print(
+                            f"{engine:>6} {network:>11} {size:6d} {schedule:>8} {objective:>11} "
+                            f"{result['status']:>10} {result['build_time']:9.3f} "
+                            f"{result['solve_time']:9.3f} {result.get('extract_time', float('nan')):11.3f}"
+                        )
+
+    report = dict(
+        version=RESULTS_VERSION,
+        revision=_revision(),
+        timestamp=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        platform=platform.platform(),
+        python=platform.python_version(),
+        numpy=np.__version__,
+        ortools=ortools.__version__,
+        arguments=vars(args),
+        results=results,
+    )
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import dataclasses
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator, List
+
+import src.data_structures as ds
+import src.dp_solver as dp_solver
+import src.optimizer as optimizer
+
+# The engines a job can be solved with.
+ENGINES = ("cp_sat", "dp")
+
+# The seconds a job with a deadline keeps, after its CP-SAT search, to read the
+# allocations and return them, see `PlanJob.deadline`.
+DEADLINE_MARGIN = 0.1
+
+
+@dataclass
+class PlanJob:
+    """A single allocation problem of a batch.
+
+    Attributes
+    ----------
+    job_id: Any
+        The identifier of the job, reported back with its result.
+    layers: List[ds.Layer]
+        The list of layers, in execution order.
+    segments: List[ds.Segment]
+        The list of execution segments, in order.
+    objective: str
+        Either "output_size" or "knapsack".
+    engine: str
+        Either "cp_sat" (see `optimizer.LoScModel`) or "dp" (see `dp_solver.solve_dp`).
+    config: optimizer.SolverConfig
+        The parameters of the CP-SAT search, the solution callback (if any) must be
+        picklable.
+    ordering: str
+        The formulation of the ordering constraints of the CP-SAT model.
+    output_encoding: str
+        The encoding of the output size objective of the CP-SAT model.
+    deadline: float
+        The seconds the job has from the start of its solve, model building
+        included, None for none. The CP-SAT search gets what is left after the
+        building (less `DEADLINE_MARGIN`), unless `config` sets a shorter limit.
+    """
+
+    job_id: Any
+    layers: List[ds.Layer]
+    segments: List[ds.Segment]
+    objective: str = "output_size"
+    engine: str = "cp_sat"
+    config: optimizer.SolverConfig = None
+    ordering: str = "linear"
+    output_encoding: str = "linear"
+    deadline: float = None
+
+
+@dataclass
+class JobResult:
+    """The outcome of a job of a batch.
+
+    Attributes
+    ----------
+    job_id: Any
+        The identifier of the job.
+    status: str
+        "OPTIMAL" or "FEASIBLE" on success. "INFEASIBLE" when the job has no
+        solution, "TIMEOUT" when the time limit was reached before finding one,
+        "ERROR" on any other failure.
+    objective: float
+        The objective value of the allocations (None on failure).
+    bound: float
+        The best proven bound of the objective (None on failure).
+    gap: float
+        The relative gap between objective and bound (None on failure).
+    wall_time: float
+        The time spent on the job in seconds, including model building.
+    allocations: List[ds.Allocation]
+        The allocations of the used segments (empty on failure).
+    error: str
+        The description of the failure, if any.
+    """
+
+    job_id: Any
+    status: str
+    objective: float = None
+    bound: float = None
+    gap: float = None
+    wall_time: float = 0.0
+    allocations: List[ds.Allocation] = field(default_factory=list)
+    error: str = None
+
+    @property
+    def ok(self) -> bool:
+        """Returns true if the job produced allocations."""
+        return self.status in ("OPTIMAL", "FEASIBLE")
+
+
+def _objective_value(allocations: List[ds.Allocation], objective: str) -> int:
+    """Computes the value of the given objective on the allocations."""
+    if objective == "knapsack":
+        return len(allocations)
+    return sum(allocation.get_output_size() for allocation in allocations)
+
+
+def solve_job(
+    job: PlanJob, on_model: Callable[[optimizer.LoScModel], None] = None
+) -> JobResult:
+    """Solves a single job, reporting any failure inside the result.
+    Args:
+        job (PlanJob): The job to solve.
+        on_model (Callable[[optimizer.LoScModel], None]): Called with the CP-SAT
+            model once built, e.g., to `stop` its search from another thread.
+    Returns:
+        JobResult: The outcome of the job.
+    """
+    start = time.perf_counter()
+    try:
+        if job.engine == "dp":
+            allocations = dp_solver.solve_dp(job.layers, job.segments, job.objective)
+            value = _objective_value(allocations, job.objective)
+            result = optimizer.SolveResult(
+                "OPTIMAL", value, value, 0.0, 0.0, allocations
+            )
+        elif job.engine == "cp_sat":
+            model = optimizer.LoScModel(
+                job.layers,
+                job.segments,
+                ordering=job.ordering,
+                output_encoding=job.output_encoding,
+            )
+            model.set_objective(job.objective)
+            config = job.config
+            if job.deadline is not None:
+                # The search starts after the building, and stops in time to answer.
+                remaining = (
+                    job.deadline - (time.perf_counter() - start) - DEADLINE_MARGIN
+                )
+                if remaining <= 0:
+                    raise ds.NoSolutionError(
+                        "The deadline passed while building the model.", "UNKNOWN"
+                    )
+                config = config if config is not None else optimizer.SolverConfig()
+                limit = config.time_limit
+                config = dataclasses.replace(
+                    config,
+                    time_limit=remaining if limit is None else min(limit, remaining),
+                )
+            if on_model is not None:
+                on_model(model)
+            result = model.solve(config)
+        else:
+            raise ValueError(
+                f"Unknown engine '{job.engine}', expected one of {ENGINES}."
+            )
+    except ds.NoSolutionError as error:
+        status = "INFEASIBLE" if error.status == "INFEASIBLE" else "TIMEOUT"
+        return JobResult(
+            job.job_id, status, wall_time=time.perf_counter() - start, error=str(error)
+        )
+    except Exception as error:
+        return JobResult(
+            job.job_id,
+            "ERROR",
+            wall_time=time.perf_counter() - start,
+            error=f"{type(error).__name__}: {error}",
+        )
+    return JobResult(
+        job.job_id,
+        result.status,
+        objective=result.objective,
+        bound=result.bound,
+        gap=result.gap,
+        wall_time=time.perf_counter() - start,
+        allocations=result.allocations,
+    )
+
+
+def _size_job(job: PlanJob, threads: int, time_limit: float) -> PlanJob:
+    """Returns a copy of the job, with the search threads and time limit set."""
+    config = job.config if job.config is not None else optimizer.SolverConfig()
+    config = dataclasses.replace(
+        config,
+        num_workers=config.num_workers if config.num_workers else threads,
+        time_limit=config.time_limit if config.time_limit is not None else time_limit,
+    )
+    return dataclasses.replace(job, config=config)
+
+
+def _solve_alone(job: PlanJob) -> JobResult:
+    """Solves a job in a process of its own, thus a crash only fails this job."""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        try:
+            return executor.submit(solve_job, job).result()
+        except BrokenProcessPool as error:
+            return JobResult(
+                job.job_id, "ERROR", error=f"The worker process crashed: {error}"
+            )
+        except Exception as error:
+            return JobResult(
+                job.job_id, "ERROR", error=f"{type(error).__name__}: {error}"
+            )
+
+
+def plan_batch(
+    jobs: Iterable[PlanJob],
+    workers: int = None,
+    time_limit: float = None,
+    cores: int = None,
+) -> Iterator[JobResult]:
+    """Solves a batch of jobs in a pool of processes, yielding the results as soon
+    as they are completed (i.e., not in submission order).
+
+    Each process runs one job at a time, and the CP-SAT search threads of the jobs
+    which do not set `config.num_workers` are sized so that the pool uses about
+    `cores` threads overall. A failure (infeasibility, timeout, error, or even a
+    crash of a worker process) is reported in the result of its job, and never
+    interrupts the rest of the batch: after a crash, the unfinished jobs are
+    solved again, each in a process of its own, see `_solve_alone`.
+
+    Args:
+        jobs (Iterable[PlanJob]): The jobs to solve.
+        workers (int): The number of worker processes, defaults to the cores.
+        time_limit (float): The search time limit (seconds) of the jobs which do
+            not set `config.time_limit`, None for no limit.
+        cores (int): The number of cores to use, defaults to `os.cpu_count()`.
+    Returns:
+        Iterator[JobResult]: The results, in completion order.
+    """
+    jobs = list(jobs)
+    cores = cores or os.cpu_count() or 1
+    workers = max(1, min(workers or cores, len(jobs) or 1))
+    threads = max(1, cores // workers)
+    # The jobs in flight when a worker crashed, see below.
+    crashed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for job in jobs:
+            sized = _size_job(job, threads, time_limit)
+            try:
+                future = executor.submit(solve_job, sized)
+            except BrokenProcessPool:
+                crashed.append(sized)
+                continue
+            except Exception as error:
+                yield JobResult(
+                    job.job_id, "ERROR", error=f"{type(error).__name__}: {error}"
+                )
+                continue
+            futures[future] = sized
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                crashed.append(job)
+            except Exception as error:
+                # The job could not be sent to, or returned from, its worker.
+                yield JobResult(
+                    job.job_id, "ERROR", error=f"{type(error).__name__}: {error}"
+                )
+    if crashed:
+        # A crash breaks the pool, failing all its unfinished jobs, without telling
+        # which one crashed. Thus, each of them is solved again in a process of its
+        # own (`workers` at a time), and only the one crashing again fails.
+        with ThreadPoolExecutor(max_workers=workers) as runner:
+            for future in as_completed(
+                [runner.submit(_solve_alone, job) for job in crashed]
+            ):
+                yield future.result()
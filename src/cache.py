@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import dataclasses
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+import src.data_structures as ds
+import src.optimizer as optimizer
+
+# Bump it when the layout of the keys or of the stored values changes.
+CACHE_VERSION = 4
+
+# The number of in-process hits whose access time is written to the database at
+# once, see `SolutionCache.get`.
+TOUCH_BATCH = 64
+
+
+def _canonical(value: Any) -> Any:
+    """Converts the options JSON does not serialize, e.g., the NumPy scalars or
+    a `quantize.Quantization`. The NumPy floats are kept as floats (exactly)."""
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    if isinstance(value, (np.integer, np.bool_)):
+        return value.item()
+    if isinstance(value, np.floating):
+        return float(value)
+    raise TypeError(f"Cannot hash the option {value!r} of type {type(value).__name__}.")
+
+
+def canonical_key(
+    layers: List[ds.Layer],
+    segments: List[ds.Segment],
+    objective: str,
+    config: optimizer.SolverConfig = None,
+    **options: Any,
+) -> str:
+    """Computes the content hash identifying an allocation problem.
+
+    The identifiers of layers and segments are not part of the key, since they do
+    not change the solution. The solution callback of the config is ignored. The
+    columns of layers and segments, and the skip edges (sorted, without
+    duplicates), are hashed as int64 bytes, the rest as JSON.
+
+    Args:
+        layers (List[ds.Layer]): The list of layers, in execution order.
+        segments (List[ds.Segment]): The list of execution segments, in order.
+        objective (str): The objective we are minimizing.
+        config (optimizer.SolverConfig): The parameters of the search.
+        options (Any): Any other (JSON serializable) option of the solve.
+    Returns:
+        str: The hexadecimal SHA-256 of the canonical form of the problem.
+    """
+    config = config if config is not None else optimizer.SolverConfig()
+    edges = options.pop("edges", None)
+    if edges is not None:
+        # The solution only depends on the set of edges.
+        edges = np.unique(np.asarray(edges, dtype=np.int64).reshape(-1, 2), axis=0)
+    content = {
+        "version": CACHE_VERSION,
+        "sizes": [len(layers), len(segments), None if edges is None else len(edges)],
+        "objective": objective,
+        "config": [
+            config.num_workers,
+            config.time_limit,
+            config.relative_gap,
+            config.random_seed,
+        ],
+        "options": options,
+    }
+    encoded = json.dumps(
+        content, sort_keys=True, separators=(",", ":"), default=_canonical
+    )
+    digest = hashlib.sha256(encoded.encode("utf-8"))
+    for rows, names in (
+        (layers, ("memory", "runtime", "output_size")),
+        (segments, ("avail_memory", "avail_time")),
+    ):
+        for name in names:
+            digest.update(np.ascontiguousarray(ds.column(rows, name)).tobytes())
+    if edges is not None:
+        digest.update(edges.tobytes())
+    return digest.hexdigest()
+
+
+def _encode(result: optimizer.SolveResult, segments: List[ds.Segment]) -> str:
+    """Serializes a result as its stats and the (segment, start, end) of each
+    allocation, i.e., without copying layers and segments."""
+    position = {id(segment): s for s, segment in enumerate(segments)}
+    by_id = {segment.id: s for s, segment in enumerate(segments)}
+    blocks, start = [], 0
+    for allocation in result.allocations:
+        s = position.get(id(allocation.segment), by_id.get(allocation.segment.id))
+        blocks.append([s, start, start + len(allocation.layers)])
+        start += len(allocation.layers)
+    return json.dumps(
+        {
+            "status": result.status,
+            "objective": result.objective,
+            "bound": result.bound,
+            "gap": result.gap,
+            "wall_time": result.wall_time,
+            "error_bound": result.error_bound,
+            "stats": dataclasses.asdict(result.stats) if result.stats else None,
+            "blocks": blocks,
+        },
+        separators=(",", ":"),
+    )
+
+
+def _decode(
+    value: Dict[str, Any], layers: List[ds.Layer], segments: List[ds.Segment]
+) -> optimizer.SolveResult:
+    """Rebuilds a result, referencing the given layers and segments."""
+    allocations = [
+        ds.Allocation(segments[s], layers[start:end])
+        for s, start, end in value["blocks"]
+    ]
+    stats = value["stats"]
+    if stats is not None:
+        stats = optimizer.SolveStats(**stats)
+        stats.progress = [tuple(improvement) for improvement in stats.progress]
+    return optimizer.SolveResult(
+        value["status"],
+        value["objective"],
+        value["bound"],
+        value["gap"],
+        value["wall_time"],
+        allocations,
+        stats,
+        value["error_bound"],
+    )
+
+
+class SolutionCache:
+    def __init__(
+        self,
+        path: str = ":memory:",
+        max_entries: int = 100000,
+        max_bytes: int = None,
+        memory_entries: int = 1024,
+    ):
+        """Initialize the two-tier cache of solutions.
+
+        The first tier is an in-process LRU dictionary, the second one is an
+        SQLite database, evicted by least recent use when it holds more than
+        `max_entries` entries, or more than `max_bytes` bytes of values. The
+        hits of the first tier count as uses of the second one. Only proven
+        optimal results are stored, see `put`.
+
+        Args:
+            path           : The path of the SQLite database (":memory:" for none).
+            max_entries    : The maximum number of entries of the database.
+            max_bytes      : The maximum size of the stored values (None for no limit).
+            memory_entries : The maximum number of entries of the in-process tier.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits, self.misses = 0, 0
+        self.lock = threading.Lock()
+        # The access times of the in-process hits, not yet written to the database.
+        self._touched: Dict[str, float] = {}
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS solutions ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS solutions_last_access"
+            " ON solutions (last_access)"
+        )
+        self.connection.commit()
+
+    def _remember(self, key: str, value: Dict[str, Any]) -> None:
+        """Stores a value in the in-process tier, evicting the least recent one."""
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _flush_touches(self) -> None:
+        """Writes the access times of the in-process hits to the database."""
+        if self._touched:
+            self.connection.executemany(
+                "UPDATE solutions SET last_access = ? WHERE key = ?",
+                [(last_access, key) for key, last_access in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def get(
+        self, key: str, layers: List[ds.Layer], segments: List[ds.Segment]
+    ) -> Optional[optimizer.SolveResult]:
+        """Looks up a solution.
+        Args:
+            key (str): The key of the problem, see `canonical_key`.
+            layers (List[ds.Layer]): The layers the allocations will reference.
+            segments (List[ds.Segment]): The segments the allocations will reference.
+        Returns:
+            Optional[optimizer.SolveResult]: The cached result, or None.
+        """
+        with self.lock:
+            value = self.memory.get(key)
+            if value is not None:
+                self.memory.move_to_end(key)
+                # The database is updated in batches, and before any eviction.
+                self._touched[key] = time.time()
+                if len(self._touched) >= TOUCH_BATCH:
+                    self._flush_touches()
+                    self.connection.commit()
+            else:
+                row = self.connection.execute(
+                    "SELECT value FROM solutions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                value = json.loads(row[0])
+                self._touched.pop(key, None)
+                self.connection.execute(
+                    "UPDATE solutions SET last_access = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+                self.connection.commit()
+                self._remember(key, value)
+            self.hits += 1
+        return _decode(value, layers, segments)
+
+    def put(
+        self, key: str, result: optimizer.SolveResult, segments: List[ds.Segment]
+    ) -> None:
+        """Stores a solution, evicting the least recently used ones if needed.
+
+        A result which is not proven optimal (e.g., when the time limit of the
+        search was reached) is not stored, since another search may improve it.
+
+        Args:
+            key (str): The key of the problem, see `canonical_key`.
+            result (optimizer.SolveResult): The result of the solve.
+            segments (List[ds.Segment]): The segments of the problem.
+        """
+        if result.status != "OPTIMAL":
+            return
+        encoded = _encode(result, segments)
+        with self.lock:
+            self._remember(key, json.loads(encoded))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)",
+                (key, encoded, len(encoded), time.time()),
+            )
+            self._flush_touches()
+            self._evict()
+            self.connection.commit()
+
+    def _evict(self) -> None:
+        """Removes the least recently used entries exceeding the limits."""
+        count, size = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM solutions"
+        ).fetchone()
+        excess = max(0, count - self.max_entries)
+        if excess:
+            self.connection.execute(
+                "DELETE FROM solutions WHERE key IN ("
+                " SELECT key FROM solutions ORDER BY last_access LIMIT ?)",
+                (excess,),
+            )
+            size = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM solutions"
+            ).fetchone()[0]
+        if self.max_bytes is not None and size > self.max_bytes:
+            rows = self.connection.execute(
+                "SELECT key, size FROM solutions ORDER BY last_access"
+            )
+            evicted = []
+            for key, entry_size in rows:
+                if size <= self.max_bytes:
+                    break
+                evicted.append((key,))
+                size -= entry_size
+            self.connection.executemany("DELETE FROM solutions WHERE key = ?", evicted)
+
+    def clear(self) -> None:
+        """Removes all the entries of both tiers."""
+        with self.lock:
+            self.memory.clear()
+            self._touched.clear()
+            self.connection.execute("DELETE FROM solutions")
+            self.connection.commit()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[
+                0
+            ]
+
+    def close(self) -> None:
+        """Writes the pending access times, and closes the database."""
+        with self.lock:
+            self._flush_touches()
+            self.connection.commit()
+            self.connection.close()
+
+    def solve(
+        self,
+        layers: List[ds.Layer],
+        segments: List[ds.Segment],
+        objective: str = "output_size",
+        config: optimizer.SolverConfig = None,
+        **options: Any,
+    ) -> optimizer.SolveResult:
+        """Solves the problem with a `optimizer.LoScModel`, unless cached. Only
+        the optimal results are cached, see `put`.
+        Args:
+            layers (List[ds.Layer]): The list of layers, in execution order.
+            segments (List[ds.Segment]): The list of execution segments, in order.
+            objective (str): The objective we are minimizing.
+            config (optimizer.SolverConfig): The parameters of the search.
+            options (Any): The options of the `optimizer.LoScModel`.
+        Returns:
+            optimizer.SolveResult: The (possibly cached) result.
+        """
+        key = canonical_key(layers, segments, objective, config, **options)
+        result = self.get(key, layers, segments)
+        if result is None:
+            model = optimizer.LoScModel(layers, segments, **options)
+            model.set_objective(objective)
+            result = model.solve(config)
+            self.put(key, result, segments)
+        return result
@@ -4,8 +4,24 @@
 import math
 import pickle
 
+import numpy as np
+
 from dataclasses import dataclass
-from typing import List, Tuple, Any
+from typing import Dict, Iterator, List, Sequence, Tuple, Any, Union
+
+
+class NoSolutionError(Exception):
+    def __init__(self, message: str, status: str = "INFEASIBLE"):
+        """Raised when an allocation problem does not have a (feasible) solution.
+
+        Args:
+            message : The description of the failure.
+            status  : "INFEASIBLE" when the problem is proven infeasible, the
+                      status of the solver otherwise (e.g., "UNKNOWN" when the
+                      time limit is reached before finding a solution).
+        """
+        super().__init__(message)
+        self.status = status
 
 
 def size_to_human(size_bytes: int) -> str:
@@ -36,9 +52,252 @@ def gigabytes_to_bytes(gigabytes: float) -> int:
     return int(gigabytes * 1024 * 1024 * 1024)
 
 
-class Layer:
+# The identifier given to layers and segments without one.
+NO_ID: str = "NO_ID"
+
+# The identifier stored in the columns of a table for the rows whose identifier
+# is not an integer (e.g., `NO_ID`), see `_to_column`.
+COLUMN_NO_ID: int = -1
+
+# The columns of a `LayerTable`, one row per layer.
+LAYER_DTYPE = np.dtype(
+    [
+        ("id", np.int64),
+        ("memory", np.int64),
+        ("n_params", np.int64),
+        ("runtime", np.int64),
+        ("output_size", np.int64),
+    ]
+)
+
+# The columns of a `SegmentTable`, one row per execution segment.
+SEGMENT_DTYPE = np.dtype(
+    [
+        ("id", np.int64),
+        ("avail_memory", np.int64),
+        ("avail_time", np.int64),
+    ]
+)
+
+
+class _Table:
+    # The structured dtype of the rows, and the class of the row views.
+    dtype: np.dtype = None
+    row: type = None
+
+    def __init__(self, data: np.ndarray, root: "_Table" = None, start: int = 0):
+        """Initialize the table.
+
+        Args:
+            data  : The structured array holding the rows of the table.
+            root  : The table owning the memory, when this table is a slice of it.
+            start : The position of the first row of this table inside the root.
+        """
+        self._data = data
+        self._root = root if root is not None else self
+        self._start = start
+        if root is None:
+            # Zero-copy views of each column, and the cache of the prefix sums.
+            self._columns: Dict[str, np.ndarray] = {
+                n: data[n] for n in data.dtype.names
+            }
+            self._prefix: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def _from_rows(cls, rows: Sequence[Any]) -> "_Table":
+        """Builds a table with a copy of the given rows, the fields they lack
+        (e.g., the parameters of a `Layer`) are set to zero."""
+        data = np.zeros(len(rows), dtype=cls.dtype)
+        for name in cls.dtype.names:
+            data[name] = [_to_column(name, getattr(row, name, 0)) for row in rows]
+        return cls(data)
+
+    @classmethod
+    def from_columns(cls, **columns: Sequence[int]) -> "_Table":
+        """Builds a table from its columns, the missing columns are set to zero,
+        except the identifiers, which default to the row positions."""
+        size = max((len(column) for column in columns.values()), default=0)
+        data = np.zeros(size, dtype=cls.dtype)
+        data["id"] = np.arange(size)
+        for name, column in columns.items():
+            data[name] = column
+        return cls(data)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        if self._root is self:
+            return {"data": self._data}
+        return {
+            "root": self._root,
+            "start": self._start,
+            "stop": self._start + len(self),
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        if "data" in state:
+            self.__init__(state["data"])
+        else:
+            root, start = state["root"], state["start"]
+            self.__init__(root._data[start : state["stop"]], root, start)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[Any]:
+        for index in range(self._start, self._start + len(self)):
+            yield self.row._view(self._root, index)
+
+    def __getitem__(self, key: Union[int, slice]) -> Any:
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise IndexError("Tables can only be sliced contiguously.")
+            stop = max(start, stop)
+            return type(self)(self._data[start:stop], self._root, self._start + start)
+        index = key + len(self) if key < 0 else key
+        if not 0 <= index < len(self):
+            raise IndexError("Table index out of range.")
+        return self.row._view(self._root, self._start + index)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({len(self)} rows)"
+
+    @property
+    def data(self) -> np.ndarray:
+        """The structured array of the rows (a view, not a copy)."""
+        return self._data
+
+    def column(self, name: str) -> np.ndarray:
+        """Returns a zero-copy view of the given column."""
+        return self._data[name]
+
+    def _root_prefix(self, name: str) -> np.ndarray:
+        """Returns the (cached) prefix sums of a column of the root table."""
+        root = self._root
+        prefix = root._prefix.get(name)
+        if prefix is None:
+            prefix = np.zeros(len(root) + 1, dtype=np.int64)
+            np.cumsum(root._columns[name], out=prefix[1:])
+            root._prefix[name] = prefix
+        return prefix
+
+    def prefix(self, name: str) -> np.ndarray:
+        """Returns the prefix sums of a column, p[j] = sum(column[:j]), of size
+        len(self) + 1. It is a view on the root table, when this table is one."""
+        prefix = self._root_prefix(name)[self._start : self._start + len(self) + 1]
+        return prefix if self._start == 0 else prefix - prefix[0]
+
+    def sum(self, name: str, start: int = 0, stop: int = None) -> int:
+        """Returns the sum of a column over the rows [start, stop), in O(1)."""
+        stop = len(self) if stop is None else stop
+        prefix = self._root_prefix(name)
+        return int(prefix[self._start + stop] - prefix[self._start + start])
+
+    def split(self, points: Sequence[int]) -> List["_Table"]:
+        """Slices the table at the given (increasing) positions.
+        Args:
+            points (Sequence[int]): The positions where a new slice begins.
+        Returns:
+            List[_Table]: The len(points) + 1 zero-copy slices.
+        """
+        bounds = [0] + list(points) + [len(self)]
+        return [self[bounds[k] : bounds[k + 1]] for k in range(len(bounds) - 1)]
+
+    @classmethod
+    def concatenate(cls, tables: Sequence["_Table"]) -> "_Table":
+        """Concatenates the rows of several tables into a new one. The rows of
+        slices of the same table are gathered at once."""
+        tables = list(tables)
+        sizes = np.fromiter(map(len, tables), np.int64, len(tables))
+        if tables and all(table._root is tables[0]._root for table in tables):
+            starts = np.fromiter((table._start for table in tables), np.int64)
+            # The position of each row inside the root.
+            index = np.arange(sizes.sum()) + np.repeat(
+                starts - (np.cumsum(sizes) - sizes), sizes
+            )
+            return cls(tables[0]._root._data[index])
+        data = np.zeros(int(sizes.sum()), dtype=cls.dtype)
+        end = 0
+        for table, size in zip(tables, sizes):
+            data[end : end + size] = table.data
+            end += size
+        return cls(data)
+
+    def _invalidate(self) -> None:
+        """Drops the cached prefix sums, after a row has been modified."""
+        self._root._prefix.clear()
+
+
+def _to_column(name: str, value: Any) -> int:
+    """Converts the value of a field to the int of its column, as `from_dict`
+    does (e.g., 3.7 or "3" give 3). An identifier which is not an integer (e.g.,
+    `NO_ID`) is stored as `COLUMN_NO_ID`."""
+    if type(value) is int:
+        return value
+    if name == "id":
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return COLUMN_NO_ID
+    return int(value)
+
+
+def _column(name: str) -> property:
+    """Creates the property reading and writing a column of the row of a view."""
+
+    def getter(self):
+        return self._table._columns[name][self._index].item()
+
+    def setter(self, value):
+        self._table._columns[name][self._index] = _to_column(name, value)
+        self._table._invalidate()
+
+    return property(getter, setter)
+
+
+class _Row:
+    """A layer or a segment. A row built directly holds its fields, while the
+    rows of a table are views over it, see `_view_class`."""
+
+    __slots__ = ()
+
+
+class _View:
+    __slots__ = ()
+
+    @classmethod
+    def _view(cls, table: _Table, index: int) -> "_View":
+        """Creates a view over the row in position `index` of a root table."""
+        row = cls.__new__(cls)
+        row._table, row._index = table, index
+        return row
+
+    def __eq__(self, other: Any) -> bool:
+        return (
+            isinstance(other, _View)
+            and self._table is other._table
+            and self._index == other._index
+        )
+
+    def __hash__(self) -> int:
+        return hash((id(self._table), self._index))
+
+
+def _view_class(row: type) -> type:
+    """Creates the class of the views over the rows of a table, a subclass of
+    `row` whose fields read and write the columns of the table."""
+    namespace = {name: _column(name) for name in row.__slots__}
+    namespace["__slots__"] = ("_table", "_index")
+    namespace["__qualname__"] = f"_{row.__name__}View"
+    namespace["__doc__"] = f"A `{row.__name__}` reading a row of a table."
+    return type(namespace["__qualname__"], (_View, row), namespace)
+
+
+class Layer(_Row):
+    __slots__ = ("id", "memory", "runtime", "output_size")
+
     def __init__(self, id, memory, runtime, output_size):
-        """Initialize the layer.
+        """Initialize the layer. The layers of a `LayerTable` are views over
+        its rows instead.
 
         Args:
             id          : The unique identifier for the layer.
@@ -53,7 +312,7 @@ class Layer:
 
     @staticmethod
     def from_dict(obj: Any) -> "Layer":
-        _id = obj.get("id", "NO_ID")
+        _id = obj.get("id", NO_ID)
         _memory = int(obj.get("memory", 0))
         _runtime = int(obj.get("runtime", 0))
         _output_size = int(obj.get("output_size", 0))
@@ -66,9 +325,12 @@ class Layer:
         return str(self)
 
 
-class Segment:
+class Segment(_Row):
+    __slots__ = ("id", "avail_memory", "avail_time")
+
     def __init__(self, id, avail_memory, avail_time):
-        """Initialize the execution segment.
+        """Initialize the execution segment. The segments of a `SegmentTable`
+        are views over its rows instead.
 
         Args:
             id           : The unique identifier for the execution segment.
@@ -81,7 +343,7 @@ class Segment:
 
     @staticmethod
     def from_dict(obj: Any) -> "Segment":
-        _id = obj.get("id", "NO_ID")
+        _id = obj.get("id", NO_ID)
         _avail_memory = int(obj.get("avail_memory", 0))
         _avail_time = int(obj.get("avail_time", 0))
         return Segment(_id, _avail_memory, _avail_time)
@@ -93,6 +355,127 @@ class Segment:
         return str(self)
 
 
+_LayerView = _view_class(Layer)
+_SegmentView = _view_class(Segment)
+
+
+class LayerTable(_Table):
+    """Columnar table of layers, backed by a NumPy structured array of
+    `LAYER_DTYPE` (40 bytes per layer). Indexing returns `Layer` views, and
+    slicing returns zero-copy tables, whose sums are O(1) through the prefix
+    sums of the root table."""
+
+    dtype = LAYER_DTYPE
+    row = _LayerView
+
+    @staticmethod
+    def from_layers(layers: Sequence[Layer]) -> "LayerTable":
+        """Returns a table with the given layers. When they are consecutive rows
+        of the same table, the result is a zero-copy slice of it."""
+        if isinstance(layers, LayerTable):
+            return layers
+        layers = list(layers)
+        if layers and isinstance(layers[0], _View):
+            table, first = layers[0]._table, layers[0]._index
+            if all(
+                layer._table is table and layer._index == first + k
+                for k, layer in enumerate(layers)
+            ):
+                return table[first : first + len(layers)]
+            # Views over the same table are gathered at once.
+            if all(getattr(layer, "_table", None) is table for layer in layers):
+                index = np.fromiter(
+                    (layer._index for layer in layers), np.int64, len(layers)
+                )
+                return LayerTable(table._data[index])
+        return LayerTable._from_rows(layers)
+
+    @staticmethod
+    def from_profile(
+        profile: Dict[str, Sequence[float]], first_id: int = 0
+    ) -> "LayerTable":
+        """Builds a table from a profile in the pickle layout, i.e., the lists
+        "layers_mem" and "layers_out_size" (MB), "layers_params", and
+        "layers_runtime" (ms), truncated to the shortest one."""
+        columns = [
+            np.asarray(profile[key])
+            for key in (
+                "layers_mem",
+                "layers_params",
+                "layers_runtime",
+                "layers_out_size",
+            )
+        ]
+        size = min(len(column) for column in columns)
+        mem, params, runtime, out_size = (column[:size] for column in columns)
+        return LayerTable.from_columns(
+            id=np.arange(first_id, first_id + size),
+            memory=(mem.astype(np.float64) * 1024 * 1024).astype(np.int64),
+            n_params=params.astype(np.int64),
+            runtime=runtime.astype(np.int64),
+            output_size=(out_size.astype(np.float64) * 1024 * 1024).astype(np.int64),
+        )
+
+    def layer_data(self) -> List["LayerData"]:
+        """Returns the rows of the table as `LayerData` views."""
+        return [
+            _LayerDataView._view(self._root, index)
+            for index in range(self._start, self._start + len(self))
+        ]
+
+
+class SegmentTable(_Table):
+    """Columnar table of execution segments, backed by a NumPy structured array
+    of `SEGMENT_DTYPE`. Indexing returns `Segment` views."""
+
+    dtype = SEGMENT_DTYPE
+    row = _SegmentView
+
+    @staticmethod
+    def from_segments(segments: Sequence[Segment]) -> "SegmentTable":
+        """Returns a table with (a copy of) the given segments."""
+        if isinstance(segments, SegmentTable):
+            return segments
+        segments = list(segments)
+        # Views over the same table are gathered at once.
+        if segments and isinstance(segments[0], _View):
+            table = segments[0]._table
+            if all(getattr(s, "_table", None) is table for s in segments):
+                index = np.fromiter(
+                    (s._index for s in segments), np.int64, len(segments)
+                )
+                return SegmentTable(table._data[index])
+        return SegmentTable._from_rows(segments)
+
+
+def column(rows: Sequence[_Row], name: str) -> np.ndarray:
+    """Returns a column of a table, or of a list of rows, as an int64 array.
+    Args:
+        rows (Sequence[_Row]): A table, or a list of layers or segments.
+        name (str): The name of the column (e.g., "memory").
+    Returns:
+        np.ndarray: The column, a zero-copy view when `rows` is a table.
+    """
+    if isinstance(rows, _Table):
+        return rows.column(name)
+    try:
+        return np.fromiter((getattr(row, name) for row in rows), np.int64, len(rows))
+    except (TypeError, ValueError):
+        # Identifiers which are not integers, see `_to_column`.
+        return np.fromiter(
+            (_to_column(name, getattr(row, name)) for row in rows),
+            np.int64,
+            len(rows),
+        )
+
+
+def _sum(rows: Sequence[_Row], name: str) -> int:
+    """Sums a column of a table (in O(1)), or of a list of rows."""
+    if isinstance(rows, _Table):
+        return rows.sum(name)
+    return sum([getattr(row, name) for row in rows])
+
+
 @dataclass
 class Allocation:
     """Allocation between segment and layers.
@@ -125,15 +508,15 @@ class Allocation:
         return Allocation(_segment, _layers)
 
     def get_used_memory(self) -> int:
-        """Compute the segment used memory."""
+        """Compute the segment used memory (in O(1) when layers is a `LayerTable`)."""
         if self.layers:
-            return sum([layer.memory for layer in self.layers])
+            return _sum(self.layers, "memory")
         return 0
 
     def get_used_time(self) -> int:
-        """Compute the segment used time."""
+        """Compute the segment used time (in O(1) when layers is a `LayerTable`)."""
         if self.layers:
-            return sum([layer.runtime for layer in self.layers])
+            return _sum(self.layers, "runtime")
         return 0
 
     def get_output_size(self) -> int:
@@ -159,7 +542,9 @@ class Allocation:
         return s
 
 
-class LayerData:
+class LayerData(_Row):
+    __slots__ = ("id", "memory", "n_params", "runtime", "output_size")
+
     def __init__(self, id, memory, n_params, runtime, output_size):
         """
         memory      : How much memory the layer occupies (bytes)
@@ -175,7 +560,7 @@ class LayerData:
 
     @staticmethod
     def from_dict(obj: Any) -> "LayerData":
-        _id = obj.get("id", "NO_ID")
+        _id = obj.get("id", NO_ID)
         _memory = int(obj.get("layers_mem", 0))
         _n_params = int(obj.get("layers_params", 0))
         _runtime = int(obj.get("layers_runtime", 0))
@@ -186,6 +571,9 @@ class LayerData:
         return f"LayerData {self.id:2d}, {self.n_params:12d}, {size_to_human(self.memory)}, {self.runtime:4d} ms, {size_to_human(self.output_size)}"
 
 
+_LayerDataView = _view_class(LayerData)
+
+
 def get_layer_list(allocations: List[Allocation]) -> List[Layer]:
     layers = list(
         set(
@@ -250,70 +638,43 @@ def scale_memory(allocations: List[Allocation], scale):
 
 
 def parse_layer_data(path: str) -> List[LayerData]:
-    layers_data: List[LayerData] = []
-    # Open the file.
+    # Open and load the file.
     try:
-        file = open(path, "rb")
+        with open(path, "rb") as file:
+            unserialized = pickle.load(file)
     except IOError:
-        input("Could not open the input file.")
-        return layers_data
-    # Load the file.
-    unserialized = pickle.load(file)
-    # Extract the lists.
-    mem = unserialized["layers_mem"]
-    params = unserialized["layers_params"]
-    runtime = unserialized["layers_runtime"]
-    out_size = unserialized["layers_out_size"]
-    # Get the size.
-    lengths = [len(mem), len(params), len(runtime), len(out_size)]
-    # Parse the data.
-    for index in range(0, min(lengths)):
-        layers_data.append(
-            LayerData.from_dict(
-                {
-                    "id": index,
-                    "layers_mem": megabytes_to_bytes(mem[index]),
-                    "layers_params": params[index],
-                    "layers_runtime": runtime[index],
-                    "layers_out_size": megabytes_to_bytes(out_size[index]),
-                }
-            )
-        )
-    return layers_data
+        print(f"Could not open the input file '{path}'.")
+        return []
+    # All the layers share a single table.
+    return LayerTable.from_profile(unserialized).layer_data()
+
 
+def print_assignment_statistics(
+    allocations: List[Allocation], edges: np.ndarray = None
+) -> None:
+    # Imported here, since the validation builds on this module.
+    from src.validation import validate
 
-def print_assignment_statistics(allocations: List[Allocation]) -> None:
+    report = validate(allocations, edges=edges)
     print("==== Layer to Segment assignment ====")
-    total_memory = 0
-    total_output_size = 0
-    segment_output_sizes = []
-    for allocation in allocations:
+    for k, allocation in enumerate(allocations):
         # Check if there are actual layers inside this segment.
-        if allocation.layers:
-            # Compute the segment used memory.
-            segment_memory = sum([layer.memory for layer in allocation.layers])
-            # Compute the segment used time.
-            segment_time = sum([layer.runtime for layer in allocation.layers])
-            # Compute the segment output_size (using the last layer in the segment).
-            segment_output_size = allocation.get_output_size()
-            # Update the total memory.
-            total_memory += segment_memory
-            # Update the total output_size.
-            total_output_size += segment_output_size
-            # Update the list of segment latencies.
-            segment_output_sizes.append(segment_output_size)
-            # Print the actual info about the given execution sequence.
-            print(f"Segment {allocation.segment.id}, ", end="")
-            print(
-                f"used memory {size_to_human(segment_memory)}/{size_to_human(allocation.segment.avail_memory)}, ",
-                end="",
-            )
-            print(f"used time {segment_time:d}/{allocation.segment.avail_time:d} ms")
-            for layer in allocation.layers:
-                print(f"    Layer {layer.id}, ", end="")
-                print(f"memory {size_to_human(layer.memory)} ", end="")
-                print(f"output_size {size_to_human(layer.output_size)}")
-            print()
+        if not allocation.layers:
+            continue
+        # Print the actual info about the given execution sequence.
+        print(f"Segment {allocation.segment.id}, ", end="")
+        print(
+            f"used memory {size_to_human(report.used_memory[k])}/{size_to_human(report.avail_memory[k])}, ",
+            end="",
+        )
+        print(f"used time {report.used_time[k]:d}/{report.avail_time[k]:d} ms")
+        for layer in allocation.layers:
+            print(f"    Layer {layer.id}, ", end="")
+            print(f"memory {size_to_human(layer.memory)} ", end="")
+            print(f"output_size {size_to_human(layer.output_size)}")
+        print()
     print("==== Overall statistics ====")
-    print(f"Total used memory : {size_to_human(total_memory)}")
-    print(f"Total output size : {size_to_human(total_output_size)}")
+    print(f"Total used memory : {size_to_human(int(report.used_memory.sum()))}")
+    print(f"Total output size : {size_to_human(report.total_output_size)}")
+    for violation in report.violations:
+        print(f"Violation : {violation}")
@@ -0,0 +1,553 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+
+import src.data_structures as ds
+import src.graph as graph
+
+# The objectives supported by the dynamic-programming engine. They mirror the
+# two CP-SAT entry points of `src.optimizer`.
+OBJECTIVES: Tuple[str, ...] = ("output_size", "knapsack")
+
+# Value used to mark unreachable states of the dynamic program. It is small
+# enough to never overflow when a cost is added to it.
+INF: int = np.iinfo(np.int64).max // 4
+
+# The ranges of `_range_min` of at least 2 * 2^BLOCK_LEVEL values are split into
+# blocks of 2^BLOCK_LEVEL values, thus the doubling passes over the values are
+# bounded by BLOCK_LEVEL.
+BLOCK_LEVEL = 6
+
+
+def _prefix_sums(values: np.ndarray) -> np.ndarray:
+    """Computes the prefix sums of the given values, starting with a zero.
+    Args:
+        values (np.ndarray): The values to accumulate.
+    Returns:
+        np.ndarray: An array `p` of size len(values) + 1, with p[j] = sum(values[:j]).
+    """
+    prefix = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(np.asarray(values, dtype=np.int64), out=prefix[1:])
+    return prefix
+
+
+def _window_starts(
+    prefix_memory: np.ndarray,
+    prefix_runtime: np.ndarray,
+    segment: ds.Segment,
+    ends: np.ndarray,
+) -> np.ndarray:
+    """Computes, for the given end positions j, the first layer that can open a
+    segment ending at j.
+    Args:
+        prefix_memory (np.ndarray): The prefix sums of the layers memory.
+        prefix_runtime (np.ndarray): The prefix sums of the layers runtime.
+        segment (ds.Segment): The segment receiving the layers.
+        ends (np.ndarray): The end positions (exclusive) we are interested in.
+    Returns:
+        np.ndarray: The array `lo`, such that the layers [i, ends[n]) fit inside
+            the segment if and only if lo[n] <= i.
+    """
+    lo_memory = np.searchsorted(
+        prefix_memory, prefix_memory[ends] - segment.avail_memory, side="left"
+    )
+    lo_runtime = np.searchsorted(
+        prefix_runtime, prefix_runtime[ends] - segment.avail_time, side="left"
+    )
+    return np.maximum(lo_memory, lo_runtime)
+
+
+def _window_reach(
+    prefix_memory: np.ndarray,
+    prefix_runtime: np.ndarray,
+    segment: ds.Segment,
+    start: int,
+) -> int:
+    """Computes the furthest end position of a segment opened at `start`.
+    Args:
+        prefix_memory (np.ndarray): The prefix sums of the layers memory.
+        prefix_runtime (np.ndarray): The prefix sums of the layers runtime.
+        segment (ds.Segment): The segment receiving the layers.
+        start (int): The first layer placed inside the segment.
+    Returns:
+        int: The largest j such that the layers [start, j) fit inside the segment.
+    """
+    reach_memory = np.searchsorted(
+        prefix_memory, prefix_memory[start] + segment.avail_memory, side="right"
+    )
+    reach_runtime = np.searchsorted(
+        prefix_runtime, prefix_runtime[start] + segment.avail_time, side="right"
+    )
+    return int(min(reach_memory, reach_runtime)) - 1
+
+
+def _range_min(values: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """Answers a batch of range-minimum queries over `values`, in linear time.
+
+    A range shorter than 2 * 2^BLOCK_LEVEL is covered by two windows of the same
+    power-of-two width, whose minima take one pass over the values per width,
+    i.e., at most BLOCK_LEVEL passes. A longer range is a suffix of a block of
+    2^BLOCK_LEVEL values, whole blocks, and a prefix of a block: the prefix and
+    suffix minima of the blocks take one pass, and the minimum of the whole
+    blocks is a (much smaller) batch of range-minimum queries over the minima
+    of the blocks.
+
+    Args:
+        values (np.ndarray): The (integer) values we are querying.
+        lo (np.ndarray): The first index of each range (inclusive).
+        hi (np.ndarray): The last index of each range (inclusive), with hi >= lo.
+    Returns:
+        np.ndarray: The minimum of each range.
+    """
+    n = len(values)
+    level = np.log2(hi - lo + 1).astype(np.int64)
+    short = level <= BLOCK_LEVEL
+    if not short.all():
+        minima = np.empty(len(lo), dtype=values.dtype)
+        if short.any():
+            minima[short] = _range_min(values, lo[short], hi[short])
+        lo, hi = lo[~short], hi[~short]
+        width = 1 << BLOCK_LEVEL
+        blocks = np.full(-(-n // width) * width, np.iinfo(values.dtype).max)
+        blocks[:n] = values
+        blocks = blocks.reshape(-1, width)
+        prefix = np.minimum.accumulate(blocks, axis=1)
+        suffix = np.minimum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1]
+        minimum = np.minimum(suffix.ravel()[lo], prefix.ravel()[hi])
+        # The whole blocks between the first and the last one.
+        first, last = lo // width + 1, hi // width - 1
+        inner = first <= last
+        if inner.any():
+            minimum[inner] = np.minimum(
+                minimum[inner],
+                _range_min(prefix[:, -1].copy(), first[inner], last[inner]),
+            )
+        minima[~short] = minimum
+        return minima
+    # Row k of the table holds the minima of the windows of width 2^k.
+    table = np.empty((int(level.max()) + 1, n), dtype=values.dtype)
+    table[0] = values
+    for k in range(1, len(table)):
+        half = 1 << (k - 1)
+        np.minimum(table[k - 1, :-half], table[k - 1, half:], out=table[k, :-half])
+        table[k, n - half :] = table[k - 1, n - half :]
+    table = table.ravel()
+    return np.minimum(table[level * n + lo], table[level * n + hi - (1 << level) + 1])
+
+
+def _best_start(
+    previous: np.ndarray,
+    offset: int,
+    prefix_memory: np.ndarray,
+    prefix_runtime: np.ndarray,
+    segment: ds.Segment,
+    end: int,
+) -> Tuple[int, int]:
+    """Finds where the segment closed at `end` opens in the best solution, i.e.,
+    the leftmost position of the smallest cost of the previous row inside the
+    window of the segment (the one `_range_min` returned the minimum of).
+    Args:
+        previous (np.ndarray): The best costs of the previous row, from `offset`.
+        offset (int): The position of the first cost of `previous`.
+        prefix_memory (np.ndarray): The prefix sums of the layers memory.
+        prefix_runtime (np.ndarray): The prefix sums of the layers runtime.
+        segment (ds.Segment): The segment receiving the layers.
+        end (int): The end position (exclusive) of the segment.
+    Returns:
+        Tuple[int, int]: The start position, and its cost (INF if none fits).
+    """
+    lo = _window_starts(prefix_memory, prefix_runtime, segment, np.array([end]))
+    lo, hi = max(int(lo[0]), offset), min(end - 1, offset + len(previous) - 1)
+    if lo > hi:
+        return end, INF
+    start = lo + int(np.argmin(previous[lo - offset : hi - offset + 1]))
+    return start, int(previous[start - offset])
+
+
+def _segment_costs(
+    layers: List[ds.Layer], objective: str, edges: np.ndarray = None
+) -> np.ndarray:
+    """Returns the cost paid when a segment is closed after each layer.
+    Args:
+        layers (List[ds.Layer]): The list of layers.
+        objective (str): The objective we are minimizing.
+        edges (np.ndarray): The skip edges of the layers, see `graph.last_use`.
+    Returns:
+        np.ndarray: An array `c`, where c[l] is the cost of closing a segment
+            with layer l as its last layer.
+    """
+    if objective == "output_size":
+        return graph.split_costs(layers, edges)
+    if objective == "knapsack":
+        return np.ones(len(layers), dtype=np.int64)
+    raise ValueError(f"Unknown objective '{objective}', expected one of {OBJECTIVES}.")
+
+
+def solve_dp(
+    layers: List[ds.Layer],
+    segments: List[ds.Segment],
+    objective: str = "output_size",
+    verbose: bool = False,
+    edges: np.ndarray = None,
+    allow_empty: bool = False,
+) -> List[ds.Allocation]:
+    """Solves the layer to segment allocation exactly, with dynamic programming.
+
+    The ordering and prefix-use constraints of the CP models in `src.optimizer`
+    force every used segment to receive a contiguous block of layers, and the
+    used segments to be the first ones. Thus, the problem is a contiguous
+    partition of the layers, and f[k][j] (the best cost of placing the first j
+    layers in the first k + 1 segments) only depends on f[k - 1][i], for the
+    positions i such that the layers [i, j) fit inside segment k. Since memory
+    and runtime are non-negative, those positions form a window, which we
+    locate with binary searches over prefix sums, and whose minima take linear
+    time, see `_range_min`. Each row only spans its band of reachable positions,
+    thus the whole pass takes O(B * (log L + BLOCK_LEVEL)) for B entries in the
+    bands, at most S * L (about 0.4 * S * L on the benchmark schedules).
+
+    The rows cannot be computed together, since each one takes its minima over
+    the previous one, and the bands are the reachable positions, so B grows
+    with S * L: at 8 layers per segment, the pass takes about 20 ms for 1000
+    layers, 0.2 s for 5000, and 2.5 s for 20000, split between the searches of
+    the windows and their minima (`python -m benchmarks.suite --engines dp`).
+
+    Args:
+        layers (List[ds.Layer]): The list of layers, in execution order.
+        segments (List[ds.Segment]): The list of execution segments, in order.
+        objective (str): Either "output_size", to minimize the total output
+            size stored between segments (as `optimizer.minimize_output_size`),
+            or "knapsack", to minimize the number of used segments (as
+            `optimizer.knapsack`).
+        verbose (bool): If true, prints the optimal objective value.
+        edges (np.ndarray): The skip edges of the layers, whose outputs are also
+            held across the splits they cross, see `graph.last_use`.
+        allow_empty (bool): If true, the used segments do not need to be the
+            first ones, i.e., f[k][j] can also be f[k - 1][j], e.g., when the
+            segments are shared with other networks (see `src.tenants`).
+    Returns:
+        List[ds.Allocation]: The allocations of the used segments.
+    """
+    # Pre-compute some sizes, and indices.
+    num_layers, num_segments = len(layers), len(segments)
+    if num_layers == 0:
+        return []
+    costs = _segment_costs(layers, objective, edges)
+    prefix_memory = _prefix_sums(ds.column(layers, "memory"))
+    prefix_runtime = _prefix_sums(ds.column(layers, "runtime"))
+    # The first position of each row from which the remaining layers fit in the
+    # total capacity of the following segments, the ones before cannot lead to
+    # a solution.
+    need = np.zeros(num_segments, dtype=np.int64)
+    for prefix, name in (
+        (prefix_memory, "avail_memory"),
+        (prefix_runtime, "avail_time"),
+    ):
+        rest = np.cumsum(ds.column(segments, name)[::-1])[::-1]
+        rest = np.append(rest[1:], 0)[:num_segments]
+        need = np.maximum(need, np.searchsorted(prefix, prefix[-1] - rest))
+
+    # ==============================================
+    # OPTIMIZE (FORWARD PASS)
+    # ==============================================
+
+    # The budgets, read once (the segments may be the views of a table).
+    avail_memory = ds.column(segments, "avail_memory").tolist()
+    avail_time = ds.column(segments, "avail_time").tolist()
+    # The best costs of the band [first, last] of reachable positions of the
+    # previous row, only the empty prefix is reachable at start. Each row only
+    # holds its band, thus a row costs O(band) and not O(L).
+    previous = np.zeros(1, dtype=np.int64)
+    first, last = 0, 0
+    # The band of each row, with its first position, read back by the backtrack.
+    rows = [(0, previous)]
+    best_cost, best_segment = INF, -1
+    for s in range(num_segments):
+        memory, time = avail_memory[s], avail_time[s]
+        # Only the end positions reachable from the band need to be computed.
+        reach = min(
+            int(
+                min(
+                    prefix_memory.searchsorted(prefix_memory[last] + memory, "right"),
+                    prefix_runtime.searchsorted(prefix_runtime[last] + time, "right"),
+                )
+            )
+            - 1,
+            num_layers,
+        )
+        start = max(first + 1, int(need[s]))
+        ends = np.arange(start, reach + 1)
+        # The windows start inside the band, thus the searches only span it.
+        band_memory = prefix_memory[first : reach + 1]
+        band_runtime = prefix_runtime[first : reach + 1]
+        lo = first + np.maximum(
+            band_memory.searchsorted(band_memory[ends - first] - memory, "left"),
+            band_runtime.searchsorted(band_runtime[ends - first] - time, "left"),
+        )
+        # A segment must contain at least one layer, so the window is [lo, j - 1],
+        # further restricted to the band of the previous row.
+        hi = np.minimum(ends - 1, last)
+        valid = lo <= hi
+        values = np.full(len(ends), INF, dtype=np.int64)
+        if valid.any():
+            value = _range_min(previous, lo[valid] - first, hi[valid] - first)
+            values[valid] = np.where(value < INF, value + costs[ends[valid] - 1], INF)
+        offset = start
+        if allow_empty:
+            # Leaving the segment empty keeps the states of the previous row.
+            offset = min(first, start)
+            current = np.full(max(last, reach) - offset + 1, INF, dtype=np.int64)
+            current[start - offset : reach - offset + 1] = values
+            band = current[first - offset : last - offset + 1]
+            np.minimum(band, previous, out=band)
+            current[: max(0, int(need[s]) - offset)] = INF
+        else:
+            current = values
+        reachable = np.flatnonzero(current < INF)
+        if len(reachable):
+            first = offset + int(reachable[0])
+            last = offset + int(reachable[-1])
+            current = current[reachable[0] : reachable[-1] + 1]
+            rows.append((first, current))
+            # Check if closing the allocation in this segment improves the solution.
+            if last == num_layers and current[-1] < best_cost:
+                best_cost, best_segment = int(current[-1]), s
+        # Every segment costs the same, using more segments will not help.
+        if objective == "knapsack" and best_segment >= 0 and not allow_empty:
+            break
+        # No state is reachable anymore, adding segments will not help.
+        if not len(reachable):
+            break
+        previous = current
+
+    if best_segment < 0:
+        raise ds.NoSolutionError("The problem does not have an optimal solution.")
+    if verbose:
+        print(f"Optimal {objective} objective: {best_cost}")
+
+    # ==============================================
+    # OPTIMIZE (SOLUTION)
+    # ==============================================
+    allocations = []
+    end = num_layers
+    for s in range(best_segment, -1, -1):
+        start, cost = _best_start(
+            rows[s][1], rows[s][0], prefix_memory, prefix_runtime, segments[s], end
+        )
+        # Otherwise, the segment was left empty (see `allow_empty`).
+        offset, row = rows[s + 1]
+        if cost < INF and cost + costs[end - 1] == row[end - offset]:
+            allocations.append(ds.Allocation(segments[s], layers[start:end]))
+            end = start
+    allocations.reverse()
+    return allocations
+
+
+class IncrementalPlanner:
+    def __init__(
+        self,
+        layers: List[ds.Layer],
+        segments: List[ds.Segment],
+        objective: str = "output_size",
+        edges: np.ndarray = None,
+    ):
+        """Solves the allocation exactly, as `solve_dp`, keeping the whole table of
+        the dynamic program, so that re-planning after a few layers or segments
+        change (e.g., after re-profiling) only recomputes the affected entries.
+
+        The entry f[s][j] (the best cost of placing the first j layers in the
+        first s + 1 segments, see `solve_dp`) only depends on the layers before j,
+        and on the entries f[s - 1][i] inside the window of the positions i such
+        that the layers [i, j) fit inside segment s. Thus, when the layers [a, b)
+        change, only the positions j > a whose window reaches a changed layer, or
+        a changed entry of the previous row, are recomputed. A changed segment
+        invalidates its whole row, and the change then propagates to the
+        following rows, i.e., a change of the first segment is a full solve.
+
+        The planner is built even when the problem does not have a solution, with
+        `allocations` set to None, since an update may make it feasible.
+
+        Args:
+            layers   : The list of layers, in execution order.
+            segments : The list of execution segments, in order.
+            objective: Either "output_size" or "knapsack", see `solve_dp`.
+            edges    : The skip edges of the layers, see `graph.last_use`.
+        """
+        self.layers = list(layers)
+        self.segments = list(segments)
+        self.objective = objective
+        # The allocations of the last solve (None if infeasible).
+        self.allocations: List[ds.Allocation] = None
+        # The number of entries of the table computed by the last solve.
+        self.recomputed = 0
+        num_layers, num_segments = len(self.layers), len(self.segments)
+        self.table = np.full((num_segments, num_layers + 1), INF, dtype=np.int64)
+        # The row before the first one, only the empty prefix is reachable.
+        self.start = np.full(num_layers + 1, INF, dtype=np.int64)
+        self.start[0] = 0
+        self.costs = _segment_costs(self.layers, objective, edges).astype(np.int64)
+        self.output_size = ds.column(self.layers, "output_size").astype(np.int64)
+        self.last_use = graph.last_use(len(self.layers), edges)
+        self.memory = ds.column(self.layers, "memory").astype(np.int64)
+        self.runtime = ds.column(self.layers, "runtime").astype(np.int64)
+        self._prepare()
+        for s in range(num_segments):
+            self._compute_row(s, 1, num_layers)
+        self._extract()
+
+    def _prepare(self) -> None:
+        """Computes the prefix sums of the current layers."""
+        self.prefix_memory = _prefix_sums(self.memory)
+        self.prefix_runtime = _prefix_sums(self.runtime)
+
+    def _compute_row(self, s: int, first: int, last: int) -> np.ndarray:
+        """Recomputes the entries [first, last] of row s.
+        Returns:
+            np.ndarray: The positions whose best cost changed, sorted.
+        """
+        previous = self.table[s - 1] if s > 0 else self.start
+        # The entries stay unreachable when no position before them is reachable.
+        if (
+            self.table[s, first : last + 1].min() >= INF
+            and previous[:last].min() >= INF
+        ):
+            return np.empty(0, dtype=np.int64)
+        ends = np.arange(first, last + 1)
+        lo = _window_starts(
+            self.prefix_memory, self.prefix_runtime, self.segments[s], ends
+        )
+        hi = ends - 1
+        values = np.full(len(ends), INF, dtype=np.int64)
+        valid = lo <= hi
+        if valid.any():
+            lo, hi = lo[valid], hi[valid]
+            base = int(lo[0])
+            value = _range_min(previous[base : int(hi[-1]) + 1], lo - base, hi - base)
+            values[valid] = np.where(
+                value < INF, value + self.costs[ends[valid] - 1], INF
+            )
+        changed = ends[values != self.table[s, ends]]
+        self.table[s, ends] = values
+        self.recomputed += len(ends)
+        return changed
+
+    def _extract(self) -> Optional[List[ds.Allocation]]:
+        """Reads the best allocations from the table (None if there is none)."""
+        num_layers = len(self.layers)
+        self.allocations = None
+        if num_layers == 0:
+            self.allocations = []
+            return self.allocations
+        closing = self.table[:, num_layers]
+        best_segment = int(np.argmin(closing)) if len(closing) else -1
+        if best_segment < 0 or closing[best_segment] >= INF:
+            return None
+        allocations = []
+        end = num_layers
+        for s in range(best_segment, -1, -1):
+            start, _ = _best_start(
+                self.table[s - 1] if s > 0 else self.start,
+                0,
+                self.prefix_memory,
+                self.prefix_runtime,
+                self.segments[s],
+                end,
+            )
+            allocations.append(ds.Allocation(self.segments[s], self.layers[start:end]))
+            end = start
+        allocations.reverse()
+        self.allocations = allocations
+        return allocations
+
+    def update(
+        self,
+        layers: Dict[int, ds.Layer] = None,
+        segments: Dict[int, ds.Segment] = None,
+    ) -> List[ds.Allocation]:
+        """Replaces some layers and segments, and re-plans.
+
+        The number of layers and segments cannot change, a new planner is needed
+        in that case.
+
+        Args:
+            layers (Dict[int, ds.Layer]): The new layers, by position.
+            segments (Dict[int, ds.Segment]): The new segments, by position.
+        Returns:
+            List[ds.Allocation]: The optimal allocations of the used segments.
+        Raises:
+            ds.NoSolutionError: If the new problem does not have a solution, the
+                planner can still be updated.
+        """
+        layers, segments = layers or {}, segments or {}
+        num_layers, num_segments = len(self.layers), len(self.segments)
+        for l in layers:
+            if not 0 <= l < num_layers:
+                raise IndexError(f"Layer position {l} out of range.")
+        for s in segments:
+            if not 0 <= s < num_segments:
+                raise IndexError(f"Segment position {s} out of range.")
+        old_prefix = (self.prefix_memory, self.prefix_runtime)
+        old_segments = list(self.segments)
+        for l, layer in layers.items():
+            self.layers[l] = layer
+            self.memory[l], self.runtime[l] = layer.memory, layer.runtime
+            self.output_size[l] = layer.output_size
+        for s, segment in segments.items():
+            self.segments[s] = segment
+        self._prepare()
+
+        # The changed layers are [a, b). The output of a layer is held across the
+        # splits before its last use, which changes their cost as well.
+        a, b = (min(layers), max(layers) + 1) if layers else (num_layers, 0)
+        if self.objective == "output_size" and layers:
+            costs = graph.cut_costs(self.output_size, self.last_use)
+            changed_costs = np.flatnonzero(costs != self.costs)
+            if len(changed_costs):
+                a = min(a, int(changed_costs[0]))
+                b = max(b, int(changed_costs[-1]) + 1)
+            self.costs = costs
+        self.recomputed = 0
+        changed = np.empty(0, dtype=np.int64)
+        for s in range(num_segments):
+            if s in segments:
+                first, last = 1, num_layers
+            else:
+                first, last = num_layers + 1, 0
+                if layers:
+                    # The positions whose window (before or after the change)
+                    # contains a changed layer, or which close a segment with one.
+                    reach = max(
+                        _window_reach(*old_prefix, old_segments[s], b - 1),
+                        _window_reach(
+                            self.prefix_memory,
+                            self.prefix_runtime,
+                            self.segments[s],
+                            b - 1,
+                        ),
+                        b,
+                    )
+                    first, last = a + 1, min(reach, num_layers)
+                if len(changed):
+                    # The positions whose window contains a changed entry.
+                    first = min(first, int(changed[0]) + 1)
+                    last = max(
+                        last,
+                        min(
+                            _window_reach(
+                                self.prefix_memory,
+                                self.prefix_runtime,
+                                self.segments[s],
+                                int(changed[-1]),
+                            ),
+                            num_layers,
+                        ),
+                    )
+            if first <= last:
+                changed = self._compute_row(s, first, last)
+            else:
+                changed = np.empty(0, dtype=np.int64)
+        if self._extract() is None:
+            raise ds.NoSolutionError("The problem does not have an optimal solution.")
+        return self.allocations
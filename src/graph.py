@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from typing import List
+
+import src.data_structures as ds
+
+
+def last_use(num_layers: int, edges: np.ndarray = None) -> np.ndarray:
+    """Computes the position of the last consumer of the output of each layer.
+
+    The skip connections of a network (e.g., residual, U-Net, or dense ones) are
+    the (producer, consumer) positions of the layers, in execution order, whose
+    output is consumed by a later layer than the next one. The chain edges
+    (l, l + 1) are implied, thus no edges (None) is a pure chain, where only the
+    output of the last layer before a split is held across it.
+
+    Args:
+        num_layers (int): The number of layers.
+        edges (np.ndarray): The (producer, consumer) skip edges, None for a chain.
+    Returns:
+        np.ndarray: The last consumer of each layer, at least the next layer (the
+            output of the last layer is consumed at position L).
+    Raises:
+        ValueError: If an edge is out of range, or does not go forward.
+    """
+    use = np.arange(1, num_layers + 1, dtype=np.int64)
+    if edges is None or not len(edges):
+        return use
+    producer, consumer = np.asarray(edges, dtype=np.int64).reshape(-1, 2).T
+    invalid = (producer < 0) | (consumer <= producer) | (consumer >= num_layers)
+    if invalid.any():
+        e = int(np.flatnonzero(invalid)[0])
+        raise ValueError(
+            f"Invalid edge ({producer[e]}, {consumer[e]}) for {num_layers} layers."
+        )
+    np.maximum.at(use, producer, consumer)
+    return use
+
+
+def cut_costs(output_size: np.ndarray, last_use: np.ndarray) -> np.ndarray:
+    """Computes the memory held across a split after each layer, i.e., c[j] is the
+    sum of the outputs of the layers p <= j which are consumed after j.
+
+    Each output is live across the splits [p, last_use[p]), which a difference
+    array accumulates in O(L).
+    Args:
+        output_size (np.ndarray): The output size of each layer.
+        last_use (np.ndarray): The last consumer of each layer, see `last_use`.
+    Returns:
+        np.ndarray: The memory held across the split after each layer, c[L - 1]
+            is the output of the network.
+    """
+    output_size = np.asarray(output_size, dtype=np.int64)
+    delta = np.zeros(len(output_size) + 1, dtype=np.int64)
+    delta[:-1] += output_size
+    np.subtract.at(delta, last_use, output_size)
+    return np.cumsum(delta[:-1])
+
+
+def split_costs(layers: List[ds.Layer], edges: np.ndarray = None) -> np.ndarray:
+    """Computes the memory held across a split after each layer, including the
+    skip tensors crossing it (the output size of each layer, without edges).
+    Args:
+        layers (List[ds.Layer]): The list of layers, in execution order.
+        edges (np.ndarray): The (producer, consumer) skip edges, None for a chain.
+    Returns:
+        np.ndarray: The memory held across the split after each layer.
+    """
+    output_size = ds.column(layers, "output_size")
+    if edges is None:
+        return output_size
+    return cut_costs(output_size, last_use(len(output_size), edges))
+
+
+def live_tensors(num_layers: int, edges: np.ndarray, split: int) -> np.ndarray:
+    """Returns the layers whose output is held across the split after `split`."""
+    use = last_use(num_layers, edges)
+    producers = np.arange(num_layers)
+    return np.flatnonzero((producers <= split) & (use > split))
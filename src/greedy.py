@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from typing import List, Tuple
+
+import src.data_structures as ds
+import src.graph as graph
+import src.presolve as presolve
+
+# The objectives supported by the greedy planner, as in `src.dp_solver`.
+OBJECTIVES: Tuple[str, ...] = ("output_size", "knapsack")
+
+
+def _fill(
+    stacked: np.ndarray, avail_memory: np.ndarray, avail_time: np.ndarray
+) -> List[int]:
+    """Fills the segments in order, each with as many of the remaining layers as
+    possible, see `presolve.fill_end`.
+    Returns:
+        List[int]: The cuts c[0] = 0 < c[1] < ... < c[k] = L, where the used
+            segment s receives the layers [c[s], c[s + 1]).
+    Raises:
+        ds.NoSolutionError: If the layers do not fit, or a segment cannot hold
+            the first layer left (the greedy fill would leave it empty).
+    """
+    num_layers = len(stacked) // 2 - 1
+    cuts = [0]
+    for memory, time in zip(avail_memory.tolist(), avail_time.tolist()):
+        start = cuts[-1]
+        end = presolve.fill_end(stacked, start, memory, time)
+        if end == start:
+            raise ds.NoSolutionError(
+                f"The greedy fill cannot place layer {start} in segment {len(cuts) - 1}.",
+                "UNKNOWN",
+            )
+        cuts.append(end)
+        if cuts[-1] == num_layers:
+            return cuts
+    raise ds.NoSolutionError(
+        "The problem does not have a solution (INFEASIBLE).", "INFEASIBLE"
+    )
+
+
+def _move_cuts(
+    cuts: List[int],
+    stacked: np.ndarray,
+    avail_memory: np.ndarray,
+    avail_time: np.ndarray,
+    output_size: np.ndarray,
+) -> None:
+    """Moves each cut, from the last one to the first one, to the layer with the
+    smallest output size among those keeping both neighbouring segments feasible.
+
+    Moving the cut c[s] only changes the last layer of segment s - 1, i.e., the
+    output size of layer c[s] - 1. The cuts after it have already been moved, the
+    ones before it are still the greedy ones, which are as late as possible, thus
+    the range of c[s] is as wide as possible. The four bounds of c[s] take one
+    search of the stacked prefix sums, see `presolve.stack_prefix_sums`.
+    """
+    size = len(stacked) // 2
+    avail_memory, avail_time = avail_memory.tolist(), avail_time.tolist()
+    for s in range(len(cuts) - 2, 0, -1):
+        before, after = cuts[s - 1], cuts[s + 1]
+        # Segment s must hold the layers [c, after), and segment s - 1 [before, c).
+        # Over integers, searching v - 1 to the right is searching v to the left.
+        memory_lo, time_lo, memory_hi, time_hi = stacked.searchsorted(
+            (
+                stacked[after] - avail_memory[s] - 1,
+                stacked[size + after] - avail_time[s] - 1,
+                stacked[before] + avail_memory[s - 1],
+                stacked[size + before] + avail_time[s - 1],
+            ),
+            "right",
+        )
+        lo = max(before + 1, memory_lo, time_lo - size)
+        hi = min(after - 1, memory_hi - 1, time_hi - size - 1)
+        cuts[s] = int(lo + np.argmin(output_size[lo - 1 : hi]))
+
+
+def _output_size_bound(
+    layers: List[ds.Layer],
+    segments: List[ds.Segment],
+    output_size: np.ndarray,
+    num_used: int,
+) -> int:
+    """Bounds the output size of any solution from below.
+
+    Every solution uses at least `num_used` segments, and the last layer of each
+    of the first `num_used - 1` of them is a layer l in segment s, followed by a
+    layer in segment s + 1. Thus, its output size is at least the smallest one
+    among the layers with s inside their window, and s + 1 inside the one of the
+    next layer, see `presolve.segment_bounds`. The output size of the last layer
+    is always paid.
+    """
+    num_layers = len(layers)
+    earliest, latest = presolve.segment_bounds(layers, segments)
+    bound = int(output_size[-1])
+    # The layers with latest >= s, and earliest <= s, for each segment s.
+    first = latest.searchsorted(np.arange(num_used), "left")
+    last = earliest.searchsorted(np.arange(num_used), "right")
+    lo = np.maximum(first[:-1], first[1:] - 1)
+    hi = np.minimum(np.minimum(last[:-1], last[1:] - 1), num_layers - 1)
+    for l, h in zip(lo.tolist(), hi.tolist()):
+        if l < h:
+            bound += int(output_size[l:h].min())
+    return bound
+
+
+def solve_greedy(
+    layers: List[ds.Layer],
+    segments: List[ds.Segment],
+    objective: str = "output_size",
+    verbose: bool = False,
+    edges: np.ndarray = None,
+) -> Tuple[List[ds.Allocation], int]:
+    """Solves the layer to segment allocation approximately, in (almost) linear
+    time, e.g., to re-plan online, or to hint the CP-SAT model of `src.optimizer`.
+
+    The segments are filled in order, each with as many layers as possible. This
+    uses the fewest segments, thus it is optimal for the "knapsack" objective.
+    For the "output_size" objective, the cuts between the segments are then
+    moved, one at a time, to the layer with the smallest output size which keeps
+    the neighbouring segments within their budgets.
+
+    Args:
+        layers (List[ds.Layer]): The list of layers, in execution order.
+        segments (List[ds.Segment]): The list of execution segments, in order.
+        objective (str): Either "output_size" or "knapsack", see
+            `dp_solver.solve_dp`.
+        verbose (bool): If true, prints the objective value and the lower bound.
+        edges (np.ndarray): The skip edges of the layers, see `graph.last_use`.
+    Returns:
+        Tuple[List[ds.Allocation], int]: The allocations of the used segments, and
+            a lower bound of the optimal objective value.
+    Raises:
+        ds.NoSolutionError: If the greedy fill fails, with status "INFEASIBLE" when
+            the problem does not have a solution, "UNKNOWN" otherwise.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(
+            f"Unknown objective '{objective}', expected one of {OBJECTIVES}."
+        )
+    num_layers = len(layers)
+    if num_layers == 0:
+        return [], 0
+    # The columns are read from tables, the given ones or copies of the rows.
+    layer_table = ds.LayerTable.from_layers(layers)
+    segment_table = ds.SegmentTable.from_segments(segments)
+    stacked = presolve.stack_prefix_sums(
+        layer_table.prefix("memory"), layer_table.prefix("runtime")
+    )
+    avail_memory = segment_table.column("avail_memory")
+    avail_time = segment_table.column("avail_time")
+
+    cuts = _fill(stacked, avail_memory, avail_time)
+    num_used = len(cuts) - 1
+    if objective == "knapsack":
+        value = bound = num_used
+    else:
+        output_size = graph.split_costs(layer_table, edges)
+        _move_cuts(cuts, stacked, avail_memory, avail_time, output_size)
+        value = int(output_size[np.array(cuts[1:]) - 1].sum())
+        bound = _output_size_bound(layer_table, segment_table, output_size, num_used)
+    if verbose:
+        print(f"Greedy {objective} objective: {value} (lower bound {bound})")
+
+    allocations = [
+        ds.Allocation(segments[s], layers[cuts[s] : cuts[s + 1]])
+        for s in range(num_used)
+    ]
+    return allocations, bound
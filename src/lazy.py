@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import importlib
+import threading
+
+from types import ModuleType
+from typing import Any
+
+
+class LazyModule:
+    def __init__(self, name: str):
+        """A stand-in for a module, imported on the first access to one of its
+        attributes, e.g., OR-Tools or matplotlib, whose import takes hundreds of
+        milliseconds that the layers not using them should not pay.
+
+        Annotations referring to the module must be strings, since evaluating
+        them would import it.
+
+        Args:
+            name : The full name of the module (e.g., "matplotlib.pyplot").
+        """
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self) -> ModuleType:
+        """Imports the module (once), and returns it."""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        """True once the module has been imported."""
+        return self._module is not None
+
+    def __getattr__(self, attribute: str) -> Any:
+        # Only called for the attributes this object does not have.
+        return getattr(self.load(), attribute)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
@@ -1,229 +1,917 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from typing import List
-from ortools.sat.python import cp_model
+import numpy as np
+import sys
+import threading
+import time
 
-import src.data_structures as ds
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Tuple, Union
 
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
 
-def minimize_output_size(
-    layers: List[ds.Layer], segments: List[ds.Segment], verbose: bool = False
-) -> List[ds.Allocation]:
-    # Pre-compute some sizes, and indices.
-    num_layers, num_segments = len(layers), len(segments)
+import src.data_structures as ds
+import src.graph as graph
+import src.lazy as lazy
+import src.presolve as presolve
+import src.quantize as quantize
+
+# OR-Tools is imported on the first model, to keep the import of this module (and
+# of those using its configs and results) fast. Annotations refer to it by string.
+cp_model = lazy.LazyModule("ortools.sat.python.cp_model")
+
+# The formulations available for the ordering constraints.
+ORDERINGS: Tuple[str, ...] = ("pairwise", "linear")
+
+
+def add_ordering_constraints(
+    model: "cp_model.CpModel",
+    x: Dict[Tuple[int, int], "cp_model.IntVar"],
+    num_layers: int,
+    num_segments: int,
+    ordering: str = "pairwise",
+) -> None:
+    """Adds the constraints placing the layers in an ordered fashion inside the
+    segments, i.e., if layer l0 is in segment s0, no layer l1 < l0 can be placed
+    in a segment s1 > s0.
+    Args:
+        model (cp_model.CpModel): The model we are adding the constraints to.
+        x (Dict[Tuple[int, int], cp_model.IntVar]): The allocation variables,
+            missing pairs are placements ruled out by the presolve.
+        num_layers (int): The number of layers.
+        num_segments (int): The number of segments.
+        ordering (str): Either "pairwise", which adds one implication for each
+            (s0, l0, s1, l1) quadruple, or "linear", which states that the index
+            of the segment of each layer never decreases, with O(L * S) terms.
+    """
     all_layers, all_segments = range(num_layers), range(num_segments)
-    # Compute the maximum output size of all layers.
-    max_output_size = max([layer.output_size for layer in layers])
-    # Store the output size of each layer.
-    output_sizes = [layer.output_size for layer in layers]
-
-    # ==============================================
-    # OPTIMIZE
-    # ==============================================
+    # The segments each layer can be placed in (all of them, without presolve).
+    segments_of = [[s for s in all_segments if (l, s) in x] for l in all_layers]
+    if ordering == "pairwise":
+        for s0 in all_segments:
+            for l0 in all_layers:
+                if (l0, s0) not in x:
+                    continue
+                for l1 in range(0, l0):
+                    for s1 in segments_of[l1]:
+                        if s1 > s0:
+                            model.AddImplication(x[l0, s0], x[l1, s1].Not())
+    elif ordering == "linear":
+        # The index of the segment each layer is placed in.
+        z = []
+        for l in all_layers:
+            lb, ub = min(segments_of[l], default=0), max(segments_of[l], default=0)
+            z.append(model.NewIntVar(lb=lb, ub=ub, name=f"z_{l}"))
+            model.Add(z[l] == sum(x[l, s] * s for s in segments_of[l]))
+        # Consecutive layers are placed in non-decreasing segments.
+        for l in range(0, num_layers - 1):
+            model.Add(z[l] <= z[l + 1])
+    else:
+        raise ValueError(f"Unknown ordering '{ordering}', expected one of {ORDERINGS}.")
+
+
+# The objectives that can be set on a `LoScModel`.
+OBJECTIVES: Tuple[str, ...] = ("output_size", "knapsack")
+
+# The encodings available for the output size objective.
+OUTPUT_ENCODINGS: Tuple[str, ...] = ("element", "linear")
+
+
+@dataclass
+class SolverConfig:
+    """Parameters of the CP-SAT search.
+
+    Attributes
+    ----------
+    num_workers: int
+        The number of parallel search workers, 0 lets CP-SAT decide.
+    time_limit: float
+        The maximum search time in seconds, None for no limit.
+    relative_gap: float
+        The search stops when |objective - bound| <= relative_gap * |objective|.
+    random_seed: int
+        The seed of the search, None to use the CP-SAT default.
+    solution_callback: Callable[[float, float, float], None]
+        Called with (objective, bound, time) on each improving solution, where
+        time is in seconds since the search started, see `SolveStats.progress`.
+    stats_sink: Callable[[SolveStats], None]
+        Called with the `SolveStats` of each solve, successful or not.
+    time_presolve: bool
+        If true, the CP-SAT log is captured to time its presolve, see
+        `SolveStats.presolve_time`.
+    """
+
+    num_workers: int = 0
+    time_limit: float = None
+    relative_gap: float = None
+    random_seed: int = None
+    solution_callback: Callable[[float, float, float], None] = None
+    stats_sink: Callable[["SolveStats"], None] = None
+    time_presolve: bool = False
+
+    def apply(self, solver: "cp_model.CpSolver") -> None:
+        """Sets the parameters of the given solver."""
+        solver.parameters.num_workers = self.num_workers
+        if self.time_limit is not None:
+            solver.parameters.max_time_in_seconds = self.time_limit
+        if self.relative_gap is not None:
+            solver.parameters.relative_gap_limit = self.relative_gap
+        if self.random_seed is not None:
+            solver.parameters.random_seed = self.random_seed
+
+
+@dataclass
+class SolveStats:
+    """Instrumentation of a solve.
+
+    Attributes
+    ----------
+    objective: str
+        The objective of the model.
+    status: str
+        The CP-SAT status of the search.
+    num_layers: int
+        The number of layers.
+    num_segments: int
+        The number of segments.
+    variables: Dict[str, int]
+        The number of variables of each family (e.g., "allocation", "ordering").
+    constraints: Dict[str, int]
+        The number of constraints of each family.
+    build_times: Dict[str, float]
+        The seconds spent in Python building each family.
+    windows_time: float
+        The seconds spent computing the placements, see `presolve.segment_windows`.
+    build_time: float
+        The seconds spent building the model, including `windows_time`.
+    presolve_time: float
+        The seconds spent in the CP-SAT presolve, None unless
+        `SolverConfig.time_presolve` is set.
+    solve_time: float
+        The wall time of the CP-SAT search (presolve included) in seconds.
+    extract_time: float
+        The seconds spent reading the solution into allocations.
+    num_branches: int
+        The number of branches of the search.
+    num_conflicts: int
+        The number of conflicts of the search.
+    deterministic_time: float
+        The deterministic time of the search, stable across machines.
+    progress: List[Tuple[float, float, float]]
+        The (time, objective, bound) of each improvement of the objective or of
+        the bound during the search, in order: the seconds since the search
+        started, the best objective (None before the first solution), and the
+        best bound (None before the first one).
+    peak_rss: int
+        The peak resident set size of the process in bytes (None if unknown).
+    """
+
+    objective: str
+    status: str = None
+    num_layers: int = 0
+    num_segments: int = 0
+    variables: Dict[str, int] = field(default_factory=dict)
+    constraints: Dict[str, int] = field(default_factory=dict)
+    build_times: Dict[str, float] = field(default_factory=dict)
+    windows_time: float = 0.0
+    build_time: float = 0.0
+    presolve_time: float = None
+    solve_time: float = 0.0
+    extract_time: float = 0.0
+    num_branches: int = 0
+    num_conflicts: int = 0
+    deterministic_time: float = 0.0
+    progress: List[Tuple[float, float, float]] = field(default_factory=list)
+    peak_rss: int = None
+
+
+def peak_rss() -> int:
+    """Returns the peak resident set size of the process in bytes, or None."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+@dataclass
+class SolveResult:
+    """Outcome of a solve.
+
+    Attributes
+    ----------
+    status: str
+        The CP-SAT status, either "OPTIMAL" or "FEASIBLE". When the budgets were
+        rounded (see `quantize.Quantization.exact_budgets`), "OPTIMAL" only if the
+        objective meets the bound of the relaxed budgets.
+    objective: float
+        The objective value of the returned allocations.
+    bound: float
+        The best proven lower bound of the objective. When the budgets were
+        rounded, which cuts off allocations of the original problem, the bound of
+        a second search over the budgets rounded the other way (None if that
+        search found no solution).
+    gap: float
+        The relative gap between objective and bound (0 when optimal, None
+        without a bound).
+    wall_time: float
+        The wall time of the search in seconds (of both searches when the budgets
+        were rounded).
+    allocations: List[ds.Allocation]
+        The allocations of the used segments.
+    stats: SolveStats
+        The instrumentation of the solve (None if not solved by a `LoScModel`).
+    error_bound: float
+        How much the objective can exceed the optimum because of the rounding of
+        the output sizes, and of the budgets, see
+        `quantize.Quantization.error_bound` (None without a bound).
+    """
+
+    status: str
+    objective: float
+    bound: float
+    gap: float
+    wall_time: float
+    allocations: List[ds.Allocation] = field(default_factory=list)
+    stats: SolveStats = None
+    error_bound: float = 0.0
+
+
+def relative_gap(objective: float, bound: float) -> float:
+    """Computes the relative gap between an objective value and its bound."""
+    return abs(objective - bound) / max(1.0, abs(objective))
+
+
+class _Progress:
+    def __init__(
+        self,
+        progress: List[Tuple[float, float, float]],
+        callback: Callable[[float, float, float], None] = None,
+    ):
+        """Records the improvements of the objective and of the bound, reported
+        by the solution and the bound callbacks of CP-SAT (from the threads of
+        the search), on a single clock: the seconds since the search started.
+
+        Args:
+            progress : Where the (time, objective, bound) entries are appended.
+            callback : Called with (objective, bound, time) on each solution.
+        """
+        self.progress = progress
+        self.callback = callback
+        self.objective, self.bound = None, None
+        self._lock = threading.Lock()
+        self.start = time.perf_counter()
+
+    def record(self, objective: float = None, bound: float = None) -> None:
+        """Appends the current incumbent and best bound (both objectives are
+        minimized), after an improvement of either."""
+        with self._lock:
+            if objective is not None:
+                self.objective = objective
+            if bound is not None:
+                self.bound = bound if self.bound is None else max(self.bound, bound)
+            entry = (time.perf_counter() - self.start, self.objective, self.bound)
+            self.progress.append(entry)
+        if objective is not None and self.callback is not None:
+            self.callback(entry[1], entry[2], entry[0])
+
+
+@lru_cache(maxsize=None)
+def _solution_callback_class() -> type:
+    """Defines the solution callback, which derives from the one of CP-SAT, thus
+    only once OR-Tools is imported."""
+
+    class _SolutionCallback(cp_model.CpSolverSolutionCallback):
+        def __init__(self, progress: _Progress):
+            """Records the improving solutions of the search, see `_Progress`."""
+            super().__init__()
+            self.recorder = progress
+
+        def on_solution_callback(self) -> None:
+            self.recorder.record(self.ObjectiveValue(), self.BestObjectiveBound())
+
+    return _SolutionCallback
+
+
+class _PresolveTimer:
+    def __init__(self):
+        """Times the CP-SAT presolve from the lines of its log."""
+        self.start, self.end = None, None
+
+    def __call__(self, line: str) -> None:
+        if self.start is None and line.startswith("Starting presolve"):
+            self.start = time.perf_counter()
+        elif self.end is None and line.startswith("Presolve summary"):
+            self.end = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+
+class LoScModel:
+    def __init__(
+        self,
+        layers: List[ds.Layer],
+        segments: List[ds.Segment],
+        ordering: str = "pairwise",
+        presolve: bool = True,
+        output_encoding: str = "element",
+        quantization: quantize.Quantization = None,
+        edges: np.ndarray = None,
+    ):
+        """Builds the variables and constraints shared by all the objectives.
+
+        The model can then be solved several times, swapping the objective and
+        changing the per-segment budgets in between. Each solve is hinted with
+        the previous solution.
+
+        Args:
+            layers   : The list of layers, in execution order.
+            segments : The list of execution segments, in order.
+            ordering : The formulation of the ordering constraints, see
+                       `add_ordering_constraints`.
+            presolve : If true, the variables are created only for the placements
+                       allowed by `presolve.segment_windows`.
+            output_encoding : Either "element", which selects the output size of
+                       the last layer of each segment through its index, or
+                       "linear", which flags the last layer of each segment
+                       with booleans, giving a linear objective.
+            quantization : The units of the coefficients of the model, None to use
+                       bytes and ms. The allocations and the objective refer to
+                       the exact values anyway, see `quantize.Quantization`.
+            edges    : The (producer, consumer) skip edges of the layers, whose
+                       outputs are held across the splits they cross, see
+                       `graph.last_use`. None for a chain.
+        """
+        if output_encoding not in OUTPUT_ENCODINGS:
+            raise ValueError(
+                f"Unknown output encoding '{output_encoding}', expected one of {OUTPUT_ENCODINGS}."
+            )
+        self.layers = list(layers)
+        self.segments = list(segments)
+        self.ordering = ordering
+        self.presolve = presolve
+        self.output_encoding = output_encoding
+        self.quantization = quantization
+        self.edges = edges
+        self.objective = None
+        # Pre-compute some sizes, and indices.
+        self.num_layers, self.num_segments = len(self.layers), len(self.segments)
+        # The (layer, segment) placements of the last solution, used as hints.
+        self.placement = set()
+        # The running search (if any), and whether `stop` was called before it.
+        self._lock = threading.Lock()
+        self._solver = None
+        self._stopped = False
+        self._build()
+
+    @contextmanager
+    def _family(self, name: str) -> Iterator[None]:
+        """Accounts the variables, constraints, and time added inside the block
+        to the given family, see `SolveStats`."""
+        proto = self.model.Proto()
+        variables, constraints = len(proto.variables), len(proto.constraints)
+        start = time.perf_counter()
+        yield
+        self.build_times[name] = (
+            self.build_times.get(name, 0.0) + time.perf_counter() - start
+        )
+        self.variables[name] = (
+            self.variables.get(name, 0) + len(proto.variables) - variables
+        )
+        self.constraints[name] = (
+            self.constraints.get(name, 0) + len(proto.constraints) - constraints
+        )
 
-    # Declare the model.
-    model = cp_model.CpModel()
+    def _build(self) -> None:
+        """Builds the model for the current budgets of the segments."""
+        all_layers, all_segments = range(self.num_layers), range(self.num_segments)
+        # The import of OR-Tools (by the first model) is not part of the build.
+        cp_model.load()
+        start = time.perf_counter()
+
+        # ==============================================
+        # PRESOLVE
+        # ==============================================
+
+        # Compute the placements that can be part of a solution. This fails early,
+        # naming the offending layer, when the problem is infeasible.
+        # The values the model is built with, in the units of the quantization.
+        if self.quantization is not None:
+            layers, segments = self.quantization.apply(self.layers, self.segments)
+        else:
+            layers, segments = self.layers, self.segments
+        memory = ds.column(layers, "memory").tolist()
+        runtime = ds.column(layers, "runtime").tolist()
+        avail_memory = ds.column(segments, "avail_memory").tolist()
+        avail_time = ds.column(segments, "avail_time").tolist()
+        # The memory held across a split after each layer, skip tensors included.
+        self.split_costs = graph.split_costs(self.layers, self.edges)
+        if self.quantization is not None:
+            self.output_sizes = self.quantization.cost(self.split_costs).tolist()
+        else:
+            self.output_sizes = self.split_costs.tolist()
+        if self.presolve:
+            try:
+                pairs = presolve.segment_windows(layers, segments).pairs()
+            except presolve.InfeasibleLayerError as error:
+                # Not a proof when the budgets were rounded down, see `solve`.
+                if (
+                    self.quantization is not None
+                    and not self.quantization.exact_budgets
+                ):
+                    error.status = "UNKNOWN"
+                raise
+        else:
+            pairs = [(l, s) for l in all_layers for s in all_segments]
+        self.windows_time = time.perf_counter() - start
+        # The budgets the presolve relied on, relaxing them requires a new model.
+        self.basis = [(seg.avail_memory, seg.avail_time) for seg in self.segments]
+        self.stale = False
+        # The layers which can be placed in each segment.
+        layers_of = [[] for _ in all_segments]
+        for l, s in pairs:
+            layers_of[s].append(l)
+        self.layers_of = layers_of
+
+        # ==============================================
+        # OPTIMIZE
+        # ==============================================
+
+        # Declare the model.
+        self.model = model = cp_model.CpModel()
+        # The size of the model, and the time spent building it, by family.
+        self.variables: Dict[str, int] = {}
+        self.constraints: Dict[str, int] = {}
+        self.build_times: Dict[str, float] = {}
+
+        # ==============================================
+        # OPTIMIZE (VARIABLES)
+        # ==============================================
+
+        # Initialize the decision variable x[l, s].
+        self.x = x = {}
+        with self._family("allocation"):
+            for l, s in pairs:
+                x[l, s] = model.NewBoolVar(f"x_{l}_{s}")
+
+        # Determines if a segment is in use.
+        self.u = u = []
+        with self._family("usage"):
+            for s in all_segments:
+                u.append(model.NewBoolVar(name=f"u_{s}"))
+
+        # The variables of the output size objective, built on first use.
+        self.i, self.y, self._y = [], [], []
+        self.last = {}
+
+        # ==============================================
+        # OPTIMIZE (CONSTRAINTS)
+        # ==============================================
+
+        # Each layer is assigned to exactly one execution segment.
+        with self._family("allocation"):
+            for l in all_layers:
+                model.AddExactlyOne(x[l, s] for s in all_segments if (l, s) in x)
+
+        # The amount of occupied memory in each execution segment cannot exceed its
+        # memory. We keep the indices of the constraints, so that the budgets can be
+        # changed later, see `set_segment_budget`. The rows without any term (e.g.,
+        # segments without any possible layer) are constants, not linear (None).
+        self.memory_rows = []
+        with self._family("memory"):
+            for s in all_segments:
+                row = sum(x[l, s] * memory[l] for l in layers_of[s]) <= avail_memory[s]
+                constraint = model.Add(row)
+                self.memory_rows.append(
+                    None if isinstance(row, bool) else constraint.Index()
+                )
+
+        # The runtime for the layers executed in each execution segment cannot exceed
+        # its duration.
+        self.time_rows = []
+        with self._family("time"):
+            for s in all_segments:
+                row = sum(x[l, s] * runtime[l] for l in layers_of[s]) <= avail_time[s]
+                constraint = model.Add(row)
+                self.time_rows.append(
+                    None if isinstance(row, bool) else constraint.Index()
+                )
+
+        # The layers are placed in an ordered fashion inside the sequences.
+        with self._family("ordering"):
+            add_ordering_constraints(
+                model, x, self.num_layers, self.num_segments, self.ordering
+            )
+
+        # Set `u` as the maximum value between the allocations `x` of a given segment.
+        with self._family("usage"):
+            for s in all_segments:
+                if layers_of[s]:
+                    model.AddMaxEquality(u[s], [x[l, s] for l in layers_of[s]])
+                else:
+                    model.Add(u[s] == 0)
+
+            # If a segment in position `s` is NOT used the next segment `s + 1` CANNOT be used.
+            for s in range(0, self.num_segments - 1):
+                model.AddImplication(u[s].Not(), u[s + 1].Not())
+        self.build_time = time.perf_counter() - start
+
+        # Restore the objective, if the model is being re-built.
+        if self.objective is not None:
+            self.set_objective(self.objective)
+
+    def _build_output_size(self) -> None:
+        """Adds the variables and constraints computing the output size of the
+        last layer placed inside each execution segment."""
+        model, x, u = self.model, self.x, self.u
+        all_segments = range(self.num_segments)
+        # Store the output size of each layer.
+        output_sizes = self.output_sizes
+        # Compute the maximum output size of all layers.
+        max_output_size = max(output_sizes)
+
+        # This decision variable will act as an index to the last layer placed in an
+        # execution segment.
+        for s in all_segments:
+            self.i.append(model.NewIntVar(lb=0, ub=self.num_layers, name=f"i_{s}"))
 
-    # ==============================================
-    # OPTIMIZE (VARIABLES)
-    # ==============================================
+        # This decision variable will be set to the output size of the last layer
+        # placed in an execution segment.
+        for s in all_segments:
+            self.y.append(model.NewIntVar(lb=0, ub=max_output_size, name=f"y_{s}"))
+            self._y.append(model.NewIntVar(lb=0, ub=max_output_size, name=f"_y_{s}"))
 
-    # Initialize the decision variable x[l, s].
-    x = {}
-    for l in all_layers:
+        # The index variable, will be assigned the index of the last layer placed inside
+        # a segment. We use (l + 1) because the first element at index 0, is a placeholder
+        # of value 0.
+        for s in all_segments:
+            if self.layers_of[s]:
+                model.AddMaxEquality(
+                    self.i[s], [x[l, s] * l for l in self.layers_of[s]]
+                )
+            else:
+                model.Add(self.i[s] == 0)
+
+        # With this one, we basically implement:
+        #   y[s] = output_sizes[i[s]] * u[s]
+        # When writing a CP problem, we canno simply use a decision variable as index,
+        # we need to do a couple of extra steps, as you might have noticed. Furthermore,
+        # we conside the output size only if the segment is in use.
         for s in all_segments:
-            x[l, s] = model.NewBoolVar(f"x_{l}_{s}")
-
-    # This decision variable will act as an index to the last layer placed in an
-    # execution segment.
-    i = []
-    for s in all_segments:
-        i.append(model.NewIntVar(lb=0, ub=num_layers, name=f"i_{s}"))
-
-    # This decision variable will be set to the output size of the last layer
-    # placed in an execution segment.
-    y, _y = [], []
-    for s in all_segments:
-        y.append(model.NewIntVar(lb=0, ub=max_output_size, name=f"y_{s}"))
-        _y.append(model.NewIntVar(lb=0, ub=max_output_size, name=f"_y_{s}"))
-
-    # Determines if a segment is in use.
-    u = []
-    for s in all_segments:
-        u.append(model.NewBoolVar(name=f"u_{s}"))
-
-    # ==============================================
-    # OPTIMIZE (CONSTRAINTS)
-    # ==============================================
-
-    # Each layer is assigned to exactly one execution segment.
-    for l in all_layers:
-        model.AddExactlyOne(x[l, s] for s in all_segments)
-
-    # The amount of occupied memory in each execution segment cannot exceed its memory.
-    for s in all_segments:
-        model.Add(
-            sum(x[l, s] * layers[l].memory for l in all_layers)
-            <= segments[s].avail_memory
+            model.AddElement(self.i[s], output_sizes, self._y[s])
+            model.AddMultiplicationEquality(self.y[s], [self._y[s], u[s]])
+
+    def _build_last_layer(self) -> None:
+        """Adds the booleans flagging the last layer placed inside each segment."""
+        model, x, u = self.model, self.x, self.u
+        # Since layers are placed in order, layer l is the last layer of segment s
+        # when it is in s and layer (l + 1) is not:
+        #   last[l, s] = x[l, s] and not x[l + 1, s]
+        # which only needs linear constraints, no AddElement or AddMultiplicationEquality.
+        for (l, s), var in x.items():
+            self.last[l, s] = model.NewBoolVar(f"last_{l}_{s}")
+            model.AddImplication(self.last[l, s], var)
+            if (l + 1, s) in x:
+                model.Add(self.last[l, s] >= var - x[l + 1, s])
+                model.AddImplication(self.last[l, s], x[l + 1, s].Not())
+            else:
+                model.Add(self.last[l, s] == var)
+        # Each used segment has exactly one last layer, which tightens the relaxation.
+        for s in range(self.num_segments):
+            model.Add(sum(self.last[l, s] for l in self.layers_of[s]) == u[s])
+
+    def set_objective(self, objective: str) -> None:
+        """Replaces the objective of the model.
+        Args:
+            objective (str): Either "output_size", to minimize the output size of
+                the last layer placed inside each execution segment, or "knapsack",
+                to minimize the number of used segments.
+        """
+        all_segments = range(self.num_segments)
+        start = time.perf_counter()
+        if objective == "output_size":
+            if self.output_encoding == "element":
+                if not self.y:
+                    with self._family("output_size"):
+                        self._build_output_size()
+                output_size = sum(self.y[s] for s in all_segments)
+            else:
+                if not self.last:
+                    with self._family("last_layer"):
+                        self._build_last_layer()
+                output_size = sum(
+                    self.output_sizes[l] * var for (l, s), var in self.last.items()
+                )
+            self.model.ClearObjective()
+            # The following code defines the objective function for the problem. In our
+            # case we want to minimize the **memory to store** in memory by the **last
+            # layer** placed **inside an execution segment**.
+            self.model.Minimize(output_size)
+        elif objective == "knapsack":
+            self.model.ClearObjective()
+            # Minimize the number of used segments.
+            self.model.Minimize(sum(self.u[s] for s in all_segments))
+        else:
+            raise ValueError(
+                f"Unknown objective '{objective}', expected one of {OBJECTIVES}."
+            )
+        self.objective = objective
+        self.build_time += time.perf_counter() - start
+
+    def set_segment_budget(
+        self, s: int, avail_memory: int = None, avail_time: int = None
+    ) -> None:
+        """Tightens or relaxes the budgets of the segment in position `s`.
+        Args:
+            s (int): The position of the segment.
+            avail_memory (int): The new available memory, None to keep it.
+            avail_time (int): The new available time, None to keep it.
+        """
+        segment = self.segments[s]
+        avail_memory = segment.avail_memory if avail_memory is None else avail_memory
+        avail_time = segment.avail_time if avail_time is None else avail_time
+        # The presolve removed the placements violating the old budgets, relaxing
+        # them requires building the model again (lazily, at the next solve).
+        basis_memory, basis_time = self.basis[s]
+        if self.presolve and (avail_memory > basis_memory or avail_time > basis_time):
+            self.stale = True
+        # The constraints are stored as `lb <= sum(...) <= ub`, we only move `ub`.
+        # The rows without any term have no linear constraint to update.
+        memory_budget, time_budget = avail_memory, avail_time
+        if self.quantization is not None:
+            memory_unit = self.quantization.memory_unit
+            time_unit = self.quantization.time_unit
+            memory_budget = int(self.quantization.capacity(avail_memory, memory_unit))
+            time_budget = int(self.quantization.capacity(avail_time, time_unit))
+            if avail_memory % memory_unit or avail_time % time_unit:
+                # Rounded, a copy since the quantization may be shared.
+                self.quantization = replace(self.quantization, exact_budgets=False)
+        constraints = self.model.Proto().constraints
+        for row, budget in (
+            (self.memory_rows[s], memory_budget),
+            (self.time_rows[s], time_budget),
+        ):
+            if row is not None:
+                constraints[row].linear.domain[-1] = budget
+        # Never change the segments of the caller, the allocations will reference a copy.
+        self.segments[s] = ds.Segment(segment.id, avail_memory, avail_time)
+
+    def set_budgets(
+        self, avail_memory: List[int] = None, avail_time: List[int] = None
+    ) -> None:
+        """Changes the budgets of all the segments at once.
+        Args:
+            avail_memory (List[int]): The new available memory of each segment.
+            avail_time (List[int]): The new available time of each segment.
+        """
+        for s in range(self.num_segments):
+            self.set_segment_budget(
+                s,
+                avail_memory[s] if avail_memory is not None else None,
+                avail_time[s] if avail_time is not None else None,
+            )
+
+    def set_hint(self, allocations: List[ds.Allocation]) -> None:
+        """Starts the next search from the given allocations, e.g., those of
+        `greedy.solve_greedy`, instead of the previous solution.
+
+        Since the used segments are the first ones, and receive the layers in
+        order, the k-th allocation is the one of the k-th segment.
+        Args:
+            allocations (List[ds.Allocation]): The allocations of the used segments.
+        """
+        placement, l = set(), 0
+        for s, allocation in enumerate(allocations):
+            for _ in allocation.layers:
+                placement.add((l, s))
+                l += 1
+        self.placement = placement
+
+    def stop(self) -> None:
+        """Stops the running search, from another thread, as soon as possible. The
+        search returns the best solution found so far, or raises
+        `ds.NoSolutionError` (status "UNKNOWN") if none. When no search is running,
+        the next one is stopped before it starts instead."""
+        with self._lock:
+            if self._solver is not None:
+                self._solver.StopSearch()
+            else:
+                self._stopped = True
+
+    def solve(self, config: SolverConfig = None) -> SolveResult:
+        """Solves the model with the current objective and budgets.
+
+        A feasible but not proven optimal solution (e.g., when the time limit is
+        reached) is returned, with status "FEASIBLE".
+
+        Args:
+            config (SolverConfig): The parameters of the search.
+        Returns:
+            SolveResult: The status, objective, bound, and allocations.
+        """
+        if self.objective is None:
+            raise Exception("The objective of the model has not been set.")
+        config = config if config is not None else SolverConfig()
+        all_segments = range(self.num_segments)
+
+        if self.stale:
+            self._build()
+
+        # Start the search from the previous solution, if any.
+        self.model.ClearHints()
+        if self.placement:
+            for (l, s), var in self.x.items():
+                self.model.AddHint(var, (l, s) in self.placement)
+
+        # ==============================================
+        # OPTIMIZE (SOlVE)
+        # ==============================================
+
+        # Create the solver and run it on the model.
+        solver = cp_model.CpSolver()
+        config.apply(solver)
+        stats = SolveStats(
+            objective=self.objective,
+            num_layers=self.num_layers,
+            num_segments=self.num_segments,
+            variables=dict(self.variables),
+            constraints=dict(self.constraints),
+            build_times=dict(self.build_times),
+            windows_time=self.windows_time,
+            build_time=self.build_time,
         )
-
-    # The runtime for the layers executed in each execution segment cannot exceed its duration.
-    for s in all_segments:
-        model.Add(
-            sum(x[l, s] * layers[l].runtime for l in all_layers)
-            <= segments[s].avail_time
+        presolve_timer = None
+        if config.time_presolve:
+            presolve_timer = _PresolveTimer()
+            solver.parameters.log_search_progress = True
+            solver.parameters.log_to_stdout = False
+            solver.log_callback = presolve_timer
+        with self._lock:
+            stopped, self._stopped = self._stopped, False
+            self._solver = None if stopped else solver
+        if stopped:
+            raise ds.NoSolutionError("The search was stopped.", "UNKNOWN")
+        # Record the progression of the bound, along with the solutions.
+        progress = _Progress(stats.progress, config.solution_callback)
+        solver.best_bound_callback = lambda bound: progress.record(bound=bound)
+        try:
+            status = solver.Solve(self.model, _solution_callback_class()(progress))
+        finally:
+            with self._lock:
+                self._solver = None
+        stats.status = solver.StatusName(status)
+        stats.solve_time = solver.WallTime()
+        stats.presolve_time = presolve_timer.elapsed if presolve_timer else None
+        stats.num_branches = solver.NumBranches()
+        stats.num_conflicts = solver.NumConflicts()
+        stats.deterministic_time = solver.ResponseProto().deterministic_time
+        # Budgets rounded down may cut off the optimal allocations, or all of them,
+        # thus neither the optimality nor the infeasibility carry over.
+        exact = self.quantization is None or self.quantization.exact_budgets
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            self._report(stats, config)
+            status_name = solver.StatusName(status)
+            if status == cp_model.INFEASIBLE and not exact:
+                status_name = "UNKNOWN"
+            raise ds.NoSolutionError(
+                f"The problem does not have a solution ({solver.StatusName(status)}).",
+                status_name,
+            )
+
+        # ==============================================
+        # OPTIMIZE (SOLUTION)
+        # ==============================================
+        start = time.perf_counter()
+        self.placement = {key for key, var in self.x.items() if solver.Value(var)}
+        allocations, splits = [], []
+        for s in all_segments:
+            placed = [l for l in self.layers_of[s] if (l, s) in self.placement]
+            if placed:
+                allocations.append(
+                    ds.Allocation(self.segments[s], [self.layers[l] for l in placed])
+                )
+                splits.append(max(placed))
+        stats.extract_time = time.perf_counter() - start
+        self._report(stats, config)
+        objective, bound = solver.ObjectiveValue(), solver.BestObjectiveBound()
+        wall_time = solver.WallTime()
+        error_bound = 0.0
+        if self.quantization is not None and self.objective == "output_size":
+            # Recompute the exact objective, and bound it from the quantized one.
+            error_bound = self.quantization.error_bound(self.num_segments)
+            objective = float(self.split_costs[np.array(splits, dtype=np.int64)].sum())
+            bound = self.quantization.lower_bound(bound, self.num_segments)
+        gap = (
+            0.0
+            if status == cp_model.OPTIMAL and not error_bound
+            else relative_gap(objective, bound)
+        )
+        status_name = solver.StatusName(status)
+        if not exact and not self.quantization.relax:
+            # The bound of the relaxed budgets is the one of the original problem.
+            relaxed = self._solve_relaxed(config, allocations)
+            bound = relaxed.bound if relaxed is not None else None
+            if relaxed is not None:
+                wall_time += relaxed.wall_time
+            error_bound = self.quantization.error_bound(
+                self.num_segments, objective, bound
+            )
+            gap = relative_gap(objective, bound) if bound is not None else None
+            status_name = (
+                "OPTIMAL" if bound is not None and objective <= bound else "FEASIBLE"
+            )
+        return SolveResult(
+            status=status_name,
+            objective=objective,
+            bound=bound,
+            gap=gap,
+            wall_time=wall_time,
+            allocations=allocations,
+            stats=stats,
+            error_bound=error_bound,
         )
 
-    # The layers are placed in an ordered fashion inside the sequences.
-    for s0 in all_segments:
-        for l0 in all_layers:
-            for s1 in range(s0 + 1, num_segments):
-                for l1 in range(0, l0):
-                    model.AddImplication(x[l0, s0], x[l1, s1].Not())
-
-    # Set `u` as the maximum value between the allocations `x` of a given segment.
-    for s in all_segments:
-        model.AddMaxEquality(u[s], [x[l, s] for l in all_layers])
-
-    # If a segment in position `s` is NOT used the next segment `s + 1` CANNOT be used.
-    for s in range(0, num_segments - 1):
-        model.AddImplication(u[s].Not(), u[s + 1].Not())
-
-    # The index variable, will be assigned the index of the last layer placed inside
-    # a segment. We use (l + 1) because the first element at index 0, is a placeholder
-    # of value 0.
-    for s in all_segments:
-        model.AddMaxEquality(i[s], [x[l, s] * l for l in all_layers])
-
-    # With this one, we basically implement:
-    #   y[s] = output_sizes[i[s]] * u[s]
-    # When writing a CP problem, we canno simply use a decision variable as index,
-    # we need to do a couple of extra steps, as you might have noticed. Furthermore,
-    # we conside the output size only if the segment is in use.
-    for s in all_segments:
-        model.AddElement(i[s], output_sizes, _y[s])
-        model.AddMultiplicationEquality(y[s], [_y[s], u[s]])
-
-    # ==============================================
-    # OPTIMIZE (OBJECTIVE)
-    # ==============================================
-
-    # The following code defines the objective function for the problem. In our case
-    # we want to minimize the **memory to store** in memory by the **last layer**
-    # placed **inside an execution segment**.
-    model.Minimize(sum(y[s] for s in all_segments))
-
-    # ==============================================
-    # OPTIMIZE (SOlVE)
-    # ==============================================
-
-    # Create the solver and run it on the model.
-    solver = cp_model.CpSolver()
-    status = solver.Solve(model)
-    if status != cp_model.OPTIMAL:
-        raise Exception("The problem does not have an optimal solution.")
-
-    # ==============================================
-    # OPTIMIZE (SOLUTION)
-    # ==============================================
-    allocations = []
-    for s in all_segments:
-        layers_in_segment = [layers[l] for l in all_layers if solver.Value(x[l, s])]
-        if layers_in_segment:
-            allocations.append(ds.Allocation(segments[s], layers_in_segment))
-    return allocations
-
-
-def knapsack(
-    layers: List[ds.Layer], segments: List[ds.Segment], verbose: bool = False
-) -> List[ds.Allocation]:
-    # Pre-compute some sizes, and indices.
-    num_layers, num_segments = len(layers), len(segments)
-    all_layers, all_segments = range(num_layers), range(num_segments)
-
-    # ==============================================
-    # OPTIMIZE
-    # ==============================================
-
-    # Declare the model.
-    model = cp_model.CpModel()
+    def _solve_relaxed(
+        self, config: SolverConfig, allocations: List[ds.Allocation]
+    ) -> SolveResult:
+        """Solves the model over the budgets rounded the other way, see
+        `quantize.Quantization.relaxed`, starting from the given allocations
+        (which are feasible for it). Returns None if it finds no solution."""
+        relaxed = LoScModel(
+            self.layers,
+            self.segments,
+            self.ordering,
+            self.presolve,
+            self.output_encoding,
+            self.quantization.relaxed(),
+            self.edges,
+        )
+        relaxed.set_hint(allocations)
+        relaxed.set_objective(self.objective)
+        try:
+            return relaxed.solve(
+                replace(config, solution_callback=None, stats_sink=None)
+            )
+        except ds.NoSolutionError:
+            return None
+
+    def _report(self, stats: SolveStats, config: SolverConfig) -> None:
+        """Completes the stats of a solve, and pushes them to the sink (if any)."""
+        stats.peak_rss = peak_rss()
+        if config.stats_sink is not None:
+            config.stats_sink(stats)
 
-    # ==============================================
-    # OPTIMIZE (VARIABLES)
-    # ==============================================
 
-    # Initialize the decision variable x[l, s].
-    x = {}
-    for l in all_layers:
-        for s in all_segments:
-            x[l, s] = model.NewBoolVar(f"x_{l}_{s}")
-
-    # Determines if a segment is in use.
-    u = []
-    for s in all_segments:
-        u.append(model.NewBoolVar(name=f"u_{s}"))
-
-    # ==============================================
-    # OPTIMIZE (CONSTRAINTS)
-    # ==============================================
-
-    # Each layer is assigned to exactly one execution segment.
-    for l in all_layers:
-        model.AddExactlyOne(x[l, s] for s in all_segments)
-
-    # The amount of occupied memory in each execution segment cannot exceed its memory.
-    for s in all_segments:
-        model.Add(
-            sum(x[l, s] * layers[l].memory for l in all_layers)
-            <= segments[s].avail_memory
-        )
+def minimize_output_size(
+    layers: List[ds.Layer],
+    segments: List[ds.Segment],
+    verbose: bool = False,
+    ordering: str = "pairwise",
+    config: SolverConfig = None,
+    return_result: bool = False,
+    presolve: bool = True,
+    output_encoding: str = "element",
+    quantization: quantize.Quantization = None,
+    hint: List[ds.Allocation] = None,
+    edges: np.ndarray = None,
+) -> Union[List[ds.Allocation], SolveResult]:
+    model = LoScModel(
+        layers, segments, ordering, presolve, output_encoding, quantization, edges
+    )
+    if hint is not None:
+        model.set_hint(hint)
+    model.set_objective("output_size")
+    result = model.solve(config)
+    return result if return_result else result.allocations
 
-    # The runtime for the layers executed in each execution segment cannot exceed its duration.
-    for s in all_segments:
-        model.Add(
-            sum(x[l, s] * layers[l].runtime for l in all_layers)
-            <= segments[s].avail_time
-        )
 
-    # The layers are placed in an ordered fashion inside the sequences.
-    for s0 in all_segments:
-        for l0 in all_layers:
-            for s1 in range(s0 + 1, num_segments):
-                for l1 in range(0, l0):
-                    model.AddImplication(x[l0, s0], x[l1, s1].Not())
-
-    # Set `u` as the maximum value between the allocations `x` of a given segment.
-    for s in all_segments:
-        model.AddMaxEquality(u[s], [x[l, s] for l in all_layers])
-
-    # If a segment in position `s` is NOT used the next segment `s + 1` CANNOT be used.
-    for s in range(0, num_segments - 1):
-        model.AddImplication(u[s].Not(), u[s + 1].Not())
-
-    # ==============================================
-    # OPTIMIZE (OBJECTIVE)
-    # ==============================================
-
-    # Minimize the number of used segments.
-    model.Minimize(sum(u[s] for s in all_segments))
-
-    # ==============================================
-    # OPTIMIZE (SOlVE)
-    # ==============================================
-
-    # Create the solver and run it on the model.
-    solver = cp_model.CpSolver()
-    status = solver.Solve(model)
-    if status != cp_model.OPTIMAL:
-        raise Exception("The problem does not have an optimal solution.")
-
-    # ==============================================
-    # OPTIMIZE (SOLUTION)
-    # ==============================================
-    allocations = []
-    for s in all_segments:
-        layers_in_segment = [layers[l] for l in all_layers if solver.Value(x[l, s])]
-        if layers_in_segment:
-            allocations.append(ds.Allocation(segments[s], layers_in_segment))
-    return allocations
+def knapsack(
+    layers: List[ds.Layer],
+    segments: List[ds.Segment],
+    verbose: bool = False,
+    ordering: str = "pairwise",
+    config: SolverConfig = None,
+    return_result: bool = False,
+    presolve: bool = True,
+    quantization: quantize.Quantization = None,
+    hint: List[ds.Allocation] = None,
+    edges: np.ndarray = None,
+) -> Union[List[ds.Allocation], SolveResult]:
+    model = LoScModel(
+        layers, segments, ordering, presolve, quantization=quantization, edges=edges
+    )
+    if hint is not None:
+        model.set_hint(hint)
+    model.set_objective("knapsack")
+    result = model.solve(config)
+    return result if return_result else result.allocations
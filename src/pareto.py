@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Sequence
+
+import src.data_structures as ds
+import src.lazy as lazy
+import src.optimizer as optimizer
+
+# Imported on first use, by the sweeps.
+pd = lazy.LazyModule("pandas")
+
+# The columns of the table returned by `pareto_sweep`.
+COLUMNS: List[str] = [
+    "budget",
+    "output_size",
+    "bound",
+    "status",
+    "peak_memory",
+    "num_segments",
+    "wall_time",
+]
+
+
+def _capped(segments: List[ds.Segment], budget: int) -> List[ds.Segment]:
+    """Returns copies of the segments, with the available memory capped to `budget`."""
+    return [
+        ds.Segment(segment.id, min(segment.avail_memory, budget), segment.avail_time)
+        for segment in segments
+    ]
+
+
+def _failed_row(budget: int, status: str) -> Dict[str, Any]:
+    return dict(
+        budget=budget,
+        output_size=np.nan,
+        bound=np.nan,
+        status=status,
+        peak_memory=np.nan,
+        num_segments=0,
+        wall_time=0.0,
+    )
+
+
+def _sweep_chunk(
+    layers: List[ds.Layer],
+    segments: List[ds.Segment],
+    budgets: List[int],
+    config: optimizer.SolverConfig,
+    options: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """Solves the given budgets, in decreasing order, with a single model.
+
+    Each budget only tightens the previous one, thus the model is never rebuilt,
+    and each solve is hinted with the solution of the previous (larger) budget.
+    Once a budget is infeasible, all the smaller ones are infeasible too.
+    """
+    rows, model = [], None
+    for position, budget in enumerate(budgets):
+        try:
+            if model is None:
+                model = optimizer.LoScModel(
+                    layers, _capped(segments, budget), **options
+                )
+                model.set_objective("output_size")
+            else:
+                model.set_budgets(
+                    avail_memory=[min(s.avail_memory, budget) for s in segments]
+                )
+            result = model.solve(config)
+        except ds.NoSolutionError as error:
+            if error.status != "INFEASIBLE":
+                # No solution within the time limit, smaller budgets may still work.
+                rows.append(_failed_row(budget, error.status))
+                continue
+            rows.extend(_failed_row(b, "INFEASIBLE") for b in budgets[position:])
+            break
+        rows.append(
+            dict(
+                budget=budget,
+                output_size=result.objective,
+                bound=result.bound,
+                status=result.status,
+                peak_memory=max(a.get_used_memory() for a in result.allocations),
+                num_segments=len(result.allocations),
+                wall_time=result.wall_time,
+            )
+        )
+    return rows
+
+
+def pareto_front(frame: "pd.DataFrame") -> "pd.Series":
+    """Flags the points of a sweep which are not dominated, i.e., such that no
+    other point has both a smaller (or equal) budget and a smaller (or equal)
+    output size, with at least one of the two strictly smaller.
+    Args:
+        frame (pd.DataFrame): The table returned by `pareto_sweep`.
+    Returns:
+        pd.Series: A boolean series, true for the points on the front.
+    """
+    feasible = frame["output_size"].notna()
+    ordered = frame[feasible].sort_values(["budget", "output_size"])
+    # Walking by increasing budget, a point is on the front only if it strictly
+    # improves the best output size of all the smaller budgets.
+    best = ordered["output_size"].cummin().shift(fill_value=np.inf)
+    on_front = ordered["output_size"] < best
+    return on_front.reindex(frame.index, fill_value=False)
+
+
+def pareto_sweep(
+    layers: List[ds.Layer],
+    segments: List[ds.Segment],
+    budgets: Sequence[int],
+    workers: int = 1,
+    config: optimizer.SolverConfig = None,
+    keep_dominated: bool = False,
+    **options: Any,
+) -> "pd.DataFrame":
+    """Computes how the total output size changes as the segments memory shrinks.
+
+    Each budget caps the `avail_memory` of every segment. The budgets are sorted
+    in decreasing order, and split into `workers` contiguous chunks, each solved
+    by a process walking its chunk monotonically, warm-starting every solve from
+    the previous one.
+
+    Args:
+        layers (List[ds.Layer]): The list of layers, in execution order.
+        segments (List[ds.Segment]): The list of execution segments, in order.
+        budgets (Sequence[int]): The memory budgets (bytes) to evaluate.
+        workers (int): The number of worker processes.
+        config (optimizer.SolverConfig): The parameters of each search.
+        keep_dominated (bool): If true, the dominated (and infeasible) points are
+            kept, and flagged in the "dominated" column.
+        options (Any): The options of the `optimizer.LoScModel`, by default, the
+            linear ordering and output size encodings.
+    Returns:
+        pd.DataFrame: One row per point, sorted by budget, with the columns in
+            `COLUMNS` (plus "dominated", if `keep_dominated` is true).
+    """
+    options = {"ordering": "linear", "output_encoding": "linear", **options}
+    budgets = sorted(set(int(budget) for budget in budgets), reverse=True)
+    workers = max(1, min(workers, len(budgets)))
+    chunks = [
+        chunk.tolist() for chunk in np.array_split(budgets, workers) if len(chunk)
+    ]
+    if workers == 1:
+        rows = [
+            _sweep_chunk(layers, segments, chunk, config, options) for chunk in chunks
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_sweep_chunk, layers, segments, chunk, config, options)
+                for chunk in chunks
+            ]
+            rows = [future.result() for future in futures]
+    frame = pd.DataFrame([row for chunk in rows for row in chunk], columns=COLUMNS)
+    frame = frame.sort_values("budget").reset_index(drop=True)
+    on_front = pareto_front(frame)
+    if keep_dominated:
+        return frame.assign(dominated=~on_front)
+    return frame[on_front].reset_index(drop=True)
@@ -1,44 +1,149 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
+
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
 
-from typing import List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence, Tuple
 
 import src.data_structures as ds
+import src.lazy as lazy
+
+# Imported on the first plot, since matplotlib takes long to import.
+plt = lazy.LazyModule("matplotlib.pyplot")
+mticker = lazy.LazyModule("matplotlib.ticker")
+mcollections = lazy.LazyModule("matplotlib.collections")
+mfigure = lazy.LazyModule("matplotlib.figure")
 
 
 markers: List[str] = ["s", "o", "x", "d", "*", "^", "d", "v", "s", "*", "^"]
 
+# Above this many values, an integer axis gets a few round ticks instead of one
+# tick per value.
+MAX_TICKS = 40
+
+# Above this many splits, only some of the splitting points are labelled.
+MAX_LABELS = 40
+
+# Above this many layers, the per-layer curves are decimated, see `decimate`.
+MAX_POINTS = 2000
 
-def get_y_ranges(axes: List[plt.Axes]) -> Tuple[int, int]:
+
+def get_y_ranges(axes: List["plt.Axes"]) -> Tuple[int, int]:
     return min([ax.get_ylim()[0] for ax in axes]), max(
         [ax.get_ylim()[1] for ax in axes]
     )
 
 
+def _gather(
+    allocations: List[ds.Allocation],
+) -> Tuple[ds.LayerTable, np.ndarray, np.ndarray]:
+    """Returns the placed layers, the segment id of each of them, and the number
+    of layers of each non-empty allocation."""
+    allocations = [allocation for allocation in allocations if allocation.layers]
+    tables = [ds.LayerTable.from_layers(a.layers) for a in allocations]
+    counts = np.fromiter(map(len, tables), np.int64, len(tables))
+    segment_ids = np.repeat(
+        np.array([a.segment.id for a in allocations], dtype=np.int64), counts
+    )
+    return ds.LayerTable.concatenate(tables), segment_ids, counts
+
+
+def allocation_columns(
+    allocations: List[ds.Allocation],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Gathers the placed layers of the allocations into columns.
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The segment id and the layer id
+            of each placed layer, in order, and the number of layers of each
+            non-empty allocation.
+    """
+    layers, segment_ids, counts = _gather(allocations)
+    return segment_ids, layers.column("id"), counts
+
+
+def _segment_ends(
+    segment_ids: np.ndarray, layer_ids: np.ndarray, max_points: int = MAX_POINTS
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Keeps, above `max_points` layers, only the first and the last layer of each
+    segment, which draw the same lines, since the layers in between are
+    consecutive."""
+    if len(segment_ids) <= max_points:
+        return segment_ids, layer_ids
+    change = np.flatnonzero(np.diff(segment_ids)) + 1
+    keep = np.unique(np.concatenate(([0], change - 1, change, [len(segment_ids) - 1])))
+    return segment_ids[keep], layer_ids[keep]
+
+
+def decimate(
+    x: np.ndarray, y: np.ndarray, max_points: int = MAX_POINTS
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Keeps at most `max_points` points of a curve, the smallest and the largest
+    value of each of `max_points / 2` consecutive buckets, thus the peaks are
+    still drawn (unlike with a plain stride).
+    Args:
+        x (np.ndarray): The abscissas, in order.
+        y (np.ndarray): The values.
+        max_points (int): The maximum number of points kept, None for all.
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The points kept, in order.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    if max_points is None or len(x) <= max(max_points, 2):
+        return x, y
+    num_buckets = max_points // 2
+    edges = np.linspace(0, len(x), num_buckets + 1).astype(np.int64)
+    bucket = np.repeat(np.arange(num_buckets), np.diff(edges))
+    # Sorted by bucket, then value: the first and last of each bucket are kept.
+    order = np.lexsort((y, bucket))
+    keep = np.unique(np.concatenate((order[edges[:-1]], order[edges[1:] - 1])))
+    return x[keep], y[keep]
+
+
+def _integer_axis(axis: "plt.Axis", num_values: int) -> None:
+    """Ticks each integer of the axis, unless there are too many of them."""
+    if num_values <= MAX_TICKS:
+        axis.set_major_locator(mticker.MultipleLocator(1))
+    else:
+        axis.set_major_locator(mticker.MaxNLocator(integer=True))
+
+
 def plot_allocation(
-    ax: plt.Axes, allocations: List[ds.Allocation], label=""
-) -> plt.Line2D:
-    x = ds.get_segment_per_allocation(allocations)
-    y = ds.get_layer_per_allocation(allocations)
-    layers = ds.get_layer_list(allocations)
+    ax: "plt.Axes", allocations: List[ds.Allocation], label=""
+) -> "plt.Line2D":
+    segment_ids, layer_ids, _ = allocation_columns(allocations)
+    return plot_allocation_columns(ax, segment_ids, layer_ids, label)
+
+
+def plot_allocation_columns(
+    ax: "plt.Axes", segment_ids: np.ndarray, layer_ids: np.ndarray, label=""
+) -> "plt.Line2D":
+    """Plots the segment of each layer, given as columns (see
+    `allocation_columns`)."""
     ax.set_xlabel("Segments")
     ax.set_ylabel("Layers")
-    ax.set_xticks([allocation.segment.id for allocation in allocations])
-    ax.set_yticks([layer.id for layer in layers])
+    used_segments = np.unique(segment_ids)
+    if len(used_segments) <= MAX_TICKS:
+        ax.set_xticks(used_segments)
+    if len(layer_ids) <= MAX_TICKS:
+        ax.set_yticks(layer_ids)
+    else:
+        ax.get_yaxis().set_major_locator(mticker.MaxNLocator(integer=True))
     # Set the x-axis to integer.
-    ax.get_xaxis().set_major_locator(mticker.MultipleLocator(1))
+    _integer_axis(ax.get_xaxis(), len(used_segments))
     # Plot!
-    (line,) = ax.plot(x, y, label=label)
+    (line,) = ax.plot(*_segment_ends(segment_ids, layer_ids), label=label)
     return line
 
 
-def plot_layers_memory(ax: plt.Axes, layers: List[ds.Layer], label="") -> plt.Line2D:
-    x = [layer.id for layer in layers]
-    y = [ds.bytes_to_megabytes(layer.memory) for layer in layers]
+def _plot_per_layer(
+    ax: "plt.Axes", layers: List[ds.Layer], name: str, label: str, max_points: int
+) -> "plt.Line2D":
+    """Plots a column of the layers (in MB) against their identifiers."""
+    x = ds.column(layers, "id")
+    y = ds.bytes_to_megabytes(ds.column(layers, name))
     # Show the major grid and style it slightly.
     ax.grid(which="major", color="#DDDDDD", linewidth=0.8)
     # Disable x-axis minor ticks.
@@ -47,34 +152,27 @@ def plot_layers_memory(ax: plt.Axes, layers: List[ds.Layer], label="") -> plt.Li
     ax.set_xlabel("Layers")
     ax.set_ylabel("Memory [MB]")
     # Set the x-axis to integer.
-    ax.get_xaxis().set_major_locator(mticker.MultipleLocator(1))
+    _integer_axis(ax.get_xaxis(), len(x))
     # Plot.
-    (line,) = ax.plot(x, y, label=label)
+    (line,) = ax.plot(*decimate(x, y, max_points), label=label)
     return line
 
 
+def plot_layers_memory(
+    ax: "plt.Axes", layers: List[ds.Layer], label="", max_points: int = MAX_POINTS
+) -> "plt.Line2D":
+    return _plot_per_layer(ax, layers, "memory", label, max_points)
+
+
 def plot_layers_output_memory(
-    ax: plt.Axes, layers: List[ds.Layer], label=""
-) -> plt.Line2D:
-    x = [layer.id for layer in layers]
-    y = [ds.bytes_to_megabytes(layer.output_size) for layer in layers]
-    # Show the major grid and style it slightly.
-    ax.grid(which="major", color="#DDDDDD", linewidth=0.8)
-    # Disable x-axis minor ticks.
-    ax.tick_params(axis="x", which="minor", bottom=False)
-    #
-    ax.set_xlabel("Layers")
-    ax.set_ylabel("Memory [MB]")
-    # Set the x-axis to integer.
-    ax.get_xaxis().set_major_locator(mticker.MultipleLocator(1))
-    # Plot.
-    (line,) = ax.plot(x, y, label=label)
-    return line
+    ax: "plt.Axes", layers: List[ds.Layer], label="", max_points: int = MAX_POINTS
+) -> "plt.Line2D":
+    return _plot_per_layer(ax, layers, "output_size", label, max_points)
 
 
 def plot_segments_output_memory(
-    ax: plt.Axes, allocations: List[ds.Allocation], label="", cumsum=False
-) -> plt.Line2D:
+    ax: "plt.Axes", allocations: List[ds.Allocation], label="", cumsum=False
+) -> "plt.Line2D":
     x = [allocation.segment.id for allocation in allocations if allocation.layers]
     y = [
         allocation.get_output_size() for allocation in allocations if allocation.layers
@@ -89,25 +187,201 @@ def plot_segments_output_memory(
     ax.set_xlabel("Segments")
     ax.set_ylabel("Output Memory [MB]")
     # Set the x-axis to integer.
-    ax.get_xaxis().set_major_locator(mticker.MultipleLocator(1))
+    _integer_axis(ax.get_xaxis(), len(x))
     # Plot!
     (line,) = ax.plot(x, y, label=label)
     return line
 
 
 def plot_splitting_points(
-    ax: plt.Axes, allocations: List[ds.Allocation], ymin: int = 0, ymax: int = 0
-):
-    split_layer = [it.get_split_point() for it in allocations if it.get_split_point()]
-    is_first = True
+    ax: "plt.Axes", allocations: List[ds.Allocation], ymin: int = 0, ymax: int = 0
+) -> "mcollections.LineCollection":
+    _, layer_ids, counts = allocation_columns(allocations)
+    return plot_splitting_columns(ax, layer_ids[np.cumsum(counts) - 1], ymin, ymax)
+
+
+def plot_splitting_columns(
+    ax: "plt.Axes",
+    split_ids: np.ndarray,
+    ymin: int = 0,
+    ymax: int = 0,
+    max_labels: int = MAX_LABELS,
+) -> "mcollections.LineCollection":
+    """Draws the splits after the given layers (the last one, after the end of
+    the network, is skipped) as a single collection of lines, labelling at most
+    `max_labels` of them, evenly spaced."""
     _ymin, _ymax = ax.get_ylim()
     ymin = ymin if ymin else _ymin
     ymax = ymax if ymax else _ymax
-    for split in split_layer[0:-1]:
-        label = "Splitting points" if is_first else ""
-        ax.vlines(
-            x=split.id + 0.5, ymin=ymin, ymax=ymax, ls="-.", color="purple", label=label
-        )
-        ax.text(split.id + 0.5, ymax, f"{split.id} ", va="top", ha="right")
-
-        is_first = False
+    split_ids = np.asarray(split_ids)[:-1]
+    lines = ax.vlines(
+        x=split_ids + 0.5,
+        ymin=ymin,
+        ymax=ymax,
+        ls="-.",
+        color="purple",
+        label="Splitting points",
+    )
+    step = max(1, -(-len(split_ids) // max(max_labels, 1)))
+    for split in split_ids[::step]:
+        ax.text(split + 0.5, ymax, f"{split} ", va="top", ha="right")
+    return lines
+
+
+def plot_allocations_overlay(
+    ax: "plt.Axes",
+    plans: Sequence[List[ds.Allocation]],
+    values: Sequence[float] = None,
+    cmap: str = "viridis",
+    alpha: float = 0.6,
+    label: str = "",
+) -> "mcollections.LineCollection":
+    """Overlays many allocations of the same layers (e.g., those of a Pareto
+    sweep) as a single collection of lines, colored by `values` (e.g., the
+    memory budget of each plan, by default its position).
+    Args:
+        ax (plt.Axes): The axes to draw on.
+        plans (Sequence[List[ds.Allocation]]): The allocations of each plan.
+        values (Sequence[float]): The value mapped to the color of each plan.
+        cmap (str): The name of the colormap.
+        alpha (float): The opacity of the lines.
+        label (str): The label of the collection.
+    Returns:
+        mcollections.LineCollection: The lines, e.g., to add a colorbar.
+    """
+    curves = []
+    for plan in plans:
+        segment_ids, layer_ids, _ = allocation_columns(plan)
+        curves.append(np.column_stack(_segment_ends(segment_ids, layer_ids)))
+    lines = mcollections.LineCollection(curves, cmap=cmap, alpha=alpha, label=label)
+    lines.set_array(np.asarray(values if values is not None else range(len(plans))))
+    ax.add_collection(lines)
+    ax.autoscale_view()
+    ax.set_xlabel("Segments")
+    ax.set_ylabel("Layers")
+    return lines
+
+
+def plot_allocation_blocks(
+    ax: "plt.Axes",
+    allocations: List[ds.Allocation],
+    width: float = 0.8,
+    **style,
+) -> "mcollections.PolyCollection":
+    """Draws each allocation as a box, spanning its segment and its layers, as a
+    single collection of polygons. The style is passed to the collection (e.g.,
+    `facecolor`, `edgecolor`)."""
+    segment_ids, layer_ids, counts = allocation_columns(allocations)
+    ends = np.cumsum(counts)
+    x = segment_ids[ends - 1].astype(np.float64)
+    bottom = layer_ids[ends - counts] - 0.5
+    top = layer_ids[ends - 1] + 0.5
+    left, right = x - width / 2, x + width / 2
+    boxes = np.stack(
+        [
+            np.column_stack((left, bottom)),
+            np.column_stack((right, bottom)),
+            np.column_stack((right, top)),
+            np.column_stack((left, top)),
+        ],
+        axis=1,
+    )
+    polygons = mcollections.PolyCollection(boxes, **style)
+    ax.add_collection(polygons)
+    ax.autoscale_view()
+    ax.set_xlabel("Segments")
+    ax.set_ylabel("Layers")
+    _integer_axis(ax.get_xaxis(), len(x))
+    return polygons
+
+
+def plot_pareto_front(ax: "plt.Axes", frame, label="") -> "plt.Line2D":
+    """Plots the output size against the memory budget of a `pareto.pareto_sweep`."""
+    frame = frame[frame["output_size"].notna()]
+    x = ds.bytes_to_megabytes(frame["budget"].to_numpy())
+    y = ds.bytes_to_megabytes(frame["output_size"].to_numpy())
+    # Show the major grid and style it slightly.
+    ax.grid(which="major", color="#DDDDDD", linewidth=0.8)
+    #
+    ax.set_xlabel("Memory Budget [MB]")
+    ax.set_ylabel("Output Memory [MB]")
+    # Plot! Between two budgets, the output size is the one of the smaller budget.
+    (line,) = ax.step(x, y, where="post", label=label)
+    return line
+
+
+def _render(
+    name: str,
+    columns: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray],
+    path: str,
+    figsize: Tuple[float, float],
+    dpi: int,
+) -> str:
+    """Renders the figure of an allocation to a file, without pyplot (thus
+    without any GUI backend, and without the global figure registry)."""
+    segment_ids, layer_ids, output_size, split_ids = columns
+    figure = mfigure.Figure(figsize=figsize)
+    left, right = figure.subplots(1, 2)
+    plot_allocation_columns(left, segment_ids, layer_ids)
+    left.set_title(name)
+    right.grid(which="major", color="#DDDDDD", linewidth=0.8)
+    right.set_xlabel("Layers")
+    right.set_ylabel("Output Memory [MB]")
+    _integer_axis(right.get_xaxis(), len(layer_ids))
+    right.plot(*decimate(layer_ids, ds.bytes_to_megabytes(output_size)))
+    plot_splitting_columns(right, split_ids)
+    figure.tight_layout()
+    figure.savefig(path, dpi=dpi)
+    return path
+
+
+def _render_chunk(tasks: List[Tuple], figsize: Tuple[float, float], dpi: int) -> None:
+    for name, columns, path in tasks:
+        _render(name, columns, path, figsize, dpi)
+
+
+def export_allocations(
+    plans: Dict[str, List[ds.Allocation]],
+    directory: str,
+    workers: int = 1,
+    fmt: str = "png",
+    figsize: Tuple[float, float] = (10, 4),
+    dpi: int = 100,
+) -> Dict[str, str]:
+    """Renders a figure per plan (the segment of each layer, and the output size
+    of each layer with the splitting points) to `directory/<name>.<fmt>`.
+
+    Only the columns of each plan (see `allocation_columns`) are sent to the
+    worker processes, split into `workers` chunks, as in `pareto.pareto_sweep`.
+
+    Args:
+        plans (Dict[str, List[ds.Allocation]]): The allocations, by name (which
+            is also the name of the file).
+        directory (str): Where to write the figures, created if missing.
+        workers (int): The number of worker processes.
+        fmt (str): The format of the figures (e.g., "png", "pdf", "svg").
+        figsize (Tuple[float, float]): The size of each figure in inches.
+        dpi (int): The resolution of the raster formats.
+    Returns:
+        Dict[str, str]: The path of the figure of each plan.
+    """
+    os.makedirs(directory, exist_ok=True)
+    tasks = []
+    for name, allocations in plans.items():
+        layers, segment_ids, counts = _gather(allocations)
+        layer_ids, output_size = layers.column("id"), layers.column("output_size")
+        split_ids = layer_ids[np.cumsum(counts) - 1]
+        path = os.path.join(directory, f"{name}.{fmt}")
+        tasks.append((name, (segment_ids, layer_ids, output_size, split_ids), path))
+    workers = max(1, min(workers, len(tasks)))
+    chunks = [tasks[index::workers] for index in range(workers)]
+    if workers == 1:
+        _render_chunk(tasks, figsize, dpi)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_render_chunk, chunk, figsize, dpi) for chunk in chunks
+            ]
+            for future in futures:
+                future.result()
+    return {name: path for name, _, path in tasks}
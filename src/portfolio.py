@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import dataclasses
+import numpy as np
+import queue
+import threading
+import time
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Tuple
+
+import src.data_structures as ds
+import src.dp_solver as dp_solver
+import src.greedy as greedy
+import src.optimizer as optimizer
+import src.validation as validation
+
+# The engines raced by `plan`.
+ENGINES: Tuple[str, ...] = ("greedy", "dp", "cp_sat")
+
+
+@dataclass
+class PlanResult:
+    """The outcome of a portfolio plan.
+
+    Attributes
+    ----------
+    status: str
+        "OPTIMAL" when the allocations are proven optimal, "FEASIBLE" otherwise.
+    objective: float
+        The objective value of the allocations.
+    bound: float
+        The best lower bound of the objective proven by any engine.
+    gap: float
+        The relative gap between objective and bound (0 when optimal).
+    wall_time: float
+        The time spent planning in seconds.
+    engine: str
+        The engine which found the allocations, one of `ENGINES`.
+    allocations: List[ds.Allocation]
+        The allocations of the used segments.
+    outcomes: Dict[str, str]
+        The outcome of each engine: the status of its solution ("OPTIMAL" or
+        "FEASIBLE"), "INFEASIBLE", "UNKNOWN" (no solution found), "INVALID" (the
+        solution failed the verification), "ERROR", or "CANCELLED" (still
+        running when the plan was returned).
+    """
+
+    status: str
+    objective: float
+    bound: float
+    gap: float
+    wall_time: float
+    engine: str
+    allocations: List[ds.Allocation] = field(default_factory=list)
+    outcomes: Dict[str, str] = field(default_factory=dict)
+
+
+def _run(
+    engine: str,
+    solve: Callable[[], Tuple[str, List[ds.Allocation], float]],
+    results: queue.Queue,
+) -> None:
+    """Runs an engine, pushing (engine, status, allocations, bound, error) to the
+    results."""
+    try:
+        status, allocations, bound = solve()
+        results.put((engine, status, allocations, bound, None))
+    except ds.NoSolutionError as error:
+        results.put((engine, error.status, None, None, str(error)))
+    except Exception as error:
+        results.put((engine, "ERROR", None, None, f"{type(error).__name__}: {error}"))
+
+
+def plan(
+    layers: List[ds.Layer],
+    segments: List[ds.Segment],
+    objective: str = "output_size",
+    deadline: float = 1.0,
+    engines: Tuple[str, ...] = ENGINES,
+    config: optimizer.SolverConfig = None,
+    edges: np.ndarray = None,
+    **model_options: Any,
+) -> PlanResult:
+    """Races the engines on the same problem, and returns the best verified
+    allocations found by the deadline.
+
+    The greedy planner (see `greedy.solve_greedy`) runs first, since it takes
+    about a millisecond, and its solution hints the CP-SAT search. Then, the
+    dynamic program (see `dp_solver.solve_dp`) and the CP-SAT model (see
+    `optimizer.LoScModel`) run concurrently, each in its own thread. The race
+    ends as soon as a solution is proven optimal, either by an exact engine or
+    by matching the best bound, when all the engines are done, or at the
+    deadline. The CP-SAT search is then stopped, while the dynamic program, which
+    cannot be interrupted, is left to finish in the background and ignored.
+
+    Args:
+        layers (List[ds.Layer]): The list of layers, in execution order.
+        segments (List[ds.Segment]): The list of execution segments, in order.
+        objective (str): Either "output_size" or "knapsack".
+        deadline (float): The time budget of the plan in seconds.
+        engines (Tuple[str, ...]): The engines to race, a subset of `ENGINES`.
+        config (optimizer.SolverConfig): The parameters of the CP-SAT search, its
+            time limit is capped to the deadline.
+        edges (np.ndarray): The skip edges of the layers, see `graph.last_use`,
+            given to every engine and to the validation.
+        model_options: The options of the CP-SAT model, see `optimizer.LoScModel`
+            (by default, the "linear" ordering and output encoding).
+    Returns:
+        PlanResult: The best allocations, and the engine which found them.
+    Raises:
+        ds.NoSolutionError: If no engine found a solution, with status
+            "INFEASIBLE" if the problem is proven infeasible, "UNKNOWN" otherwise.
+    """
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        raise ValueError(f"Unknown engines {sorted(unknown)}, expected {ENGINES}.")
+    start = time.perf_counter()
+    end = start + deadline
+    results = queue.Queue()
+
+    # The greedy solution, used as the hint of the CP-SAT search.
+    hint = None
+
+    def solve_greedy() -> Tuple[str, List[ds.Allocation], float]:
+        nonlocal hint
+        hint, bound = greedy.solve_greedy(layers, segments, objective, edges=edges)
+        return "FEASIBLE", hint, bound
+
+    def solve_dp() -> Tuple[str, List[ds.Allocation], float]:
+        allocations = dp_solver.solve_dp(layers, segments, objective, edges=edges)
+        return "OPTIMAL", allocations, None
+
+    # The CP-SAT model, once built, and whether the race is over.
+    model, cancelled = None, threading.Event()
+
+    def solve_cp_sat() -> Tuple[str, List[ds.Allocation], float]:
+        nonlocal model
+        model = optimizer.LoScModel(layers, segments, edges=edges, **model_options)
+        if cancelled.is_set():
+            raise ds.NoSolutionError("The search was cancelled.", "UNKNOWN")
+        if hint:
+            model.set_hint(hint)
+        model.set_objective(objective)
+        result = model.solve(config)
+        return result.status, result.allocations, result.bound
+
+    if "greedy" in engines:
+        _run("greedy", solve_greedy, results)
+    if "cp_sat" in engines:
+        config = config if config is not None else optimizer.SolverConfig()
+        remaining = max(0.0, end - time.perf_counter())
+        config = dataclasses.replace(
+            config, time_limit=min(config.time_limit or remaining, remaining)
+        )
+        model_options = {
+            "ordering": "linear",
+            "output_encoding": "linear",
+            **model_options,
+        }
+    # The CP-SAT thread is not a daemon, since interrupting the native search at
+    # exit aborts the interpreter, but it ends soon after being cancelled.
+    threads = [
+        threading.Thread(
+            target=_run, args=(engine, solve, results), daemon=engine == "dp"
+        )
+        for engine, solve in (("dp", solve_dp), ("cp_sat", solve_cp_sat))
+        if engine in engines
+    ]
+    for thread in threads:
+        thread.start()
+
+    best, bound = None, 0.0
+    outcomes = {engine: "CANCELLED" for engine in engines}
+    pending = len(engines)
+    while pending:
+        try:
+            engine, status, allocations, engine_bound, _ = results.get(
+                timeout=max(0.0, end - time.perf_counter())
+            )
+        except queue.Empty:
+            break
+        pending -= 1
+        outcomes[engine] = status
+        if allocations is None:
+            # Every engine only reports "INFEASIBLE" when there is no solution.
+            if status == "INFEASIBLE":
+                break
+            continue
+        report = validation.validate(allocations, layers, segments, edges)
+        if not report.valid:
+            outcomes[engine] = "INVALID"
+            continue
+        value = (
+            len(allocations) if objective == "knapsack" else report.total_output_size
+        )
+        if engine == "dp":
+            engine_bound = value
+        if engine_bound is not None:
+            bound = max(bound, engine_bound)
+        if best is None or value < best[0]:
+            best = (value, engine, allocations)
+        if best[0] <= bound:
+            break
+
+    # Cancel the losers.
+    cancelled.set()
+    if model is not None:
+        model.stop()
+
+    if best is None:
+        infeasible = "INFEASIBLE" in outcomes.values()
+        raise ds.NoSolutionError(
+            f"No engine found a solution within the deadline ({outcomes}).",
+            "INFEASIBLE" if infeasible else "UNKNOWN",
+        )
+    value, engine, allocations = best
+    optimal = value <= bound
+    return PlanResult(
+        status="OPTIMAL" if optimal else "FEASIBLE",
+        objective=float(value),
+        bound=float(min(bound, value)),
+        gap=0.0 if optimal else optimizer.relative_gap(value, bound),
+        wall_time=time.perf_counter() - start,
+        engine=engine,
+        allocations=allocations,
+        outcomes=outcomes,
+    )
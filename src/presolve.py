@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import src.data_structures as ds
+
+
+class InfeasibleLayerError(ds.NoSolutionError):
+    def __init__(self, layer: ds.Layer, reason: str):
+        """Raised by the presolve, when a layer cannot be placed in any segment.
+
+        Args:
+            layer  : The offending layer.
+            reason : Why the layer cannot be placed.
+        """
+        super().__init__(f"Layer {layer.id} cannot be placed in any segment: {reason}.")
+        self.layer = layer
+
+
+@dataclass
+class SegmentWindows:
+    """The segments each layer can be placed in.
+
+    Attributes
+    ----------
+    earliest: np.ndarray
+        The first segment each layer can be placed in.
+    latest: np.ndarray
+        The last segment each layer can be placed in.
+    allowed: np.ndarray
+        A (layers x segments) boolean mask of the possible placements.
+    """
+
+    earliest: np.ndarray
+    latest: np.ndarray
+    allowed: np.ndarray
+
+    def pairs(self) -> List[Tuple[int, int]]:
+        """Returns the possible (layer, segment) placements, sorted by layer."""
+        return [(int(l), int(s)) for l, s in zip(*np.nonzero(self.allowed))]
+
+    def size(self) -> int:
+        """Returns the number of possible placements."""
+        return int(np.count_nonzero(self.allowed))
+
+
+def stack_prefix_sums(prefix_memory: np.ndarray, prefix_time: np.ndarray) -> np.ndarray:
+    """Concatenates the prefix sums of memory and time, the latter shifted past
+    the former, thus a single search locates a position in both, see `fill_end`.
+    Args:
+        prefix_memory (np.ndarray): The prefix sums of the layers memory.
+        prefix_time (np.ndarray): The prefix sums of the layers runtime.
+    Returns:
+        np.ndarray: The sorted stacked prefix sums.
+    """
+    return np.concatenate((prefix_memory, prefix_time + (prefix_memory[-1] + 1)))
+
+
+def fill_end(stacked: np.ndarray, start: int, memory: int, time: int) -> int:
+    """Returns the end (exclusive) of the longest run of layers from `start`
+    which fits the given memory and time, with one search of the stacked prefix
+    sums (see `stack_prefix_sums`).
+    """
+    size = len(stacked) // 2
+    memory_end, time_end = stacked.searchsorted(
+        (stacked[start] + memory, stacked[size + start] + time), "right"
+    )
+    # A memory beyond the total one lands among the (shifted) times.
+    return int(min(memory_end, size, time_end - size)) - 1
+
+
+def _greedy_fill(
+    prefix_memory: np.ndarray,
+    prefix_time: np.ndarray,
+    avail_memory: np.ndarray,
+    avail_time: np.ndarray,
+) -> np.ndarray:
+    """Fills the segments in order, each with as many of the remaining layers as
+    possible, and returns the segment of each layer (S for the ones left out).
+
+    No solution places the first k layers inside fewer segments than the greedy
+    fill, thus the segment it gives each layer is the earliest one possible.
+    """
+    num_layers = len(prefix_memory) - 1
+    segment_of = np.full(num_layers, len(avail_memory), dtype=np.int64)
+    stacked = stack_prefix_sums(prefix_memory, prefix_time)
+    start = 0
+    for s, (memory, time) in enumerate(zip(avail_memory.tolist(), avail_time.tolist())):
+        end = fill_end(stacked, start, memory, time)
+        segment_of[start:end] = s
+        start = end
+        if start == num_layers:
+            break
+    return segment_of
+
+
+def segment_bounds(
+    layers: List[ds.Layer], segments: List[ds.Segment]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Bounds the segment each layer can be placed in.
+
+    Since layers are placed in order and the used segments are a prefix, the
+    layers [0, l] must fit inside the segments [0, s(l)], and the layers
+    [l, L) inside the segments [s(l), S). Filling the segments greedily, from
+    either end, bounds the segment s(l) of each layer. Furthermore, two
+    consecutive layers are either in the same segment or in two consecutive
+    ones, which propagates the bounds between neighbouring layers.
+
+    Args:
+        layers (List[ds.Layer]): The list of layers, in execution order.
+        segments (List[ds.Segment]): The list of execution segments, in order.
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The earliest and latest segment of each
+            layer, both non-decreasing. A layer with earliest > latest, latest < 0,
+            or earliest >= S cannot be placed.
+    """
+    num_layers, num_segments = len(layers), len(segments)
+    memory = ds.column(layers, "memory")
+    runtime = ds.column(layers, "runtime")
+    avail_memory = ds.column(segments, "avail_memory")
+    avail_time = ds.column(segments, "avail_time")
+    index = np.arange(num_layers)
+
+    # Filling the segments greedily, from the first one, gives the earliest segment
+    # of each layer. Filling them from the last one, with the layers reversed,
+    # gives the latest one.
+    prefix_memory = np.concatenate(([0], np.cumsum(memory)))
+    prefix_time = np.concatenate(([0], np.cumsum(runtime)))
+    earliest = _greedy_fill(prefix_memory, prefix_time, avail_memory, avail_time)
+    latest = (
+        num_segments
+        - 1
+        - _greedy_fill(
+            np.concatenate(([0], np.cumsum(memory[::-1]))),
+            np.concatenate(([0], np.cumsum(runtime[::-1]))),
+            avail_memory[::-1],
+            avail_time[::-1],
+        )[::-1]
+    )
+    # Consecutive layers are in the same, or in consecutive segments, i.e.,
+    # earliest[l] >= earliest[m] - (m - l) for m > l, and the first layer is in
+    # the first segment, i.e., latest[l] <= latest[m] + (l - m) for m < l.
+    latest = np.minimum(latest, index)
+    earliest = index + np.maximum.accumulate((earliest - index)[::-1])[::-1]
+    latest = index + np.minimum.accumulate(latest - index)
+    return earliest, latest
+
+
+def segment_windows(
+    layers: List[ds.Layer], segments: List[ds.Segment]
+) -> SegmentWindows:
+    """Computes the segments each layer can be placed in, i.e., those within the
+    bounds of `segment_bounds` which fit the layer alone.
+
+    Args:
+        layers (List[ds.Layer]): The list of layers, in execution order.
+        segments (List[ds.Segment]): The list of execution segments, in order.
+    Returns:
+        SegmentWindows: The possible placements of each layer.
+    Raises:
+        InfeasibleLayerError: If a layer cannot be placed in any segment.
+    """
+    num_segments = len(segments)
+    memory = ds.column(layers, "memory")
+    runtime = ds.column(layers, "runtime")
+    avail_memory = ds.column(segments, "avail_memory")
+    avail_time = ds.column(segments, "avail_time")
+    earliest, latest = segment_bounds(layers, segments)
+
+    # Each layer must also fit alone inside its segment.
+    segment_index = np.arange(num_segments)
+    fits = (memory[:, None] <= avail_memory[None, :]) & (
+        runtime[:, None] <= avail_time[None, :]
+    )
+    allowed = (
+        fits
+        & (earliest[:, None] <= segment_index[None, :])
+        & (segment_index[None, :] <= latest[:, None])
+    )
+
+    # Report the layer the placement fails at, rather than the first one without
+    # a window: when a layer cannot be placed, the layers before it have no
+    # window either, since the layers after them do not fit.
+    empty = np.flatnonzero(~allowed.any(axis=1))
+    if len(empty):
+        too_large = np.flatnonzero(~fits.any(axis=1))
+        beyond = np.flatnonzero(earliest >= num_segments)
+        l = int(empty[0])
+        if len(too_large):
+            l = int(too_large[0])
+            reason = "it does not fit in any segment alone"
+        elif len(beyond):
+            l = int(beyond[0])
+            reason = "the layers up to it exceed the budget of all the segments"
+        elif latest[l] < 0:
+            reason = "the layers from it onwards exceed the budget of all the segments"
+        elif earliest[l] > latest[l]:
+            reason = (
+                f"the layers before it need segment {segments[earliest[l]].id} or later, "
+                f"the layers after it need it in segment {segments[max(latest[l], 0)].id} "
+                f"or earlier"
+            )
+        else:
+            reason = (
+                f"it does not fit in segments {segments[earliest[l]].id} to "
+                f"{segments[latest[l]].id}"
+            )
+        raise InfeasibleLayerError(layers[l], reason)
+    return SegmentWindows(earliest, latest, allowed)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+
+import numpy as np
+
+from typing import Dict, Iterator, List
+
+import src.data_structures as ds
+import src.lazy as lazy
+
+# Imported on first use, by the CSV and JSON-lines readers.
+pd = lazy.LazyModule("pandas")
+
+# The columns of the pickle layout, which are in MB (memory) and ms (runtime).
+PICKLE_COLUMNS = ("layers_mem", "layers_params", "layers_runtime", "layers_out_size")
+
+# The key of the layers inside a `.npz` profile.
+NPZ_KEY = "layers"
+
+# The key of the (producer, consumer) skip edges inside a `.npz` profile.
+EDGES_KEY = "edges"
+
+# The number of rows parsed at a time by the streaming readers.
+CHUNK_ROWS = 65536
+
+
+def save_profile(
+    path: str,
+    table: ds.LayerTable,
+    compressed: bool = False,
+    edges: np.ndarray = None,
+) -> None:
+    """Saves a profile in the binary columnar format.
+
+    A `.npy` file holds the raw structured array of the table, and can be memory
+    mapped by `load_profile`. A `.npz` file is smaller (if `compressed`), but it
+    is always read into memory.
+
+    Args:
+        path (str): The destination, ending with either ".npy" or ".npz".
+        table (ds.LayerTable): The layers to save.
+        compressed (bool): If true, a `.npz` profile is compressed.
+        edges (np.ndarray): The (producer, consumer) skip edges of the layers, see
+            `graph.last_use`, which only a `.npz` profile can hold.
+    """
+    data = np.ascontiguousarray(table.data)
+    if path.endswith(".npz"):
+        save = np.savez_compressed if compressed else np.savez
+        arrays = {NPZ_KEY: data}
+        if edges is not None:
+            arrays[EDGES_KEY] = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        save(path, **arrays)
+    elif edges is not None:
+        raise ValueError(f"Only a .npz profile can hold the edges, not '{path}'.")
+    elif path.endswith(".npy"):
+        np.save(path, data, allow_pickle=False)
+    else:
+        raise ValueError(f"Unknown profile format '{path}', expected .npy or .npz.")
+
+
+def _check_dtype(data: np.ndarray, path: str) -> np.ndarray:
+    if data.dtype != ds.LAYER_DTYPE:
+        raise ValueError(
+            f"The profile '{path}' has columns {data.dtype}, expected {ds.LAYER_DTYPE}."
+        )
+    return data
+
+
+def _table_from_frame(frame: "pd.DataFrame", first_id: int) -> ds.LayerTable:
+    """Builds a table from a chunk of a CSV/JSON-lines profile.
+
+    The columns are either those of the pickle layout (see `PICKLE_COLUMNS`), or
+    those of `ds.LAYER_DTYPE`, in bytes and ms. Any other column is ignored.
+    """
+    if "layers_mem" in frame.columns:
+        return ds.LayerTable.from_profile(
+            {key: frame[key].to_numpy() for key in PICKLE_COLUMNS}, first_id
+        )
+    columns = {
+        name: frame[name].to_numpy(dtype=np.int64)
+        for name in ds.LAYER_DTYPE.names
+        if name in frame.columns
+    }
+    columns.setdefault("id", np.arange(first_id, first_id + len(frame)))
+    return ds.LayerTable.from_columns(**columns)
+
+
+def _stream(chunks: Iterator["pd.DataFrame"]) -> Iterator[ds.LayerTable]:
+    first_id = 0
+    for frame in chunks:
+        table = _table_from_frame(frame, first_id)
+        first_id += len(table)
+        yield table
+
+
+def iter_csv(path: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[ds.LayerTable]:
+    """Reads a CSV profile (with a header row) in chunks of `chunk_rows` layers.
+    Args:
+        path (str): The path of the profile.
+        chunk_rows (int): The number of layers of each chunk.
+    Returns:
+        Iterator[ds.LayerTable]: The consecutive chunks of the profile.
+    """
+    with pd.read_csv(path, chunksize=chunk_rows, engine="c") as reader:
+        yield from _stream(reader)
+
+
+def iter_jsonl(path: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[ds.LayerTable]:
+    """Reads a JSON-lines profile (one object per layer) in chunks of `chunk_rows`
+    layers.
+    Args:
+        path (str): The path of the profile.
+        chunk_rows (int): The number of layers of each chunk.
+    Returns:
+        Iterator[ds.LayerTable]: The consecutive chunks of the profile.
+    """
+    with pd.read_json(path, lines=True, chunksize=chunk_rows) as reader:
+        yield from _stream(reader)
+
+
+def _concatenate(chunks: Iterator[ds.LayerTable]) -> ds.LayerTable:
+    data = [chunk.data for chunk in chunks]
+    return ds.LayerTable(np.concatenate(data) if data else np.zeros(0, ds.LAYER_DTYPE))
+
+
+def read_pickle(path: str) -> ds.LayerTable:
+    """Reads a profile in the pickle layout, see `ds.LayerTable.from_profile`."""
+    with open(path, "rb") as file:
+        return ds.LayerTable.from_profile(pickle.load(file))
+
+
+def load_profile(path: str, mmap: bool = True) -> ds.LayerTable:
+    """Loads a profile, choosing the reader from the extension of the path.
+
+    A `.npy` profile is memory mapped (read-only) when `mmap` is true, thus it is
+    loaded without copying, and only the pages actually used are read. The other
+    formats are: `.npz`, `.csv`, `.jsonl`, and `.pkl`/`.pickle` (pickle layout).
+
+    Args:
+        path (str): The path of the profile.
+        mmap (bool): If true, a `.npy` profile is memory mapped.
+    Returns:
+        ds.LayerTable: The layers of the profile.
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If the format is unknown, or the columns are not the expected ones.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        data = np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+        return ds.LayerTable(_check_dtype(data, path))
+    if extension == ".npz":
+        with np.load(path, allow_pickle=False) as archive:
+            return ds.LayerTable(_check_dtype(archive[NPZ_KEY], path))
+    if extension == ".csv":
+        return _concatenate(iter_csv(path))
+    if extension in (".jsonl", ".ndjson"):
+        return _concatenate(iter_jsonl(path))
+    if extension in (".pkl", ".pickle"):
+        return read_pickle(path)
+    raise ValueError(f"Unknown profile format '{path}'.")
+
+
+def load_edges(path: str) -> np.ndarray:
+    """Loads the skip edges of a `.npz` profile, see `save_profile`.
+    Args:
+        path (str): The path of the profile.
+    Returns:
+        np.ndarray: The (producer, consumer) skip edges, None if the profile does
+            not hold any (i.e., the layers are a chain).
+    """
+    if os.path.splitext(path)[1].lower() != ".npz":
+        return None
+    with np.load(path, allow_pickle=False) as archive:
+        return archive[EDGES_KEY] if EDGES_KEY in archive.files else None
+
+
+def load_profiles(paths: List[str], mmap: bool = True) -> Dict[str, ds.LayerTable]:
+    """Loads several profiles, see `load_profile`, indexed by path."""
+    return {path: load_profile(path, mmap) for path in paths}
+
+
+def convert_pickle(
+    source: str, destination: str, compressed: bool = False
+) -> ds.LayerTable:
+    """Converts a profile from the pickle layout to the binary columnar format.
+    Args:
+        source (str): The path of the pickle profile.
+        destination (str): The path of the binary profile (".npy" or ".npz").
+        compressed (bool): If true, a `.npz` profile is compressed.
+    Returns:
+        ds.LayerTable: The converted layers.
+    """
+    table = read_pickle(source)
+    save_profile(destination, table, compressed)
+    return table
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+
+import numpy as np
+
+from dataclasses import dataclass, replace
+from typing import List, Tuple
+
+import src.data_structures as ds
+
+
+def _gcd(*columns: np.ndarray) -> int:
+    """Returns the greatest common divisor of all the values (1 if all zero)."""
+    values = np.concatenate([np.asarray(column, dtype=np.int64) for column in columns])
+    return max(1, int(np.gcd.reduce(np.abs(values)))) if len(values) else 1
+
+
+def auto_granularity(values: np.ndarray, max_coefficient: int) -> int:
+    """Returns the smallest power of two keeping the largest value, divided by it,
+    within `max_coefficient` (1 when no rescaling is needed)."""
+    largest = int(np.max(values, initial=0))
+    if largest <= max_coefficient:
+        return 1
+    return ds.get_closest_power_of_two(math.ceil(largest / max_coefficient))
+
+
+def _unit(gcd: int, granularity: int) -> int:
+    """Returns the unit of a quantity: its GCD (exact), unless a coarser
+    granularity is requested."""
+    return gcd if granularity is None or granularity <= gcd else int(granularity)
+
+
+@dataclass
+class Quantization:
+    """The units the memory, time, and output sizes are expressed in by the model.
+
+    Demands (layer memory and runtime) are rounded up, capacities (segment memory
+    and time) rounded down, thus any allocation feasible for the quantized values
+    is feasible for the exact ones. Output sizes, which only appear in the
+    objective, are rounded to the nearest unit. The `relaxed` copy rounds the
+    other way, thus any allocation feasible for the exact values is feasible for
+    its quantized ones, which bounds the loss of the rounding, see `error_bound`.
+
+    Attributes
+    ----------
+    memory_unit: int
+        The unit of `Layer.memory` and `Segment.avail_memory` (bytes).
+    time_unit: int
+        The unit of `Layer.runtime` and `Segment.avail_time` (ms).
+    output_unit: int
+        The unit of `Layer.output_size` (bytes).
+    exact_budgets: bool
+        True when memory and time are divided by a common divisor, i.e., the
+        quantized problem has exactly the feasible allocations of the original one.
+        Cleared by the budgets rounded later, see `LoScModel.set_segment_budget`.
+    exact_objective: bool
+        True when the output sizes are divided by a common divisor.
+    relax: bool
+        True when demands are rounded down, and capacities up, see `relaxed`.
+    """
+
+    memory_unit: int = 1
+    time_unit: int = 1
+    output_unit: int = 1
+    exact_budgets: bool = True
+    exact_objective: bool = True
+    relax: bool = False
+
+    @staticmethod
+    def fit(
+        layers: List[ds.Layer],
+        segments: List[ds.Segment],
+        memory_granularity: int = None,
+        time_granularity: int = None,
+        output_granularity: int = None,
+    ) -> "Quantization":
+        """Chooses the units of a problem.
+
+        Each quantity is divided by the GCD of its values, which is exact. A
+        granularity coarser than the GCD gives smaller coefficients, at the cost
+        of the conservative rounding, see `error_bound`.
+
+        Args:
+            layers (List[ds.Layer]): The list of layers, in execution order.
+            segments (List[ds.Segment]): The list of execution segments, in order.
+            memory_granularity (int): The unit of memory (bytes), None for the GCD.
+            time_granularity (int): The unit of time (ms), None for the GCD.
+            output_granularity (int): The unit of output sizes (bytes), None for
+                the GCD.
+        Returns:
+            Quantization: The units.
+        """
+        memory = ds.column(layers, "memory")
+        avail_memory = ds.column(segments, "avail_memory")
+        runtime = ds.column(layers, "runtime")
+        avail_time = ds.column(segments, "avail_time")
+        output_size = ds.column(layers, "output_size")
+        memory_gcd = _gcd(memory, avail_memory)
+        time_gcd = _gcd(runtime, avail_time)
+        output_gcd = _gcd(output_size)
+        memory_unit = _unit(memory_gcd, memory_granularity)
+        time_unit = _unit(time_gcd, time_granularity)
+        output_unit = _unit(output_gcd, output_granularity)
+        return Quantization(
+            memory_unit=memory_unit,
+            time_unit=time_unit,
+            output_unit=output_unit,
+            exact_budgets=memory_unit == memory_gcd and time_unit == time_gcd,
+            exact_objective=output_unit == output_gcd,
+        )
+
+    def apply(
+        self, layers: List[ds.Layer], segments: List[ds.Segment]
+    ) -> Tuple[ds.LayerTable, ds.SegmentTable]:
+        """Returns the quantized layers and segments (the identifiers are kept).
+        Args:
+            layers (List[ds.Layer]): The list of layers, in execution order.
+            segments (List[ds.Segment]): The list of execution segments, in order.
+        Returns:
+            Tuple[ds.LayerTable, ds.SegmentTable]: The quantized copies.
+        """
+        quantized_layers = ds.LayerTable.from_columns(
+            id=ds.column(layers, "id"),
+            memory=self.demand(ds.column(layers, "memory"), self.memory_unit),
+            runtime=self.demand(ds.column(layers, "runtime"), self.time_unit),
+            output_size=self.cost(ds.column(layers, "output_size")),
+        )
+        quantized_segments = ds.SegmentTable.from_columns(
+            id=ds.column(segments, "id"),
+            avail_memory=self.capacity(
+                ds.column(segments, "avail_memory"), self.memory_unit
+            ),
+            avail_time=self.capacity(ds.column(segments, "avail_time"), self.time_unit),
+        )
+        return quantized_layers, quantized_segments
+
+    def relaxed(self) -> "Quantization":
+        """Returns the same units, rounding demands down and capacities up."""
+        return replace(self, relax=True)
+
+    def demand(self, values: np.ndarray, unit: int) -> np.ndarray:
+        """Rounds demands up to the unit (down when relaxed)."""
+        values = np.asarray(values, dtype=np.int64)
+        return values // unit if self.relax else -(-values // unit)
+
+    def capacity(self, values: np.ndarray, unit: int) -> np.ndarray:
+        """Rounds capacities down to the unit (up when relaxed)."""
+        values = np.asarray(values, dtype=np.int64)
+        return -(-values // unit) if self.relax else values // unit
+
+    def cost(self, values: np.ndarray) -> np.ndarray:
+        """Rounds output sizes to the nearest unit."""
+        values = np.asarray(values, dtype=np.int64)
+        return (values + self.output_unit // 2) // self.output_unit
+
+    def lower_bound(self, bound: float, num_segments: int) -> float:
+        """Returns a lower bound (bytes) of the exact output size of the
+        allocations, from a lower bound of their quantized one. Each used segment
+        misses at most half a unit of output size, either way."""
+        if self.exact_objective:
+            return max(0.0, bound * self.output_unit)
+        return max(0.0, (bound - num_segments / 2) * self.output_unit)
+
+    def error_bound(
+        self, num_segments: int, objective: float = None, bound: float = None
+    ) -> float:
+        """Returns how much (bytes) the exact output size of an optimal quantized
+        solution can exceed the optimum of the original problem.
+
+        With `exact_budgets`, both problems have the same allocations, and each
+        used segment misses at most half a unit of output size, either way, both
+        in the returned solution and in the optimal one. Otherwise, the rounding
+        of the budgets may cut the optimum off: the loss is the gap between the
+        exact `objective` of the solution and a lower `bound` (bytes) of the
+        optimum, e.g., of a solve over the `relaxed` budgets, which admit every
+        allocation of the original problem. None when the bound is unknown.
+        """
+        if self.exact_budgets:
+            if self.exact_objective:
+                return 0.0
+            return float(num_segments * self.output_unit)
+        if objective is None or bound is None:
+            return None
+        return max(0.0, objective - bound)
@@ -0,0 +1,629 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import dataclasses
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+import src.batch as batch
+import src.cache as cache
+import src.data_structures as ds
+import src.optimizer as optimizer
+
+# The longest request line accepted (bytes), e.g., a profile of a million layers.
+MAX_LINE = 1 << 26
+
+# The rows of a request converted at once (times their width). A conversion holds
+# the GIL, thus the event loop only runs between two of them, see `_rows`.
+PARSE_CHUNK = 1 << 10
+
+# The number of recent requests the latency percentiles are computed over.
+LATENCY_WINDOW = 1024
+
+# The seconds a request waits for the best solution of its stopped search, once
+# its deadline passed, see `PlanningServer.handle`.
+STOP_GRACE = 0.5
+
+# The statuses of the server itself, along with those of `batch.JobResult`.
+OVERLOADED, DEADLINE, ERROR = "OVERLOADED", "DEADLINE", "ERROR"
+
+
+def _dumps(message: Dict[str, Any]) -> bytes:
+    """Encodes a message as a JSON line, converting the NumPy scalars."""
+    encoded = json.dumps(
+        message,
+        separators=(",", ":"),
+        default=lambda value: (
+            value.item() if isinstance(value, np.generic) else str(value)
+        ),
+    )
+    return encoded.encode("utf-8") + b"\n"
+
+
+def _percentile(values: Deque[float], q: float) -> Optional[float]:
+    return float(np.percentile(values, q)) if values else None
+
+
+@dataclass
+class ServerMetrics:
+    """The counters of a `PlanningServer`, see `ServerMetrics.snapshot`.
+
+    Attributes
+    ----------
+    received: int
+        The planning requests received.
+    completed: int
+        The requests answered with the result of a solve (successful or not).
+    coalesced: int
+        The requests which joined an identical solve already in flight.
+    rejected: int
+        The requests rejected since too many solves were pending.
+    expired: int
+        The requests whose deadline passed before their solve completed.
+    failed: int
+        The malformed requests.
+    queued: int
+        The solves waiting for a worker.
+    running: int
+        The solves running on a worker.
+    latency: Deque[float]
+        The latencies (seconds) of the recent completed requests.
+    queue_wait: Deque[float]
+        The time (seconds) the recent solves waited for a worker.
+    """
+
+    received: int = 0
+    completed: int = 0
+    coalesced: int = 0
+    rejected: int = 0
+    expired: int = 0
+    failed: int = 0
+    queued: int = 0
+    running: int = 0
+    latency: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+    queue_wait: Deque[float] = field(
+        default_factory=lambda: deque(maxlen=LATENCY_WINDOW)
+    )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns the counters, and the percentiles of the recent latencies and
+        queue waits (seconds, None before the first request)."""
+        return dict(
+            received=self.received,
+            completed=self.completed,
+            coalesced=self.coalesced,
+            rejected=self.rejected,
+            expired=self.expired,
+            failed=self.failed,
+            queued=self.queued,
+            running=self.running,
+            latency_p50=_percentile(self.latency, 50),
+            latency_p95=_percentile(self.latency, 95),
+            latency_p99=_percentile(self.latency, 99),
+            queue_wait_p50=_percentile(self.queue_wait, 50),
+            queue_wait_p95=_percentile(self.queue_wait, 95),
+        )
+
+
+def _rows(values: List[Any], width: int) -> np.ndarray:
+    """Converts rows (or their flattened values) into an int64 array of the given
+    width, one chunk at a time, see `PARSE_CHUNK`."""
+    chunk = PARSE_CHUNK * width
+    parts = [
+        np.asarray(values[start : start + chunk], dtype=np.int64).reshape(-1, width)
+        for start in range(0, len(values), chunk)
+    ]
+    return np.concatenate(parts) if parts else np.empty((0, width), dtype=np.int64)
+
+
+def _parse(request: Dict[str, Any], threads: int) -> batch.PlanJob:
+    """Builds the job of a planning request.
+
+    The request holds the "layers", as [memory, runtime, output_size] rows, and
+    the "segments", as [avail_memory, avail_time] rows. The optional fields are
+    those of `batch.PlanJob` ("objective", "engine", "ordering",
+    "output_encoding"), and those of `optimizer.SolverConfig` ("num_workers",
+    "time_limit", "relative_gap", "random_seed").
+    """
+    layers = _rows(request["layers"], 3)
+    segments = _rows(request["segments"], 2)
+    objective = request.get("objective", "output_size")
+    if objective not in optimizer.OBJECTIVES:
+        raise ValueError(
+            f"Unknown objective '{objective}', expected one of {optimizer.OBJECTIVES}."
+        )
+    engine = request.get("engine", "cp_sat")
+    if engine not in batch.ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {batch.ENGINES}.")
+    # The identifiers are the positions, thus the allocations map back to them.
+    return batch.PlanJob(
+        job_id=request.get("id"),
+        layers=ds.LayerTable.from_columns(
+            memory=layers[:, 0], runtime=layers[:, 1], output_size=layers[:, 2]
+        ),
+        segments=ds.SegmentTable.from_columns(
+            avail_memory=segments[:, 0], avail_time=segments[:, 1]
+        ),
+        objective=objective,
+        engine=engine,
+        config=optimizer.SolverConfig(
+            num_workers=int(request.get("num_workers") or threads),
+            time_limit=request.get("time_limit"),
+            relative_gap=request.get("relative_gap"),
+            random_seed=request.get("random_seed"),
+        ),
+        ordering=request.get("ordering", "linear"),
+        output_encoding=request.get("output_encoding", "linear"),
+    )
+
+
+def _prepare(request: Dict[str, Any], threads: int) -> Tuple[batch.PlanJob, str]:
+    """Parses a planning request (see `_parse`), and computes the key identifying
+    its solve, see `cache.canonical_key`. Both take milliseconds for large
+    requests, thus they run off the event loop."""
+    job = _parse(request, threads)
+    key = cache.canonical_key(
+        job.layers,
+        job.segments,
+        job.objective,
+        job.config,
+        engine=job.engine,
+        ordering=job.ordering,
+        output_encoding=job.output_encoding,
+        # The solve is bounded by the deadline of the first request.
+        deadline=request.get("deadline"),
+    )
+    return job, key
+
+
+def _blocks(allocations: List[ds.Allocation]) -> List[Tuple[int, int, int]]:
+    """Returns the (segment, start, end) positions of the allocations of a job."""
+    blocks, start = [], 0
+    for allocation in allocations:
+        end = start + len(allocation.layers)
+        blocks.append((int(allocation.segment.id), start, end))
+        start = end
+    return blocks
+
+
+def decode(
+    response: Dict[str, Any], layers: List[ds.Layer], segments: List[ds.Segment]
+) -> List[ds.Allocation]:
+    """Rebuilds the allocations of a response, referencing the given layers and
+    segments (those the request was built from)."""
+    return [
+        ds.Allocation(segments[s], layers[start:end])
+        for s, start, end in response.get("blocks") or []
+    ]
+
+
+class _Stopper:
+    def __init__(self):
+        """Stops the CP-SAT search of a solve from the event loop, whether its
+        model is already built or not, see `batch.solve_job`."""
+        self._lock = threading.Lock()
+        self._model: optimizer.LoScModel = None
+        self._stopped = False
+
+    def attach(self, model: optimizer.LoScModel) -> None:
+        """Called from the worker with the model, once built."""
+        with self._lock:
+            self._model = model
+            stopped = self._stopped
+        if stopped:
+            model.stop()
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopped = True
+            model = self._model
+        if model is not None:
+            model.stop()
+
+
+class PlanningServer:
+    def __init__(
+        self,
+        workers: int = None,
+        max_pending: int = 64,
+        threads: int = None,
+        executor: Executor = None,
+    ):
+        """Initialize the planning server, which answers JSON-lines requests over
+        TCP (see `start_tcp`) or a Unix socket (see `start_unix`).
+
+        Each line is a request object, with an "id" reported back in the
+        response. A planning request is parsed as in `_parse`, with an optional
+        "deadline" (seconds from its arrival), and answered with the "status",
+        "objective", "bound", "gap", "wall_time", "error", and "blocks" (the
+        (segment, start, end) positions of the allocations, see `decode`) of its
+        solve, along with its "latency". A {"op": "metrics"} request is answered
+        with the "metrics" of the server, see `ServerMetrics.snapshot`. The
+        responses of a connection are written as soon as they are ready, i.e.,
+        not in request order.
+
+        The solves run on `workers` at a time (see `batch.solve_job`), the
+        others wait in a queue. Identical requests with the same deadline (see
+        `cache.canonical_key`) share the solve in flight, which runs within the
+        deadline of the first: its CP-SAT search gets the time left once the
+        model is built, see `batch.PlanJob.deadline`. When it expires before a
+        later request's own deadline, that request is solved again. When
+        `max_pending` solves are queued or running, a new one is rejected at
+        once with status "OVERLOADED". When the deadline passes first, the
+        search is stopped, and the request gets its best solution (if it comes
+        within `STOP_GRACE` seconds) or status "DEADLINE". The searches running
+        in a `ProcessPoolExecutor` cannot be stopped, they end at their time
+        limit.
+
+        Args:
+            workers     : The number of concurrent solves, defaults to the cores.
+            max_pending : The maximum number of solves queued or running.
+            threads     : The CP-SAT search threads of the requests which do not
+                          set "num_workers", defaults to the cores per worker.
+            executor    : Where the solves run, by default a pool of `workers`
+                          threads (CP-SAT releases the GIL), or, e.g., a
+                          `ProcessPoolExecutor`.
+        """
+        cores = os.cpu_count() or 1
+        self.workers = workers or cores
+        self.max_pending = max_pending
+        self.threads = threads or max(1, cores // self.workers)
+        self.owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="planner"
+        )
+        self.metrics = ServerMetrics()
+        self._slots: asyncio.Semaphore = None
+        # The solves queued or running, by key, and their stoppers.
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._stoppers: Dict[asyncio.Future, _Stopper] = {}
+        self._connections: Set[asyncio.Task] = set()
+        self._server: asyncio.AbstractServer = None
+
+    # ==============================================
+    # REQUESTS
+    # ==============================================
+
+    async def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Answers a single request, see `PlanningServer`."""
+        arrival = time.perf_counter()
+        request_id = request.get("id") if isinstance(request, dict) else None
+        if isinstance(request, dict) and request.get("op") == "metrics":
+            return dict(id=request_id, status="OK", metrics=self.metrics.snapshot())
+        self.metrics.received += 1
+        try:
+            loop = asyncio.get_running_loop()
+            # The default executor, the workers are kept for the solves.
+            job, key = await loop.run_in_executor(None, _prepare, request, self.threads)
+            deadline = request.get("deadline")
+            expiry = None if deadline is None else arrival + float(deadline)
+        except Exception as error:
+            self.metrics.failed += 1
+            return dict(
+                id=request_id, status=ERROR, error=f"{type(error).__name__}: {error}"
+            )
+
+        while True:
+            solve = self._in_flight.get(key)
+            if solve is not None:
+                self.metrics.coalesced += 1
+            elif len(self._in_flight) >= self.max_pending:
+                self.metrics.rejected += 1
+                return dict(
+                    id=request_id,
+                    status=OVERLOADED,
+                    error=f"{self.max_pending} solves are already pending.",
+                )
+            else:
+                stopper = _Stopper()
+                solve = asyncio.ensure_future(self._solve(job, expiry, stopper))
+                self._in_flight[key] = solve
+                self._stoppers[solve] = stopper
+                solve.add_done_callback(functools.partial(self._forget, key))
+
+            try:
+                if expiry is None:
+                    result = await asyncio.shield(solve)
+                else:
+                    timeout = max(0.0, expiry - time.perf_counter())
+                    result = await asyncio.wait_for(asyncio.shield(solve), timeout)
+            except asyncio.TimeoutError:
+                # The search returns its best solution (if any) once stopped.
+                stopper = self._stoppers.get(solve)
+                if stopper is not None:
+                    stopper.stop()
+                try:
+                    result = await asyncio.wait_for(asyncio.shield(solve), STOP_GRACE)
+                except asyncio.TimeoutError:
+                    result = None
+            # A shared solve which ran out of the deadline of the first request,
+            # while this one has time left.
+            if (
+                result is not None
+                and result.status == DEADLINE
+                and time.perf_counter() < expiry - batch.DEADLINE_MARGIN
+            ):
+                self._forget(key, solve)
+                continue
+            break
+        latency = time.perf_counter() - arrival
+        if result is None or result.status == DEADLINE:
+            self.metrics.expired += 1
+            return dict(
+                id=request_id,
+                status=DEADLINE,
+                error=f"The deadline of {deadline} s passed.",
+                latency=latency,
+            )
+        self.metrics.completed += 1
+        self.metrics.latency.append(latency)
+        return dict(
+            id=request_id,
+            status=result.status,
+            objective=result.objective,
+            bound=result.bound,
+            gap=result.gap,
+            wall_time=result.wall_time,
+            error=result.error,
+            blocks=_blocks(result.allocations),
+            latency=latency,
+        )
+
+    def _forget(self, key: str, solve: asyncio.Future) -> None:
+        """Drops a solve from those in flight, unless a newer one replaced it."""
+        if self._in_flight.get(key) is solve:
+            del self._in_flight[key]
+        if solve.done():
+            self._stoppers.pop(solve, None)
+
+    async def _solve(
+        self, job: batch.PlanJob, expiry: float, stopper: _Stopper
+    ) -> batch.JobResult:
+        """Runs a job on a worker, once one is free, within the expiry."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        queued = time.perf_counter()
+        self.metrics.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.metrics.queued -= 1
+        try:
+            start = time.perf_counter()
+            self.metrics.queue_wait.append(start - queued)
+            if expiry is not None:
+                remaining = expiry - start
+                # Too late to build the model and search, see `batch.solve_job`.
+                if remaining <= batch.DEADLINE_MARGIN:
+                    return batch.JobResult(job.job_id, DEADLINE)
+                # The search stops in time to answer, see `batch.PlanJob.deadline`.
+                job = dataclasses.replace(job, deadline=remaining)
+            # The hook holds a lock, which does not cross to another process.
+            run = functools.partial(batch.solve_job, job)
+            if not isinstance(self.executor, ProcessPoolExecutor):
+                run = functools.partial(run, on_model=stopper.attach)
+            self.metrics.running += 1
+            try:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self.executor, run)
+            finally:
+                self.metrics.running -= 1
+            # No solution by the deadline, e.g., the model took the time left to
+            # build, unlike a search ending earlier at its own time limit.
+            if (
+                result.status == "TIMEOUT"
+                and expiry is not None
+                and time.perf_counter() >= expiry - batch.DEADLINE_MARGIN
+            ):
+                return dataclasses.replace(result, status=DEADLINE)
+            return result
+        finally:
+            self._slots.release()
+
+    # ==============================================
+    # TRANSPORT
+    # ==============================================
+
+    async def _respond(
+        self,
+        request: Any,
+        writer: asyncio.StreamWriter,
+        lock: asyncio.Lock,
+    ) -> None:
+        response = await self.handle(request)
+        async with lock:
+            writer.write(_dumps(response))
+            # Backpressure: a client which does not read stalls its own responses.
+            await writer.drain()
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Reads the requests of a connection, answering each concurrently."""
+        task = asyncio.current_task()
+        self._connections.add(task)
+        lock, pending = asyncio.Lock(), set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError as error:
+                    self.metrics.failed += 1
+                    async with lock:
+                        writer.write(
+                            _dumps(
+                                dict(id=None, status=ERROR, error=f"Bad JSON: {error}")
+                            )
+                        )
+                        await writer.drain()
+                    continue
+                answer = asyncio.ensure_future(self._respond(request, writer, lock))
+                pending.add(answer)
+                answer.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # The client went away, or sent a line longer than the limit.
+            pass
+        finally:
+            for answer in pending:
+                answer.cancel()
+            self._connections.discard(task)
+            writer.close()
+
+    async def start_tcp(
+        self, host: str = "127.0.0.1", port: int = 0
+    ) -> Tuple[str, int]:
+        """Starts listening on TCP, port 0 picks a free one.
+        Returns:
+            Tuple[str, int]: The address the server listens on.
+        """
+        self._server = await asyncio.start_server(
+            self._serve, host, port, limit=MAX_LINE
+        )
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def start_unix(self, path: str) -> str:
+        """Starts listening on a Unix socket at the given path.
+        Returns:
+            str: The path of the socket.
+        """
+        self._server = await asyncio.start_unix_server(
+            self._serve, path, limit=MAX_LINE
+        )
+        return path
+
+    async def serve_forever(self) -> None:
+        """Serves until cancelled, see `start_tcp` and `start_unix`."""
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stops listening, drops the connections, and shuts the executor down
+        (if owned), without waiting for the running solves."""
+        if self._server is not None:
+            self._server.close()
+        for task in list(self._connections):
+            task.cancel()
+        if self._connections:
+            await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        if self.owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class PlanningClient:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Initialize a client over an open connection, see `connect_tcp` and
+        `connect_unix`. The requests are pipelined: many can be in flight at
+        once, and each is matched to its response by id."""
+        self.reader, self.writer = reader, writer
+        self._ids = itertools.count()
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self._receiver = asyncio.ensure_future(self._receive())
+
+    @classmethod
+    async def connect_tcp(cls, host: str, port: int) -> "PlanningClient":
+        return cls(*await asyncio.open_connection(host, port, limit=MAX_LINE))
+
+    @classmethod
+    async def connect_unix(cls, path: str) -> "PlanningClient":
+        return cls(*await asyncio.open_unix_connection(path, limit=MAX_LINE))
+
+    async def _receive(self) -> None:
+        """Dispatches the responses to their requests."""
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                waiting = self._waiting.pop(response.get("id"), None)
+                if waiting is not None and not waiting.done():
+                    waiting.set_result(response)
+        finally:
+            for waiting in self._waiting.values():
+                if not waiting.done():
+                    waiting.set_exception(ConnectionError("The server went away."))
+            self._waiting.clear()
+
+    async def request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Sends a request (its "id" is set by the client), and returns its
+        response, see `PlanningServer`."""
+        if self._receiver.done():
+            raise ConnectionError("The connection is closed.")
+        request_id = next(self._ids)
+        waiting = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = waiting
+        self.writer.write(_dumps(dict(request, id=request_id)))
+        await self.writer.drain()
+        return await waiting
+
+    async def plan(
+        self,
+        layers: List[ds.Layer],
+        segments: List[ds.Segment],
+        objective: str = "output_size",
+        deadline: float = None,
+        **options: Any,
+    ) -> Dict[str, Any]:
+        """Plans the allocation of the layers on the server.
+        Args:
+            layers (List[ds.Layer]): The list of layers, in execution order.
+            segments (List[ds.Segment]): The list of execution segments, in order.
+            objective (str): Either "output_size" or "knapsack".
+            deadline (float): The seconds the server has to answer, None for none.
+            options (Any): The other fields of the request, see `_parse`.
+        Returns:
+            Dict[str, Any]: The response, whose allocations `decode` rebuilds.
+        """
+        request = dict(
+            layers=np.stack(
+                [
+                    ds.column(layers, "memory"),
+                    ds.column(layers, "runtime"),
+                    ds.column(layers, "output_size"),
+                ],
+                axis=1,
+            ).tolist(),
+            segments=np.stack(
+                [
+                    ds.column(segments, "avail_memory"),
+                    ds.column(segments, "avail_time"),
+                ],
+                axis=1,
+            ).tolist(),
+            objective=objective,
+            deadline=deadline,
+            **options,
+        )
+        return await self.request(request)
+
+    async def metrics(self) -> Dict[str, Any]:
+        """Returns the metrics of the server, see `ServerMetrics.snapshot`."""
+        return (await self.request(dict(op="metrics")))["metrics"]
+
+    async def close(self) -> None:
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        await asyncio.gather(self._receiver, return_exceptions=True)
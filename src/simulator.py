@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+import src.data_structures as ds
+import src.graph as graph
+import src.lazy as lazy
+
+# Imported on first use, by `compare`.
+pd = lazy.LazyModule("pandas")
+
+# Draws the multiplicative factors of the layer runtimes, given the generator and
+# the shape of the draw (samples, inferences, layers).
+Jitter = Callable[[np.random.Generator, Tuple[int, ...]], np.ndarray]
+
+# The number of runtime draws generated at once, bounding the memory used.
+DRAWS_PER_BLOCK = 1 << 22
+
+
+def lognormal_jitter(sigma: float) -> Jitter:
+    """Log-normal factors with mean 1, e.g., for cache and contention effects."""
+    return lambda rng, shape: rng.lognormal(-(sigma**2) / 2, sigma, shape)
+
+
+def uniform_jitter(spread: float) -> Jitter:
+    """Factors uniform in [1 - spread, 1 + spread]."""
+    return lambda rng, shape: rng.uniform(1 - spread, 1 + spread, shape)
+
+
+@dataclass
+class Timeline:
+    """When the execution segments are available, within a repeating cycle.
+
+    Attributes
+    ----------
+    start: np.ndarray
+        The start time of the window of each segment within the cycle (ms).
+    length: np.ndarray
+        The length of the window of each segment (ms).
+    period: float
+        The length of the cycle (ms).
+    """
+
+    start: np.ndarray
+    length: np.ndarray
+    period: float
+
+    @staticmethod
+    def from_segments(segments: List[ds.Segment], gap: float = 0.0) -> "Timeline":
+        """Places the windows of the segments one after the other, each lasting
+        its available time, with `gap` ms between consecutive windows."""
+        length = ds.column(segments, "avail_time").astype(np.float64)
+        start = np.concatenate(([0.0], np.cumsum(length + gap)[:-1]))
+        return Timeline(start, length, float(length.sum() + gap * len(length)))
+
+
+@dataclass
+class SimulationResult:
+    """The outcome of the replay of a plan.
+
+    Attributes
+    ----------
+    latency: np.ndarray
+        The (samples x inferences) end-to-end latencies, from the arrival of each
+        inference to the end of its last layer (ms).
+    finish: np.ndarray
+        The (samples x inferences) times the inferences complete (ms).
+    overruns: np.ndarray
+        The number of segments, over all the inferences, whose layers ended after
+        the end of their window, for each sample.
+    throughput: np.ndarray
+        The inferences completed per second, for each sample.
+    peak_memory: int
+        The peak memory (bytes): the layers of the running segment, plus the
+        outputs live before the running layer (its input, and the skip tensors
+        crossing it), and its output, which includes the output held between
+        segments.
+    peak_held_output: int
+        The largest output held between two segments (bytes).
+    """
+
+    latency: np.ndarray
+    finish: np.ndarray
+    overruns: np.ndarray
+    throughput: np.ndarray
+    peak_memory: int
+    peak_held_output: int
+
+    def summary(self) -> Dict[str, float]:
+        """Returns the statistics of the latency, throughput, and memory."""
+        return dict(
+            latency_mean=float(self.latency.mean()),
+            latency_p50=float(np.percentile(self.latency, 50)),
+            latency_p95=float(np.percentile(self.latency, 95)),
+            latency_p99=float(np.percentile(self.latency, 99)),
+            latency_max=float(self.latency.max()),
+            throughput_mean=float(self.throughput.mean()),
+            overrun_rate=float(self.overruns.mean() / max(self.latency.shape[1], 1)),
+            peak_memory=self.peak_memory,
+            peak_held_output=self.peak_held_output,
+        )
+
+
+def _positions(
+    allocations: List[ds.Allocation], segments: List[ds.Segment]
+) -> np.ndarray:
+    """Returns the position of the segment of each allocation in `segments`,
+    matched by identity, or else by id."""
+    segments = list(segments)  # Keeps the views of a table alive.
+    by_identity = {id(segment): s for s, segment in enumerate(segments)}
+    by_id = {}
+    for s, segment in enumerate(segments):
+        by_id.setdefault(segment.id, s)
+    positions = []
+    for allocation in allocations:
+        s = by_identity.get(id(allocation.segment), by_id.get(allocation.segment.id))
+        if s is None:
+            raise ValueError(
+                f"The segment {allocation.segment.id} of the plan is not in the schedule."
+            )
+        positions.append(s)
+    positions = np.array(positions, dtype=np.int64)
+    if np.any(np.diff(positions) <= 0):
+        raise ValueError("The plan does not follow the order of the segments.")
+    return positions
+
+
+def _peak_memory(
+    allocations: List[ds.Allocation], input_size: int, edges: np.ndarray = None
+) -> Tuple[int, int]:
+    """Returns the peak memory and the peak held output of an inference."""
+    tables = [ds.LayerTable.from_layers(a.layers) for a in allocations]
+    layers = ds.LayerTable.concatenate(tables)
+    counts = np.fromiter(map(len, tables), np.int64, len(tables))
+    output_size = layers.column("output_size")
+    held_after = graph.split_costs(layers, edges)
+    # The input of each layer is the output of the previous one, along with the
+    # skip tensors crossing it, i.e., what is held after the previous layer.
+    input_sizes = np.concatenate(([input_size], held_after[:-1]))
+    used_memory = np.repeat(
+        [allocation.get_used_memory() for allocation in allocations], counts
+    )
+    live = used_memory + input_sizes + output_size
+    held = held_after[np.cumsum(counts) - 1]
+    return int(live.max(initial=0)), int(held.max(initial=0))
+
+
+def simulate(
+    allocations: List[ds.Allocation],
+    segments: List[ds.Segment],
+    num_inferences: int = 1,
+    arrivals: np.ndarray = None,
+    timeline: Timeline = None,
+    jitter: Jitter = None,
+    samples: int = 1,
+    seed: int = 0,
+    input_size: int = 0,
+    edges: np.ndarray = None,
+) -> SimulationResult:
+    """Replays a plan over the timeline of the segments, for a stream of
+    inferences, and optionally many draws of the layer runtimes (Monte Carlo).
+
+    Each allocation runs inside the window of its segment, the segments left
+    without layers being skipped. The segments of an inference run in the same cycle, the one after the cycle of the
+    previous inference, or the first starting after its arrival if later. Each
+    segment starts at the beginning of its window, or when the previous one ends
+    if it overran. Thus, the end of the n-th segment of the stream is
+        f[n] = max(w[n], f[n - 1]) + r[n] = R[n] + max_{m <= n} (w[m] - R[m - 1])
+    where w are the starts of the windows, r the runtimes, and R their prefix
+    sums, which is computed for all the inferences and draws at once.
+
+    Args:
+        allocations (List[ds.Allocation]): The plan to replay.
+        segments (List[ds.Segment]): All the segments of the schedule, in order.
+        num_inferences (int): The number of inferences of the stream.
+        arrivals (np.ndarray): The arrival time of each inference (ms), by
+            default one per cycle.
+        timeline (Timeline): The windows of the segments, by default
+            `Timeline.from_segments(segments)`.
+        jitter (Jitter): The factors of the layer runtimes, None for the
+            profiled runtimes.
+        samples (int): The number of draws of the runtimes.
+        seed (int): The seed of the draws.
+        input_size (int): The size of the input of the first layer (bytes).
+        edges (np.ndarray): The skip edges of the layers, see `graph.last_use`,
+            whose outputs count towards the memory until their last consumer.
+    Returns:
+        SimulationResult: The latencies, throughput, and peak memory.
+    """
+    allocations = [allocation for allocation in allocations if allocation.layers]
+    timeline = timeline if timeline is not None else Timeline.from_segments(segments)
+    num_chunks = len(allocations)
+    if not num_chunks:
+        raise ValueError("The plan does not place any layer.")
+    positions = _positions(allocations, segments)
+    if positions[-1] >= len(timeline.start):
+        raise ValueError("The plan uses more segments than the timeline has.")
+    samples = samples if jitter is not None else 1
+    period = timeline.period
+    if arrivals is None:
+        arrivals = timeline.start[0] + period * np.arange(num_inferences)
+    arrivals = np.asarray(arrivals, dtype=np.float64)
+    num_inferences = len(arrivals)
+
+    # The cycle of each inference: the first one starting after its arrival, and
+    # after the cycle of the previous inference.
+    earliest = np.ceil((arrivals - timeline.start[0]) / period).astype(np.int64)
+    index = np.arange(num_inferences)
+    cycle = index + np.maximum.accumulate(np.maximum(earliest, 0) - index)
+    window_start = (cycle[:, None] * period + timeline.start[None, positions]).ravel()
+    window_end = window_start + np.tile(timeline.length[positions], num_inferences)
+
+    # The runtime of each segment, for each draw.
+    tables = [ds.LayerTable.from_layers(a.layers) for a in allocations]
+    runtime = ds.LayerTable.concatenate(tables).column("runtime").astype(np.float64)
+    first_layer = np.concatenate(([0], np.cumsum(list(map(len, tables)))[:-1]))
+    rng = np.random.default_rng(seed)
+    block = max(1, DRAWS_PER_BLOCK // max(num_inferences * len(runtime), 1))
+    finish, overruns = [], []
+    for begin in range(0, samples, block):
+        size = min(block, samples - begin)
+        if jitter is None:
+            draws = np.broadcast_to(runtime, (size, num_inferences, len(runtime)))
+        else:
+            draws = runtime * jitter(rng, (size, num_inferences, len(runtime)))
+        chunk_time = np.add.reduceat(draws, first_layer, axis=2).reshape(size, -1)
+        # The max-plus scan over the segments of the stream.
+        done = np.cumsum(chunk_time, axis=1)
+        end = done + np.maximum.accumulate(window_start - (done - chunk_time), axis=1)
+        overruns.append((end > window_end).sum(axis=1))
+        finish.append(end.reshape(size, num_inferences, num_chunks)[:, :, -1])
+    finish = np.concatenate(finish) if finish else np.zeros((0, num_inferences))
+    latency = finish - arrivals[None, :]
+    makespan = finish[:, -1] - arrivals[0] if num_inferences else np.zeros(samples)
+    peak_memory, peak_held_output = _peak_memory(allocations, input_size, edges)
+    return SimulationResult(
+        latency=latency,
+        finish=finish,
+        overruns=np.concatenate(overruns) if overruns else np.zeros(0, np.int64),
+        throughput=1000.0 * num_inferences / np.maximum(makespan, 1e-9),
+        peak_memory=peak_memory,
+        peak_held_output=peak_held_output,
+    )
+
+
+def compare(
+    plans: Dict[str, List[ds.Allocation]], segments: List[ds.Segment], **options
+) -> "pd.DataFrame":
+    """Simulates several plans of the same problem (e.g., those of
+    `optimizer.minimize_output_size` and `optimizer.knapsack`) under the same
+    conditions, see `simulate`.
+    Args:
+        plans (Dict[str, List[ds.Allocation]]): The plans, by name.
+        segments (List[ds.Segment]): All the segments of the schedule, in order.
+        options: The options of `simulate`, the same seed gives every plan the
+            same draws of the jitter factors.
+    Returns:
+        pd.DataFrame: The summary of each plan (see `SimulationResult.summary`),
+            one row per plan.
+    """
+    return pd.DataFrame.from_dict(
+        {
+            name: simulate(allocations, segments, **options).summary()
+            for name, allocations in plans.items()
+        },
+        orient="index",
+    )
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+import src.data_structures as ds
+import src.dp_solver as dp_solver
+import src.graph as graph
+import src.simulator as simulator
+
+# The (segment position, first layer, end layer) of each allocation of a network.
+Blocks = List[Tuple[int, int, int]]
+
+
+@dataclass
+class Tenant:
+    """A network sharing the execution segments with other networks.
+
+    Attributes
+    ----------
+    name: str
+        The unique name of the network.
+    layers: List[ds.Layer]
+        The list of layers, in execution order.
+    priority: int
+        The networks with a higher priority are placed first, thus they get the
+        segments they prefer, the others fit inside the budgets left.
+    deadline: float
+        The time (ms) from the start of the timeline by which the last layer
+        must be done, i.e., only the segments whose window ends by then can be
+        used. None for no deadline.
+    edges: np.ndarray
+        The (producer, consumer) skip edges of the layers, see `graph.last_use`.
+    """
+
+    name: str
+    layers: List[ds.Layer]
+    priority: int = 0
+    deadline: float = None
+    edges: np.ndarray = None
+
+
+@dataclass
+class TenantPlan:
+    """The joint plan of several networks over the same segments.
+
+    Attributes
+    ----------
+    allocations: Dict[str, List[ds.Allocation]]
+        The allocations of each network, in order, over the shared segments.
+    stored_output: Dict[str, int]
+        The output size stored between the segments of each network (bytes).
+    objective: int
+        The total output size stored between segments, over all the networks.
+    bound: int
+        A lower bound of the objective: the sum of the optimum of each network
+        placed alone.
+    used_memory: np.ndarray
+        The memory used by all the networks inside each segment (bytes).
+    used_time: np.ndarray
+        The runtime of all the networks inside each segment (ms).
+    rounds: int
+        The number of improvement rounds run after the first placement.
+    """
+
+    allocations: Dict[str, List[ds.Allocation]] = field(default_factory=dict)
+    stored_output: Dict[str, int] = field(default_factory=dict)
+    objective: int = 0
+    bound: int = 0
+    used_memory: np.ndarray = None
+    used_time: np.ndarray = None
+    rounds: int = 0
+
+
+def _place(
+    tenant: Tenant,
+    avail_memory: np.ndarray,
+    avail_time: np.ndarray,
+    costs: np.ndarray,
+) -> Tuple[Blocks, int]:
+    """Places a network alone, optimally, inside the given budgets.
+    Args:
+        tenant (Tenant): The network to place.
+        avail_memory (np.ndarray): The memory left in each usable segment.
+        avail_time (np.ndarray): The time left in each usable segment.
+        costs (np.ndarray): The memory held across a split after each layer.
+    Returns:
+        Tuple[Blocks, int]: The blocks of the network, and their stored output.
+    Raises:
+        ds.NoSolutionError: If the network does not fit.
+    """
+    # The identifiers of the segments are their positions.
+    segments = ds.SegmentTable.from_columns(
+        avail_memory=avail_memory, avail_time=avail_time
+    )
+    allocations = dp_solver.solve_dp(
+        tenant.layers, segments, edges=tenant.edges, allow_empty=True
+    )
+    blocks, start = [], 0
+    for allocation in allocations:
+        end = start + len(allocation.layers)
+        blocks.append((int(allocation.segment.id), start, end))
+        start = end
+    return blocks, int(sum(costs[end - 1] for _, _, end in blocks))
+
+
+def _usage(
+    blocks: Blocks, memory: np.ndarray, runtime: np.ndarray, num_segments: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the memory and the time a network uses inside each segment."""
+    used_memory = np.zeros(num_segments, dtype=np.int64)
+    used_time = np.zeros(num_segments, dtype=np.int64)
+    for s, start, end in blocks:
+        used_memory[s] = memory[end] - memory[start]
+        used_time[s] = runtime[end] - runtime[start]
+    return used_memory, used_time
+
+
+def plan_tenants(
+    tenants: Sequence[Tenant],
+    segments: List[ds.Segment],
+    timeline: simulator.Timeline = None,
+    max_rounds: int = 10,
+    verbose: bool = False,
+) -> TenantPlan:
+    """Places several networks over the same segments, minimizing the total output
+    size stored between segments, within the combined budgets of each segment.
+
+    A single CP model over all the networks grows with their number, thus the
+    problem is decomposed instead. Each network, by decreasing priority, is
+    placed optimally (see `dp_solver.solve_dp`) inside the budgets left by the
+    networks placed before it, and before its deadline. Then, block-coordinate
+    descent re-places each network in turn, inside the budgets left by the
+    networks of higher priority only, the others giving way, until a round does
+    not improve. The priorities are lexicographic: a move is kept only if it
+    decreases the stored output of the classes of networks with the same
+    priority, from the highest one, thus a network never loses to one of lower
+    priority, while those of the same priority trade for a smaller total.
+
+    Unlike `optimizer.minimize_output_size`, the segments used by a network do
+    not need to be the first ones, since another network may take them up.
+
+    Args:
+        tenants (Sequence[Tenant]): The networks to place.
+        segments (List[ds.Segment]): The shared execution segments, in order.
+        timeline (simulator.Timeline): The windows of the segments, which the
+            deadlines refer to, by default `simulator.Timeline.from_segments`.
+        max_rounds (int): The maximum number of improvement rounds.
+        verbose (bool): If true, prints the objective after each round.
+    Returns:
+        TenantPlan: The allocations of each network, and the combined usage.
+    Raises:
+        ValueError: If the names of the networks are not unique.
+        ds.NoSolutionError: If a network does not fit, with status "INFEASIBLE"
+            when it does not fit even alone, "UNKNOWN" when it does not fit
+            inside the budgets left by the networks of higher priority.
+    """
+    names = [tenant.name for tenant in tenants]
+    if len(set(names)) != len(names):
+        raise ValueError(f"The names of the networks are not unique: {names}.")
+    num_segments = len(segments)
+    avail_memory = ds.column(segments, "avail_memory").astype(np.int64)
+    avail_time = ds.column(segments, "avail_time").astype(np.int64)
+    timeline = (
+        timeline if timeline is not None else simulator.Timeline.from_segments(segments)
+    )
+    window_end = np.asarray(timeline.start + timeline.length)[:num_segments]
+
+    # The segments usable by each network (a prefix), and its split costs.
+    limits, costs, memory, runtime = [], [], [], []
+    for tenant in tenants:
+        if tenant.deadline is None:
+            limits.append(num_segments)
+        else:
+            limits.append(int(np.searchsorted(window_end, tenant.deadline, "right")))
+        costs.append(graph.split_costs(tenant.layers, tenant.edges))
+        memory.append(
+            np.concatenate(([0], np.cumsum(ds.column(tenant.layers, "memory"))))
+        )
+        runtime.append(
+            np.concatenate(([0], np.cumsum(ds.column(tenant.layers, "runtime"))))
+        )
+
+    # The lower bound, i.e., each network alone.
+    bound = 0
+    for n, tenant in enumerate(tenants):
+        if not tenant.layers:
+            continue
+        try:
+            bound += _place(
+                tenant, avail_memory[: limits[n]], avail_time[: limits[n]], costs[n]
+            )[1]
+        except ds.NoSolutionError:
+            raise ds.NoSolutionError(
+                f"The network '{tenant.name}' does not fit inside the segments "
+                "before its deadline, even alone.",
+                "INFEASIBLE",
+            )
+
+    # The first placement, by decreasing priority (stable).
+    order = sorted(range(len(tenants)), key=lambda n: -tenants[n].priority)
+    zero = np.zeros(num_segments, dtype=np.int64)
+    blocks, values = [[] for _ in tenants], [0] * len(tenants)
+    usage = [(zero, zero) for _ in tenants]
+    # The priority classes, from the highest one.
+    classes = sorted({tenant.priority for tenant in tenants}, reverse=True)
+
+    def left(members: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the budgets left by the given networks."""
+        return (
+            avail_memory - sum((usage[m][0] for m in members), zero),
+            avail_time - sum((usage[m][1] for m in members), zero),
+        )
+
+    def key(values: List[int]) -> Tuple[int, ...]:
+        """The stored output of each priority class, from the highest one."""
+        return tuple(
+            sum(v for v, tenant in zip(values, tenants) if tenant.priority == p)
+            for p in classes
+        )
+
+    for k, n in enumerate(order):
+        if not tenants[n].layers:
+            continue
+        left_memory, left_time = left(order[:k])
+        try:
+            blocks[n], values[n] = _place(
+                tenants[n],
+                left_memory[: limits[n]],
+                left_time[: limits[n]],
+                costs[n],
+            )
+        except ds.NoSolutionError:
+            raise ds.NoSolutionError(
+                f"The network '{tenants[n].name}' does not fit inside the budgets "
+                "left by the networks of higher priority.",
+                "UNKNOWN",
+            )
+        usage[n] = _usage(blocks[n], memory[n], runtime[n], num_segments)
+    if verbose:
+        print(f"Tenants objective: {sum(values)} (lower bound {bound})")
+
+    def move(n: int) -> bool:
+        """Re-places the network n inside the budgets left by the networks of
+        higher priority, the others giving way: those which no longer fit are
+        re-placed, by decreasing priority, inside the budgets left. The move is
+        kept if it decreases the stored output of the classes in lexicographic
+        order, i.e., never at the expense of a higher class."""
+        tenant, priority = tenants[n], tenants[n].priority
+        if not tenant.layers:
+            return False
+        fixed = [m for m in order if tenants[m].priority > priority]
+        left_memory, left_time = left(fixed)
+        # The current placement fits, thus there is always one.
+        placed, value = _place(
+            tenant, left_memory[: limits[n]], left_time[: limits[n]], costs[n]
+        )
+        if value >= values[n]:
+            return False
+        moved = {n: (placed, value)}
+        used = {n: _usage(placed, memory[n], runtime[n], num_segments)}
+        left_memory, left_time = left_memory - used[n][0], left_time - used[n][1]
+        for m in order:
+            if m == n or tenants[m].priority > priority:
+                continue
+            if not (
+                np.all(usage[m][0] <= left_memory) and np.all(usage[m][1] <= left_time)
+            ):
+                try:
+                    moved[m] = _place(
+                        tenants[m],
+                        left_memory[: limits[m]],
+                        left_time[: limits[m]],
+                        costs[m],
+                    )
+                except ds.NoSolutionError:
+                    return False
+                used[m] = _usage(moved[m][0], memory[m], runtime[m], num_segments)
+            memory_m, time_m = used.get(m, usage[m])
+            left_memory, left_time = left_memory - memory_m, left_time - time_m
+        trial = list(values)
+        for m, (_, value_m) in moved.items():
+            trial[m] = value_m
+        if key(trial) >= key(values):
+            return False
+        for m, (placed_m, value_m) in moved.items():
+            blocks[m], values[m], usage[m] = placed_m, value_m, used[m]
+        return True
+
+    # Block-coordinate descent.
+    rounds = 0
+    while rounds < max_rounds and sum(values) > bound:
+        rounds += 1
+        improved = [move(n) for n in order]
+        if verbose:
+            print(f"Round {rounds}, tenants objective: {sum(values)}")
+        if not any(improved):
+            break
+    used_memory = sum((memory_n for memory_n, _ in usage), zero)
+    used_time = sum((time_n for _, time_n in usage), zero)
+
+    return TenantPlan(
+        allocations={
+            tenant.name: [
+                ds.Allocation(segments[s], tenant.layers[start:end])
+                for s, start, end in blocks[n]
+            ]
+            for n, tenant in enumerate(tenants)
+        },
+        stored_output={tenant.name: values[n] for n, tenant in enumerate(tenants)},
+        objective=sum(values),
+        bound=bound,
+        used_memory=used_memory,
+        used_time=used_time,
+        rounds=rounds,
+    )
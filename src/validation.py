@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from dataclasses import dataclass, field
+from typing import List, Sequence, Tuple
+
+import src.data_structures as ds
+import src.graph as graph
+import src.lazy as lazy
+
+# Imported on first use, by `AllocationReport.to_frame`.
+pd = lazy.LazyModule("pandas")
+
+
+@dataclass
+class AllocationReport:
+    """The checks and the per-segment metrics of an allocation, one entry per
+    allocation (i.e., per used segment), in order.
+
+    Attributes
+    ----------
+    valid: bool
+        True when the allocation satisfies all the constraints.
+    violations: List[str]
+        The description of each violated constraint.
+    segment_id: np.ndarray
+        The identifier of the segment.
+    num_layers: np.ndarray
+        The number of layers placed inside the segment.
+    used_memory: np.ndarray
+        The memory occupied by the layers (bytes).
+    avail_memory: np.ndarray
+        The memory of the segment (bytes).
+    used_time: np.ndarray
+        The runtime of the layers (ms).
+    avail_time: np.ndarray
+        The duration of the segment (ms).
+    split_point: np.ndarray
+        The identifier of the last layer of the segment (`ds.COLUMN_NO_ID` if empty).
+    stored_output: np.ndarray
+        The output size of the last layer, plus the outputs of the earlier layers
+        consumed after it (skip connections), stored until the next segment
+        (bytes).
+    """
+
+    valid: bool
+    violations: List[str] = field(default_factory=list)
+    segment_id: np.ndarray = None
+    num_layers: np.ndarray = None
+    used_memory: np.ndarray = None
+    avail_memory: np.ndarray = None
+    used_time: np.ndarray = None
+    avail_time: np.ndarray = None
+    split_point: np.ndarray = None
+    stored_output: np.ndarray = None
+
+    @property
+    def memory_slack(self) -> np.ndarray:
+        """The memory left free in each segment (bytes), negative when exceeded."""
+        return self.avail_memory - self.used_memory
+
+    @property
+    def time_slack(self) -> np.ndarray:
+        """The time left free in each segment (ms), negative when exceeded."""
+        return self.avail_time - self.used_time
+
+    @property
+    def memory_utilisation(self) -> np.ndarray:
+        """The fraction of the memory of each segment in use."""
+        return _ratio(self.used_memory, self.avail_memory)
+
+    @property
+    def time_utilisation(self) -> np.ndarray:
+        """The fraction of the time of each segment in use."""
+        return _ratio(self.used_time, self.avail_time)
+
+    @property
+    def total_output_size(self) -> int:
+        """The output size stored between segments, i.e., the objective of
+        `optimizer.minimize_output_size`."""
+        return int(self.stored_output.sum())
+
+    def to_frame(self) -> "pd.DataFrame":
+        """Returns the per-segment metrics as a data frame, one row per segment."""
+        return pd.DataFrame(
+            dict(
+                segment_id=self.segment_id,
+                num_layers=self.num_layers,
+                used_memory=self.used_memory,
+                avail_memory=self.avail_memory,
+                memory_utilisation=self.memory_utilisation,
+                used_time=self.used_time,
+                avail_time=self.avail_time,
+                time_utilisation=self.time_utilisation,
+                split_point=self.split_point,
+                stored_output=self.stored_output,
+            )
+        )
+
+
+def _ratio(used: np.ndarray, avail: np.ndarray) -> np.ndarray:
+    """Divides used by avail, giving inf for used > avail = 0 (and 0 for 0 / 0)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = used / avail
+    return np.where((avail == 0) & (used == 0), 0.0, ratio)
+
+
+def _gather(
+    plans: Sequence[List[ds.Allocation]],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Gathers the rows of all the layers and segments of the plans.
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: The layers (rows of
+            `ds.LAYER_DTYPE`), the segments (rows of `ds.SEGMENT_DTYPE`), the
+            number of layers of each allocation, and the number of allocations of
+            each plan.
+    """
+    allocations = [allocation for plan in plans for allocation in plan]
+    # The allocations of the engines are slices of a table, or views over one.
+    tables = [ds.LayerTable.from_layers(a.layers) for a in allocations]
+    layers = ds.LayerTable.concatenate(tables).data
+    segments = ds.SegmentTable.from_segments([a.segment for a in allocations]).data
+    counts = np.fromiter(map(len, tables), np.int64, len(tables))
+    sizes = np.fromiter(map(len, plans), np.int64, len(plans))
+    return layers, segments, counts, sizes
+
+
+def _segment_positions(
+    segment_id: np.ndarray, segments: List[ds.Segment]
+) -> np.ndarray:
+    """Returns the position of each segment identifier among the segments (-1 if
+    it is not one of them)."""
+    ids = ds.column(segments, "id")
+    if not len(ids):
+        return np.full(len(segment_id), -1)
+    order = np.argsort(ids, kind="stable")
+    found = np.minimum(np.searchsorted(ids[order], segment_id), len(ids) - 1)
+    position = order[found]
+    return np.where(ids[position] == segment_id, position, -1)
+
+
+def _cut_costs(
+    rows: np.ndarray, plan_layers: np.ndarray, edges: np.ndarray
+) -> np.ndarray:
+    """Returns the memory held across a split after each layer of the rows, for
+    each plan in turn, see `graph.cut_costs`. The edges leaving a plan which
+    misses layers are ignored, the ordering check reports it anyway."""
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    costs, start = [], 0
+    for num_layers in plan_layers:
+        output_size = rows["output_size"][start : start + num_layers]
+        inside = edges[edges[:, 1] < num_layers]
+        costs.append(graph.cut_costs(output_size, graph.last_use(num_layers, inside)))
+        start += num_layers
+    return np.concatenate(costs) if costs else np.zeros(0, dtype=np.int64)
+
+
+def validate_batch(
+    plans: Sequence[List[ds.Allocation]],
+    layers: List[ds.Layer] = None,
+    segments: List[ds.Segment] = None,
+    edges: np.ndarray = None,
+) -> List[AllocationReport]:
+    """Validates several allocations of the same problem at once, see `validate`.
+
+    All the layers of all the plans are gathered into flat arrays, and every
+    check and metric is computed with a constant number of vectorized operations,
+    thus the cost per plan is a few microseconds, plus the gathering of its rows.
+
+    Args:
+        plans (Sequence[List[ds.Allocation]]): The allocations of each plan.
+        layers (List[ds.Layer]): The layers of the problem, in execution order,
+            None to only check that the layer identifiers increase.
+        segments (List[ds.Segment]): The segments of the problem, in order, None
+            to skip the prefix-use check.
+        edges (np.ndarray): The (producer, consumer) skip edges of the layers,
+            see `graph.last_use`, None for a chain.
+    Returns:
+        List[AllocationReport]: The report of each plan.
+    """
+    rows, segment_rows, counts, sizes = _gather(plans)
+    num_plans = len(sizes)
+    # The plan of each allocation, and of each layer.
+    plan_of = np.repeat(np.arange(num_plans), sizes)
+    layer_plan = np.repeat(plan_of, counts)
+    plan_start = np.concatenate(([0], np.cumsum(sizes)))
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    # The first position of each plan among the layers.
+    plan_layers = np.zeros(num_plans, dtype=np.int64)
+    np.add.at(plan_layers, plan_of, counts)
+    layer_start = np.concatenate(([0], np.cumsum(plan_layers)))
+
+    # Per-segment sums, through prefix sums (empty allocations are allowed).
+    def sums(name: str) -> np.ndarray:
+        prefix = np.concatenate(([0], np.cumsum(rows[name])))
+        return prefix[ends] - prefix[starts]
+
+    used_memory, used_time = sums("memory"), sums("runtime")
+    empty = counts == 0
+    last = np.where(empty, 0, ends - 1)
+    split_point = np.where(empty, ds.COLUMN_NO_ID, rows["id"][last] if len(rows) else 0)
+    if edges is None:
+        held = rows["output_size"]
+    else:
+        held = _cut_costs(rows, plan_layers, edges)
+    stored_output = np.where(empty, 0, held[last] if len(rows) else 0)
+    segment_id = segment_rows["id"]
+
+    # The violations, by plan, each a (plan, message) pair.
+    violations = []
+
+    def report(mask: np.ndarray, message) -> None:
+        for index in np.flatnonzero(mask):
+            violations.append((int(plan_of[index]), message(int(index))))
+
+    report(
+        used_memory > segment_rows["avail_memory"],
+        lambda a: f"Segment {segment_id[a]} uses {used_memory[a]} bytes of memory, "
+        f"{segment_rows['avail_memory'][a]} available",
+    )
+    report(
+        used_time > segment_rows["avail_time"],
+        lambda a: f"Segment {segment_id[a]} uses {used_time[a]} ms, "
+        f"{segment_rows['avail_time'][a]} available",
+    )
+
+    # Ordering: the layers are placed once each, in execution order.
+    ids = rows["id"]
+    if layers is not None:
+        expected = ds.column(layers, "id")
+        position = np.arange(len(rows)) - layer_start[layer_plan]
+        in_range = position < len(expected)
+        wrong = ~in_range
+        wrong[in_range] = ids[in_range] != expected[position[in_range]]
+        wrong_plans = np.unique(layer_plan[wrong])
+        missing = np.flatnonzero(plan_layers != len(expected))
+        for p in np.union1d(wrong_plans, missing):
+            violations.append(
+                (int(p), "The layers are not placed once each, in execution order")
+            )
+    else:
+        decreasing = np.flatnonzero(
+            (ids[1:] <= ids[:-1]) & (layer_plan[1:] == layer_plan[:-1])
+        )
+        for p in np.unique(layer_plan[decreasing + 1]):
+            violations.append((int(p), "The layer identifiers do not increase"))
+
+    # Prefix-use: the used segments are the first ones, in order.
+    if segments is not None:
+        used = ~empty
+        # The rank of each used allocation inside its plan.
+        rank = np.cumsum(used) - 1
+        rank -= np.concatenate(([0], np.cumsum(used)))[plan_start[plan_of]]
+        position = _segment_positions(segment_id, segments)
+        wrong = used & (position != rank)
+        for a in np.flatnonzero(wrong):
+            violations.append(
+                (
+                    int(plan_of[a]),
+                    f"Segment {segment_id[a]} is used in place of the segment in "
+                    f"position {rank[a]}",
+                )
+            )
+
+    by_plan = [[] for _ in range(num_plans)]
+    for p, message in violations:
+        by_plan[p].append(message)
+    reports = []
+    for p in range(num_plans):
+        span = slice(plan_start[p], plan_start[p + 1])
+        reports.append(
+            AllocationReport(
+                valid=not by_plan[p],
+                violations=by_plan[p],
+                segment_id=segment_id[span],
+                num_layers=counts[span],
+                used_memory=used_memory[span],
+                avail_memory=segment_rows["avail_memory"][span],
+                used_time=used_time[span],
+                avail_time=segment_rows["avail_time"][span],
+                split_point=split_point[span],
+                stored_output=stored_output[span],
+            )
+        )
+    return reports
+
+
+def validate(
+    allocations: List[ds.Allocation],
+    layers: List[ds.Layer] = None,
+    segments: List[ds.Segment] = None,
+    edges: np.ndarray = None,
+) -> AllocationReport:
+    """Checks an allocation against all the constraints of the problem, and
+    computes the metrics of each segment in the same pass.
+
+    The constraints are: the memory and time budget of each segment, the ordering
+    (the layers are placed once each, in execution order, when `layers` is given,
+    otherwise their identifiers must increase), and the prefix use (the used
+    segments are the first ones, in order, when `segments` is given).
+
+    Args:
+        allocations (List[ds.Allocation]): The allocations to check.
+        layers (List[ds.Layer]): The layers of the problem, in execution order.
+        segments (List[ds.Segment]): The segments of the problem, in order.
+        edges (np.ndarray): The skip edges of the layers, see `graph.last_use`.
+    Returns:
+        AllocationReport: The violations, and the per-segment metrics.
+    """
+    return validate_batch([allocations], layers, segments, edges)[0]
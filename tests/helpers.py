@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+import numpy as np
+
+from typing import Callable, List, Tuple
+
+import src.data_structures as ds
+import src.optimizer as opt
+
+# A deterministic CP-SAT search.
+CONFIG = opt.SolverConfig(num_workers=1, random_seed=0)
+
+# Draws an integer in [low, high], by default `rng.randint`.
+Draw = Callable[[int, int], int]
+
+
+def random_layers(
+    rng: random.Random,
+    num_layers: int,
+    memory: Tuple[int, int] = (0, 6),
+    runtime: Tuple[int, int] = (0, 4),
+    output_size: Tuple[int, int] = (0, 9),
+    draw: Draw = None,
+) -> List[ds.Layer]:
+    """Random layers, whose columns are drawn inside the given ranges."""
+    draw = draw if draw is not None else rng.randint
+    return [
+        ds.Layer(i, draw(*memory), draw(*runtime), draw(*output_size))
+        for i in range(num_layers)
+    ]
+
+
+def random_segments(
+    rng: random.Random,
+    num_segments: int,
+    avail_memory: Tuple[int, int] = (0, 30),
+    avail_time: Tuple[int, int] = (0, 15),
+    draw: Draw = None,
+) -> List[ds.Segment]:
+    """Random segments, whose budgets are drawn inside the given ranges."""
+    draw = draw if draw is not None else rng.randint
+    return [
+        ds.Segment(i, draw(*avail_memory), draw(*avail_time))
+        for i in range(num_segments)
+    ]
+
+
+def random_edges(rng: random.Random, num_layers: int, rate: float) -> np.ndarray:
+    """Each skip edge (producer, consumer > producer + 1) with probability `rate`."""
+    edges = [
+        (producer, consumer)
+        for producer in range(num_layers)
+        for consumer in range(producer + 2, num_layers)
+        if rng.random() < rate
+    ]
+    return np.array(edges, dtype=np.int64).reshape(-1, 2)
+
+
+def random_instance(
+    rng: random.Random,
+    max_layers: int = 9,
+    max_segments: int = 5,
+    edge_rate: float = 0.0,
+    draw: Draw = None,
+    **ranges: Tuple[int, int],
+) -> Tuple[List[ds.Layer], List[ds.Segment], np.ndarray]:
+    """A small random problem, feasible or not.
+    Args:
+        rng (random.Random): The generator of the problem.
+        max_layers (int): The maximum number of layers (at least one).
+        max_segments (int): The maximum number of segments (at least one).
+        edge_rate (float): The probability of each skip edge, in half of the
+            problems (the others are chains), 0 for chains only.
+        draw (Draw): Draws the columns of layers and segments.
+        ranges (Tuple[int, int]): The ranges of the columns, see `random_layers`
+            and `random_segments`.
+    Returns:
+        Tuple[List[ds.Layer], List[ds.Segment], np.ndarray]: The layers, the
+            segments, and the skip edges (None for a chain).
+    """
+    num_layers, num_segments = rng.randint(1, max_layers), rng.randint(1, max_segments)
+    layer_ranges = {
+        name: ranges.pop(name)
+        for name in ("memory", "runtime", "output_size")
+        if name in ranges
+    }
+    layers = random_layers(rng, num_layers, draw=draw, **layer_ranges)
+    segments = random_segments(rng, num_segments, draw=draw, **ranges)
+    edges = None
+    if edge_rate and rng.random() < 0.5:
+        edges = random_edges(rng, num_layers, edge_rate)
+    return layers, segments, edges
+
+
+def hard_instance() -> Tuple[List[ds.Layer], List[ds.Segment]]:
+    """A problem whose first solution takes a fraction of a second, and whose
+    proof of optimality takes seconds with a single search thread."""
+    rng = random.Random(0)
+    layers = [
+        ds.Layer(l, rng.randint(1, 20), rng.randint(1, 20), rng.randint(0, 1000))
+        for l in range(60)
+    ]
+    segments = [
+        ds.Segment(s, rng.randint(60, 140), rng.randint(60, 140)) for s in range(12)
+    ]
+    return layers, segments
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import random
+
+import src.data_structures as ds
+import src.validation as validation
+from src.batch import PlanJob, plan_batch, solve_job
+from tests.helpers import CONFIG, random_instance
+
+
+class _Crash(str):
+    """A job identifier which kills the worker process unpickling it."""
+
+    def __reduce__(self):
+        return os._exit, (1,)
+
+
+def _jobs(count: int, seed: int = 0):
+    """Feasible jobs, alternating the engines and the identifier types."""
+    rng = random.Random(seed)
+    jobs = []
+    while len(jobs) < count:
+        layers, segments, _ = random_instance(rng, 8, 4, avail_memory=(20, 30))
+        engine = ("cp_sat", "dp")[len(jobs) % 2]
+        job_id = (f"job{len(jobs)}", len(jobs))[len(jobs) % 2]
+        job = PlanJob(job_id, layers, segments, engine=engine, config=CONFIG)
+        if solve_job(job).ok:
+            jobs.append(job)
+    return jobs
+
+
+def test_results_keep_the_job_ids():
+    jobs = _jobs(6)
+    results = {result.job_id: result for result in plan_batch(jobs, workers=2)}
+    assert set(results) == {job.job_id for job in jobs}
+    for job in jobs:
+        result = results[job.job_id]
+        assert result.status == "OPTIMAL" and result.error is None
+        report = validation.validate(result.allocations, job.layers, job.segments)
+        assert report.valid, report.violations
+        assert report.total_output_size == result.objective
+
+
+def test_failures_are_reported_per_job():
+    layers = [ds.Layer(0, 10, 1, 1), ds.Layer(1, 10, 1, 1)]
+    segments = [ds.Segment(0, 5, 10)]
+    fitting = [ds.Segment(0, 20, 10)]
+    jobs = [
+        PlanJob("infeasible", layers, segments, config=CONFIG),
+        PlanJob("dp infeasible", layers, segments, engine="dp"),
+        # The deadline passes before the search can start.
+        PlanJob("timeout", layers, fitting, config=CONFIG, deadline=0.0),
+        PlanJob("error", layers, fitting, engine="simplex"),
+        PlanJob("ok", layers, fitting, config=CONFIG),
+    ]
+    results = {result.job_id: result for result in plan_batch(jobs, workers=2)}
+    assert {job_id: result.status for job_id, result in results.items()} == {
+        "infeasible": "INFEASIBLE",
+        "dp infeasible": "INFEASIBLE",
+        "timeout": "TIMEOUT",
+        "error": "ERROR",
+        "ok": "OPTIMAL",
+    }
+    assert "simplex" in results["error"].error
+    assert not any(results[job_id].ok for job_id in ("infeasible", "timeout"))
+
+
+def test_a_crash_only_fails_its_job():
+    jobs = _jobs(5)
+    jobs.insert(2, PlanJob(_Crash("crash"), jobs[0].layers, jobs[0].segments))
+    results = {result.job_id: result for result in plan_batch(jobs, workers=2)}
+    assert set(results) == {job.job_id for job in jobs}
+    assert results["crash"].status == "ERROR"
+    assert "crashed" in results["crash"].error
+    # The other jobs, in flight or not when the pool broke, are solved.
+    for job in jobs:
+        if job.job_id != "crash":
+            assert results[job.job_id].status == "OPTIMAL"
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+import numpy as np
+import pytest
+
+import src.data_structures as ds
+from src.cache import SolutionCache, canonical_key
+from tests.helpers import CONFIG
+
+
+def _instance(seed: int):
+    """A small feasible problem."""
+    rng = random.Random(seed)
+    layers = [
+        ds.Layer(l, rng.randint(1, 6), rng.randint(1, 4), rng.randint(0, 9))
+        for l in range(rng.randint(2, 8))
+    ]
+    segments = [ds.Segment(s, 30, 15) for s in range(4)]
+    return layers, segments
+
+
+def _blocks(result):
+    return [
+        (allocation.segment.id, [layer.id for layer in allocation.layers])
+        for allocation in result.allocations
+    ]
+
+
+def test_canonical_key():
+    layers, segments = _instance(0)
+    key = canonical_key(layers, segments, "output_size", CONFIG)
+    # The identifiers do not change the solution.
+    renamed = [ds.Layer(10 + l.id, l.memory, l.runtime, l.output_size) for l in layers]
+    assert canonical_key(renamed, segments, "output_size", CONFIG) == key
+    assert canonical_key(layers, segments, "knapsack", CONFIG) != key
+    # The skip edges are a set.
+    assert canonical_key(
+        layers, segments, "output_size", CONFIG, edges=[(0, 2), (1, 3), (0, 2)]
+    ) == canonical_key(layers, segments, "output_size", CONFIG, edges=[(1, 3), (0, 2)])
+    # NumPy floats are not truncated, unknown objects are rejected.
+    assert canonical_key(
+        layers, segments, "output_size", CONFIG, scale=np.float32(1.9)
+    ) != canonical_key(layers, segments, "output_size", CONFIG, scale=np.float32(1.0))
+    assert canonical_key(
+        layers, segments, "output_size", CONFIG, scale=np.int64(2)
+    ) == canonical_key(layers, segments, "output_size", CONFIG, scale=2)
+    with pytest.raises(TypeError):
+        canonical_key(layers, segments, "output_size", CONFIG, scale=object())
+
+
+def test_solve_hits_both_tiers(tmp_path):
+    layers, segments = _instance(1)
+    path = str(tmp_path / "solutions.db")
+    cache = SolutionCache(path)
+    result = cache.solve(layers, segments, config=CONFIG)
+    assert result.status == "OPTIMAL" and (cache.hits, cache.misses) == (0, 1)
+    again = cache.solve(layers, segments, config=CONFIG)
+    assert cache.hits == 1
+    assert _blocks(again) == _blocks(result) and again.objective == result.objective
+    # The allocations reference the layers given to the lookup.
+    assert all(
+        layer is layers[layer.id] for a in again.allocations for layer in a.layers
+    )
+    cache.close()
+    # A new process only has the database.
+    cache = SolutionCache(path)
+    again = cache.solve(layers, segments, config=CONFIG)
+    assert cache.hits == 1
+    assert _blocks(again) == _blocks(result)
+    assert again.stats.num_layers == len(layers)
+    cache.close()
+
+
+def test_only_optimal_results_are_stored():
+    layers, segments = _instance(2)
+    cache = SolutionCache()
+    key = canonical_key(layers, segments, "output_size", CONFIG)
+    result = cache.solve(layers, segments, config=CONFIG)
+    result.status = "FEASIBLE"
+    cache.clear()
+    cache.put(key, result, segments)
+    assert cache.get(key, layers, segments) is None and len(cache) == 0
+    result.status = "OPTIMAL"
+    cache.put(key, result, segments)
+    assert cache.get(key, layers, segments) is not None and len(cache) == 1
+
+
+def test_memory_hits_keep_entries_on_disk():
+    problems = [_instance(seed) for seed in range(3)]
+    keys = [canonical_key(l, s, "output_size", CONFIG) for l, s in problems]
+    cache = SolutionCache(max_entries=2)
+    for layers, segments in problems[:2]:
+        cache.solve(layers, segments, config=CONFIG)
+    # The first problem is then only used from the in-process tier.
+    assert cache.get(keys[0], *problems[0]) is not None
+    cache.solve(*problems[2], config=CONFIG)
+    # The least recently used entry of the database was the second one.
+    cache.memory.clear()
+    assert cache.get(keys[0], *problems[0]) is not None
+    assert cache.get(keys[1], *problems[1]) is None
+    assert cache.get(keys[2], *problems[2]) is not None
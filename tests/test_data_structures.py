@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pickle
+
+import src.data_structures as ds
+
+
+def test_from_dict_coerces_like_int():
+    layer = ds.Layer.from_dict({"memory": "12", "runtime": 3.7, "output_size": 2.0})
+    assert (layer.id, layer.memory, layer.runtime, layer.output_size) == (
+        ds.NO_ID,
+        12,
+        3,
+        2,
+    )
+    segment = ds.Segment.from_dict({"id": "first", "avail_memory": 9.9})
+    assert (segment.id, segment.avail_memory, segment.avail_time) == ("first", 9, 0)
+
+
+def test_rows_convert_at_the_column_boundary():
+    layers = [ds.Layer.from_dict({"memory": 4}), ds.Layer(3, 1.9, 2, 5)]
+    # The rows keep their values, the table converts them.
+    assert layers[1].memory == 1.9
+    table = ds.LayerTable.from_layers(layers)
+    assert table.column("id").tolist() == [ds.COLUMN_NO_ID, 3]
+    assert table.column("memory").tolist() == [4, 1]
+    assert ds.column(layers, "id").tolist() == [ds.COLUMN_NO_ID, 3]
+    table[1].runtime = 7.5
+    assert table[1].runtime == 7
+    assert table.sum("runtime") == 7
+    # The views survive a round trip through pickle.
+    assert pickle.loads(pickle.dumps(table))[1].runtime == 7
+
+
+def test_get_layer_list_keeps_every_placed_layer():
+    first, second = ds.Layer(0, 1, 1, 1), ds.Layer(0, 2, 2, 2)
+    allocations = [
+        ds.Allocation(ds.Segment(0, 10, 10), [first, first]),
+        ds.Allocation(ds.Segment(1, 10, 10), [second]),
+    ]
+    layers = ds.get_layer_list(allocations)
+    assert len(layers) == 2
+    assert {id(layer) for layer in layers} == {id(first), id(second)}
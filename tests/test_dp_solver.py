@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+import src.data_structures as ds
+import src.dp_solver as dp_solver
+import src.optimizer as opt
+import src.validation as validation
+from src.dp_solver import OBJECTIVES, _range_min, solve_dp
+from tests.helpers import CONFIG, random_instance
+
+
+def _dp_value(layers, segments, objective, edges, allow_empty):
+    """Checks the allocations of the DP, and returns their objective value (None
+    if infeasible)."""
+    try:
+        allocations = solve_dp(
+            layers, segments, objective, edges=edges, allow_empty=allow_empty
+        )
+    except ds.NoSolutionError:
+        return None
+    used = [allocation.segment for allocation in allocations]
+    # The used segments are in order, and the first ones unless `allow_empty`.
+    assert [segment.id for segment in used] == sorted(segment.id for segment in used)
+    report = validation.validate(
+        allocations, layers, segments if not allow_empty else used, edges
+    )
+    assert report.valid, report.violations
+    return len(allocations) if objective == "knapsack" else report.total_output_size
+
+
+def _cp_sat_value(layers, segments, objective, edges):
+    """The optimal objective value of the CP-SAT model (None if infeasible)."""
+    solve = opt.minimize_output_size if objective == "output_size" else opt.knapsack
+    try:
+        result = solve(
+            layers,
+            segments,
+            config=CONFIG,
+            return_result=True,
+            edges=edges,
+        )
+    except ds.NoSolutionError as error:
+        assert error.status == "INFEASIBLE"
+        return None
+    assert result.status == "OPTIMAL"
+    return round(result.objective)
+
+
+@pytest.mark.parametrize("objective", OBJECTIVES)
+def test_dp_matches_cp_sat(objective):
+    rng = random.Random(0)
+    for _ in range(40):
+        layers, segments, edges = random_instance(rng, 8, 4, edge_rate=0.2)
+        assert _dp_value(layers, segments, objective, edges, False) == (
+            _cp_sat_value(layers, segments, objective, edges)
+        )
+
+
+@pytest.mark.parametrize("objective", OBJECTIVES)
+def test_dp_allow_empty_matches_best_subset(objective):
+    rng = random.Random(1)
+    for _ in range(30):
+        layers, segments, edges = random_instance(rng, 8, 4, edge_rate=0.2)
+        # Leaving segments empty is the same as solving over a subsequence of them.
+        values = [
+            _cp_sat_value(layers, list(subset), objective, edges)
+            for size in range(1, len(segments) + 1)
+            for subset in itertools.combinations(segments, size)
+        ]
+        values = [value for value in values if value is not None]
+        assert _dp_value(layers, segments, objective, edges, True) == (
+            min(values) if values else None
+        )
+
+
+def test_range_min_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for size in (1, 100, 3000, 5000):
+        values = rng.integers(0, 1 << 40, size)
+        # Short windows, and windows of whole blocks (see BLOCK_LEVEL) and more.
+        width = rng.integers(1, [8, 128, size + 1], (200, 3)).ravel()
+        width = np.minimum(width, size)
+        lo = rng.integers(0, size - width + 1)
+        hi = lo + width - 1
+        expected = [values[l : h + 1].min() for l, h in zip(lo, hi)]
+        np.testing.assert_array_equal(_range_min(values, lo, hi), expected)
+
+
+def _reference_dp(layers, segments, costs):
+    """The optimal cost, with a plain O(S * L * W) dynamic program."""
+    memory = [layer.memory for layer in layers]
+    runtime = [layer.runtime for layer in layers]
+    num_layers = len(layers)
+    previous = np.full(num_layers + 1, dp_solver.INF, dtype=np.int64)
+    previous[0] = 0
+    best = dp_solver.INF
+    for segment in segments:
+        current = np.full(num_layers + 1, dp_solver.INF, dtype=np.int64)
+        # The first layer fitting with the layers up to j - 1, by two pointers.
+        i, used_memory, used_time = 0, 0, 0
+        for j in range(1, num_layers + 1):
+            used_memory, used_time = (
+                used_memory + memory[j - 1],
+                used_time + runtime[j - 1],
+            )
+            while i < j and (
+                used_memory > segment.avail_memory or used_time > segment.avail_time
+            ):
+                used_memory, used_time = used_memory - memory[i], used_time - runtime[i]
+                i += 1
+            if i < j:
+                value = previous[i:j].min()
+                if value < dp_solver.INF:
+                    current[j] = value + costs[j - 1]
+        best = min(best, int(current[num_layers]))
+        previous = current
+    return None if best >= dp_solver.INF else best
+
+
+@pytest.mark.parametrize("objective", OBJECTIVES)
+def test_dp_matches_reference_on_wide_windows(objective):
+    rng = random.Random(2)
+    for _ in range(3):
+        num_layers = rng.randint(2000, 4000)
+        layers = [
+            ds.Layer(l, rng.randint(1, 20), rng.randint(1, 20), rng.randint(0, 1000))
+            for l in range(num_layers)
+        ]
+        # Windows of about 130 to 300 layers.
+        segments = [
+            ds.Segment(s, rng.randint(1400, 3000), rng.randint(1400, 3000))
+            for s in range(num_layers // 130)
+        ]
+        costs = dp_solver._segment_costs(layers, objective)
+        expected = _reference_dp(layers, segments, costs)
+        assert _dp_value(layers, segments, objective, None, False) == expected
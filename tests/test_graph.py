@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+import numpy as np
+import pytest
+
+import src.data_structures as ds
+import src.graph as graph
+import src.optimizer as opt
+from src.dp_solver import solve_dp
+from tests.helpers import CONFIG
+
+
+def _held(output_size, edges, split):
+    """The memory held across the split after a layer, by brute force."""
+    consumers = {(p, p + 1) for p in range(len(output_size))}
+    consumers |= {tuple(edge) for edge in edges}
+    return sum(
+        output_size[p]
+        for p in range(split + 1)
+        if any(q > split for producer, q in consumers if producer == p)
+    )
+
+
+def test_split_costs_match_brute_force():
+    rng = random.Random(0)
+    for _ in range(100):
+        num_layers = rng.randint(1, 12)
+        layers = [ds.Layer(i, 1, 1, rng.randint(0, 9)) for i in range(num_layers)]
+        output_size = [layer.output_size for layer in layers]
+        edges = [
+            (producer, consumer)
+            for producer in range(num_layers)
+            for consumer in range(producer + 2, num_layers)
+            if rng.random() < 0.3
+        ]
+        costs = graph.split_costs(layers, np.array(edges).reshape(-1, 2))
+        assert costs.tolist() == [
+            _held(output_size, edges, split) for split in range(num_layers)
+        ]
+        for split in range(num_layers):
+            live = graph.live_tensors(num_layers, np.array(edges).reshape(-1, 2), split)
+            assert sum(output_size[p] for p in live) == costs[split]
+        # Without edges, only the output of the layer before the split is held.
+        assert graph.split_costs(layers).tolist() == output_size
+        assert graph.split_costs(layers, np.zeros((0, 2))).tolist() == output_size
+
+
+def test_last_use():
+    edges = np.array([[0, 3], [0, 2], [2, 4]])
+    assert graph.last_use(5, edges).tolist() == [3, 2, 4, 4, 5]
+    assert graph.last_use(3).tolist() == [1, 2, 3]
+    for edge in ([1, 1], [2, 1], [-1, 2], [0, 5]):
+        with pytest.raises(ValueError):
+            graph.last_use(5, np.array([edge]))
+
+
+def test_skip_edges_move_the_split():
+    # The cheapest split is after layer 1, unless the output of layer 0 is
+    # consumed by layer 3, i.e., held across it.
+    layers = [ds.Layer(i, 1, 1, size) for i, size in enumerate([8, 1, 3, 2])]
+    segments = [ds.Segment(0, 2, 10), ds.Segment(1, 3, 10)]
+    edges = np.array([[0, 3]])
+    for solve in (
+        lambda edges: solve_dp(layers, segments, edges=edges),
+        lambda edges: opt.minimize_output_size(
+            layers, segments, config=CONFIG, edges=edges
+        ),
+    ):
+        assert [len(a.layers) for a in solve(None)] == [2, 2]
+        assert [len(a.layers) for a in solve(edges)] == [1, 3]
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+import src.data_structures as ds
+import src.optimizer as opt
+import src.validation as validation
+from src.dp_solver import solve_dp
+from src.greedy import OBJECTIVES, solve_greedy
+from tests.helpers import CONFIG, random_instance
+
+
+def _optimum(layers, segments, objective, edges):
+    """The optimal objective value (None if infeasible), see `solve_dp`."""
+    try:
+        allocations = solve_dp(layers, segments, objective, edges=edges)
+    except ds.NoSolutionError:
+        return None
+    if objective == "knapsack":
+        return len(allocations)
+    return validation.validate(allocations, layers, segments, edges).total_output_size
+
+
+@pytest.mark.parametrize("objective", OBJECTIVES)
+def test_greedy_is_valid_and_bounds_the_optimum(objective):
+    rng = random.Random(0)
+    solved = 0
+    for _ in range(300):
+        layers, segments, edges = random_instance(
+            rng, 30, 8, edge_rate=0.1, avail_memory=(5, 30), avail_time=(3, 15)
+        )
+        optimum = _optimum(layers, segments, objective, edges)
+        try:
+            allocations, bound = solve_greedy(layers, segments, objective, edges=edges)
+        except ds.NoSolutionError as error:
+            # The greedy fill only fails on its own when a segment is too small.
+            assert error.status == "UNKNOWN" or optimum is None
+            continue
+        assert optimum is not None
+        # The used segments are the first ones.
+        assert [a.segment for a in allocations] == segments[: len(allocations)]
+        report = validation.validate(allocations, layers, segments, edges)
+        assert report.valid, report.violations
+        value = (
+            len(allocations) if objective == "knapsack" else report.total_output_size
+        )
+        assert bound <= optimum <= value
+        if objective == "knapsack":
+            # Filling the segments in order uses the fewest ones.
+            assert bound == optimum == value
+        solved += 1
+    assert solved > 100
+
+
+def test_greedy_hint_reaches_the_optimum():
+    rng = random.Random(1)
+    for _ in range(20):
+        layers, segments, edges = random_instance(
+            rng, 30, 8, edge_rate=0.1, avail_memory=(5, 30), avail_time=(3, 15)
+        )
+        try:
+            allocations, bound = solve_greedy(layers, segments, edges=edges)
+        except ds.NoSolutionError:
+            continue
+        model = opt.LoScModel(layers, segments, edges=edges)
+        model.set_hint(allocations)
+        model.set_objective("output_size")
+        result = model.solve(CONFIG)
+        # Every placement variable is hinted, from the greedy allocations.
+        hint = model.model.Proto().solution_hint
+        assert len(hint.vars) == len(model.x)
+        assert result.status == "OPTIMAL"
+        assert (
+            bound
+            <= round(result.objective)
+            == _optimum(layers, segments, "output_size", edges)
+        )
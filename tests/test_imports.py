@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.import_time import HEAVY, MODULES
+
+# The root of the repository, where the modules are imported from.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(code: str):
+    """Runs the code in a fresh interpreter, and returns what it prints (JSON)."""
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=ROOT,
+    ).stdout
+    return json.loads(output)
+
+
+def test_core_modules_do_not_import_heavy_dependencies():
+    code = "\n".join(
+        [f"import {module}" for module in MODULES]
+        + [
+            "import json, sys",
+            f"print(json.dumps([name for name in {HEAVY!r} if name in sys.modules]))",
+        ]
+    )
+    assert _run(code) == []
+
+
+def test_first_build_time_excludes_the_import():
+    code = """
+import json
+import src.data_structures as ds
+import src.optimizer as opt
+layers = [ds.Layer(i, 1, 1, i) for i in range(4)]
+model = opt.LoScModel(layers, [ds.Segment(s, 2, 2) for s in range(2)])
+print(json.dumps([model.build_time, sum(model.build_times.values())]))
+"""
+    build_time, families = _run(code)
+    # Importing OR-Tools takes hundreds of milliseconds.
+    assert families <= build_time < 0.1
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+import numpy as np
+import pytest
+
+import src.data_structures as ds
+import src.validation as validation
+from src.dp_solver import OBJECTIVES, IncrementalPlanner, solve_dp
+
+
+def _layer(rng: random.Random, id: int) -> ds.Layer:
+    return ds.Layer(id, rng.randint(1, 20), rng.randint(1, 20), rng.randint(0, 100))
+
+
+def _segment(rng: random.Random, id: int) -> ds.Segment:
+    return ds.Segment(id, rng.randint(10, 80), rng.randint(10, 80))
+
+
+def _edges(rng: random.Random, num_layers: int) -> np.ndarray:
+    """A few random skip edges, or None for a chain."""
+    if rng.random() < 0.5:
+        return None
+    edges = [
+        (producer, consumer)
+        for producer in range(num_layers)
+        for consumer in range(producer + 2, num_layers)
+        if rng.random() < 0.05
+    ]
+    return np.array(edges, dtype=np.int64).reshape(-1, 2)
+
+
+def _value(allocations, layers, segments, objective, edges):
+    """Checks the allocations, and returns their objective value (None if none)."""
+    if allocations is None:
+        return None
+    report = validation.validate(allocations, layers, segments, edges)
+    assert report.valid, report.violations
+    return len(allocations) if objective == "knapsack" else report.total_output_size
+
+
+def _reference(layers, segments, objective, edges):
+    """The objective value of a fresh solve (None if infeasible)."""
+    try:
+        allocations = solve_dp(layers, segments, objective, edges=edges)
+    except ds.NoSolutionError:
+        return None
+    return _value(allocations, layers, segments, objective, edges)
+
+
+@pytest.mark.parametrize("objective", OBJECTIVES)
+def test_updates_match_fresh_solves(objective):
+    rng = random.Random(0)
+    for _ in range(60):
+        num_layers, num_segments = rng.randint(1, 30), rng.randint(1, 12)
+        layers = [_layer(rng, l) for l in range(num_layers)]
+        segments = [_segment(rng, s) for s in range(num_segments)]
+        edges = _edges(rng, num_layers)
+        planner = IncrementalPlanner(layers, segments, objective, edges)
+        assert _value(planner.allocations, layers, segments, objective, edges) == (
+            _reference(layers, segments, objective, edges)
+        )
+        for _ in range(8):
+            new_layers = {
+                l: _layer(rng, l)
+                for l in rng.sample(
+                    range(num_layers), rng.randint(0, min(2, num_layers))
+                )
+            }
+            new_segments = {
+                s: _segment(rng, s)
+                for s in rng.sample(range(num_segments), rng.randint(0, 1))
+            }
+            layers = [new_layers.get(l, layer) for l, layer in enumerate(layers)]
+            segments = [new_segments.get(s, seg) for s, seg in enumerate(segments)]
+            try:
+                allocations = planner.update(new_layers, new_segments)
+            except ds.NoSolutionError:
+                allocations = None
+            assert allocations is planner.allocations
+            assert _value(allocations, layers, segments, objective, edges) == (
+                _reference(layers, segments, objective, edges)
+            )
+
+
+def test_infeasible_planner_recovers():
+    layers = [ds.Layer(l, 10, 1, l) for l in range(4)]
+    segments = [ds.Segment(0, 20, 10), ds.Segment(1, 5, 10)]
+    planner = IncrementalPlanner(layers, segments)
+    assert planner.allocations is None
+    allocations = planner.update(segments={1: ds.Segment(1, 20, 10)})
+    assert [len(allocation.layers) for allocation in allocations] == [2, 2]
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+import src.data_structures as ds
+import src.optimizer as opt
+from tests.helpers import CONFIG, random_instance
+
+
+def _optimum(model: opt.LoScModel):
+    """The optimal objective value, or the status when there is no solution."""
+    try:
+        result = model.solve(CONFIG)
+    except ds.NoSolutionError as error:
+        return error.status
+    assert result.status == "OPTIMAL"
+    return round(result.objective)
+
+
+def _fresh(layers, segments, objective, presolve):
+    """The optimum of a model built for the given budgets."""
+    try:
+        model = opt.LoScModel(layers, segments, "linear", presolve)
+    except ds.NoSolutionError as error:
+        return error.status
+    model.set_objective(objective)
+    return _optimum(model)
+
+
+@pytest.mark.parametrize("presolve", [True, False])
+@pytest.mark.parametrize("objective", opt.OBJECTIVES)
+def test_budget_changes_match_fresh_models(objective, presolve):
+    rng = random.Random(0)
+    solved = 0
+    while solved < 20:
+        layers, segments, _ = random_instance(rng)
+        try:
+            model = opt.LoScModel(layers, segments, "linear", presolve)
+        except ds.NoSolutionError:
+            continue
+        model.set_objective(objective)
+        assert _optimum(model) == _fresh(layers, segments, objective, presolve)
+        for _ in range(4):
+            # Tighten or relax the budgets of a few segments.
+            for s in rng.sample(range(len(segments)), rng.randint(1, len(segments))):
+                segment = segments[s]
+                segments[s] = ds.Segment(
+                    segment.id,
+                    max(0, segment.avail_memory + rng.randint(-10, 10)),
+                    max(0, segment.avail_time + rng.randint(-5, 5)),
+                )
+            model.set_budgets(
+                [segment.avail_memory for segment in segments],
+                [segment.avail_time for segment in segments],
+            )
+            assert _optimum(model) == _fresh(layers, segments, objective, presolve)
+        solved += 1
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+import src.data_structures as ds
+import src.optimizer as opt
+from tests.helpers import CONFIG, random_instance
+
+
+def _optimum(layers, segments, objective, ordering, presolve):
+    """The optimal objective value, or the status when there is no solution."""
+    solve = opt.minimize_output_size if objective == "output_size" else opt.knapsack
+    try:
+        result = solve(
+            layers,
+            segments,
+            ordering=ordering,
+            presolve=presolve,
+            config=CONFIG,
+            return_result=True,
+        )
+    except ds.NoSolutionError as error:
+        return error.status
+    assert result.status == "OPTIMAL"
+    return round(result.objective)
+
+
+@pytest.mark.parametrize("presolve", [True, False])
+@pytest.mark.parametrize("objective", opt.OBJECTIVES)
+def test_orderings_agree(objective, presolve):
+    rng = random.Random(0)
+    for _ in range(40):
+        layers, segments, _ = random_instance(rng)
+        assert _optimum(layers, segments, objective, "pairwise", presolve) == (
+            _optimum(layers, segments, objective, "linear", presolve)
+        )
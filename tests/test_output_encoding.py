@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+import src.data_structures as ds
+import src.optimizer as opt
+import src.validation as validation
+from tests.helpers import CONFIG, random_instance
+
+
+def _optimum(layers, segments, edges, output_encoding, presolve):
+    """The optimal output size, or the status when there is no solution."""
+    try:
+        result = opt.minimize_output_size(
+            layers,
+            segments,
+            ordering="linear",
+            presolve=presolve,
+            config=CONFIG,
+            return_result=True,
+            output_encoding=output_encoding,
+            edges=edges,
+        )
+    except ds.NoSolutionError as error:
+        return error.status
+    assert result.status == "OPTIMAL"
+    report = validation.validate(result.allocations, layers, segments, edges)
+    assert report.valid, report.violations
+    assert report.total_output_size == round(result.objective)
+    return round(result.objective)
+
+
+@pytest.mark.parametrize("presolve", [True, False])
+def test_output_encodings_agree(presolve):
+    rng = random.Random(0)
+    for _ in range(40):
+        layers, segments, edges = random_instance(rng, edge_rate=0.2)
+        assert _optimum(layers, segments, edges, "element", presolve) == (
+            _optimum(layers, segments, edges, "linear", presolve)
+        )
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+import random
+
+import numpy as np
+import pandas as pd
+
+import src.data_structures as ds
+from src.dp_solver import solve_dp
+from src.pareto import COLUMNS, pareto_front, pareto_sweep
+from tests.helpers import CONFIG, random_instance
+
+# The budgets of the sweeps, from infeasible to unconstrained.
+BUDGETS = list(range(0, 31, 2))
+
+
+def _independent(layers, segments, budget):
+    """The optimal output size of a budget, solved on its own (NaN if none)."""
+    capped = [
+        ds.Segment(s.id, min(s.avail_memory, budget), s.avail_time) for s in segments
+    ]
+    try:
+        allocations = solve_dp(layers, capped)
+    except ds.NoSolutionError:
+        return math.nan
+    return sum(allocation.get_output_size() for allocation in allocations)
+
+
+def _instances(count: int, seed: int = 0):
+    """Random instances, feasible without a budget."""
+    rng = random.Random(seed)
+    while count:
+        layers, segments, _ = random_instance(rng, 8, 4, avail_memory=(10, 30))
+        if not math.isnan(_independent(layers, segments, max(BUDGETS))):
+            count -= 1
+            yield layers, segments
+
+
+def test_sweep_matches_independent_solves():
+    for layers, segments in _instances(10):
+        frame = pareto_sweep(
+            layers,
+            segments,
+            BUDGETS[::-1] + BUDGETS,
+            config=CONFIG,
+            keep_dominated=True,
+        )
+        assert list(frame.columns) == COLUMNS + ["dominated"]
+        assert frame["budget"].tolist() == BUDGETS
+        expected = [_independent(layers, segments, budget) for budget in BUDGETS]
+        np.testing.assert_array_equal(frame["output_size"], expected)
+        feasible = frame["output_size"].notna()
+        assert (frame["status"][feasible] == "OPTIMAL").all()
+        assert (frame["status"][~feasible] == "INFEASIBLE").all()
+        assert (frame["peak_memory"][feasible] <= frame["budget"][feasible]).all()
+
+
+def test_dominated_and_infeasible_points_are_pruned():
+    for layers, segments in _instances(10, seed=1):
+        front = pareto_sweep(layers, segments, BUDGETS, config=CONFIG)
+        points = [
+            (budget, _independent(layers, segments, budget)) for budget in BUDGETS
+        ]
+        # A point is on the front if no feasible point of a smaller budget is as good.
+        expected = [
+            (budget, size)
+            for k, (budget, size) in enumerate(points)
+            if not math.isnan(size)
+            and all(not other <= size for _, other in points[:k])
+        ]
+        assert list(zip(front["budget"], front["output_size"])) == expected
+        # The front improves strictly with the budget.
+        assert front["output_size"].is_monotonic_decreasing
+        assert front["output_size"].is_unique
+
+
+def test_pareto_front_of_a_table():
+    frame = pd.DataFrame(
+        dict(budget=[4, 1, 2, 3, 5, 0], output_size=[5, 9, 7, 7, 5, math.nan])
+    )
+    assert pareto_front(frame).tolist() == [True, True, True, False, False, False]
+
+
+def test_workers_give_the_same_table():
+    deterministic = ["budget", "output_size", "bound", "status", "dominated"]
+    for layers, segments in _instances(4, seed=2):
+        tables = [
+            pareto_sweep(
+                layers,
+                segments,
+                BUDGETS,
+                workers=workers,
+                config=CONFIG,
+                keep_dominated=True,
+            )
+            for workers in (1, 3)
+        ]
+        # The solutions may differ between the chunks, not their values.
+        pd.testing.assert_frame_equal(
+            tables[0][deterministic], tables[1][deterministic]
+        )
+        for table in tables:
+            feasible = table["output_size"].notna()
+            assert (table["peak_memory"][feasible] <= table["budget"][feasible]).all()
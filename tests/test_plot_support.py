@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+import matplotlib
+
+# Headless, whatever the environment of the tests.
+matplotlib.use("Agg")
+
+import numpy as np
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.figure import Figure
+
+import src.data_structures as ds
+import src.plot_support as plot_support
+
+
+def _plan(num_layers: int, num_blocks: int, seed: int = 0):
+    """Random contiguous blocks of layers, each followed by an empty segment."""
+    rng = np.random.default_rng(seed)
+    layers = [
+        ds.Layer(l, 1, 1, int(size))
+        for l, size in enumerate(rng.integers(0, 1 << 20, num_layers))
+    ]
+    cuts = np.sort(rng.choice(np.arange(1, num_layers), num_blocks - 1, False))
+    plan = []
+    for k, block in enumerate(np.split(np.arange(num_layers), cuts)):
+        plan.append(
+            ds.Allocation(ds.Segment(2 * k, 0, 0), layers[block[0] : block[-1] + 1])
+        )
+        plan.append(ds.Allocation(ds.Segment(2 * k + 1, 0, 0), []))
+    return plan
+
+
+def test_decimate_keeps_the_extremes():
+    rng = np.random.default_rng(0)
+    x = np.arange(10_000)
+    y = rng.normal(size=len(x))
+    y[[17, 5000, 9999]] = [50.0, -50.0, 60.0]
+    kept_x, kept_y = plot_support.decimate(x, y, 100)
+    assert len(kept_x) <= 100 and np.all(np.diff(kept_x) > 0)
+    assert np.array_equal(kept_y, y[kept_x])
+    assert {17, 5000, 9999} <= set(kept_x.tolist())
+    # The extremes of every bucket, thus of every stretch of the curve.
+    for bucket in np.array_split(np.arange(len(x)), 50):
+        assert bucket[np.argmax(y[bucket])] in kept_x
+        assert bucket[np.argmin(y[bucket])] in kept_x
+    # Short curves are kept whole.
+    assert plot_support.decimate(x[:100], y[:100], 100)[0].tolist() == list(range(100))
+    assert len(plot_support.decimate(x, y, None)[0]) == len(x)
+
+
+def test_drawn_collections():
+    plans = [_plan(5000, 40, seed) for seed in range(6)]
+    used = [allocation for allocation in plans[0] if allocation.layers]
+    figure = Figure()
+    ax = figure.subplots()
+    # One polygon per used segment, and one line per plan.
+    blocks = plot_support.plot_allocation_blocks(ax, plans[0])
+    overlay = plot_support.plot_allocations_overlay(ax, plans, values=range(6))
+    assert [type(c) for c in ax.collections] == [PolyCollection, LineCollection]
+    assert len(blocks.get_paths()) == len(used)
+    assert len(overlay.get_paths()) == len(plans)
+    # Above MAX_POINTS layers, only the ends of each segment are drawn.
+    line = plot_support.plot_allocation(ax, plans[0])
+    assert len(line.get_xdata()) == 2 * len(used)
+    # A single collection for the splits (but the last), at most MAX_LABELS of
+    # them labelled.
+    ax = figure.subplots()
+    splits = plot_support.plot_splitting_points(ax, plans[0])
+    assert list(ax.collections) == [splits]
+    assert len(splits.get_segments()) == len(ax.texts) == len(used) - 1
+    ax = figure.subplots()
+    splits = plot_support.plot_splitting_columns(ax, np.arange(200))
+    assert list(ax.collections) == [splits] and len(splits.get_segments()) == 199
+    assert len(ax.texts) == plot_support.MAX_LABELS
+    line = plot_support.plot_layers_output_memory(
+        ax, [layer for allocation in used for layer in allocation.layers]
+    )
+    assert len(line.get_xdata()) <= plot_support.MAX_POINTS
+
+
+def test_parallel_export_writes_the_same_files(tmp_path):
+    plans = {f"plan{seed}": _plan(300, 12, seed) for seed in range(5)}
+    serial = plot_support.export_allocations(plans, str(tmp_path / "serial"))
+    parallel = plot_support.export_allocations(
+        plans, str(tmp_path / "parallel"), workers=3
+    )
+    assert list(serial) == list(parallel) == list(plans)
+    for name in plans:
+        assert os.path.basename(serial[name]) == f"{name}.png"
+        with open(serial[name], "rb") as left, open(parallel[name], "rb") as right:
+            assert left.read() == right.read()
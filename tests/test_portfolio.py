@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+import threading
+
+import pytest
+
+import src.data_structures as ds
+import src.greedy as greedy
+import src.validation as validation
+from src.dp_solver import solve_dp
+from src.portfolio import ENGINES, plan
+from tests.helpers import CONFIG, hard_instance, random_instance
+
+
+def _check(result, layers, segments, objective):
+    """Checks the allocations of a plan against its objective value."""
+    report = validation.validate(result.allocations, layers, segments)
+    assert report.valid, report.violations
+    value = (
+        len(result.allocations) if objective == "knapsack" else report.total_output_size
+    )
+    assert result.objective == value and result.bound <= value
+
+
+@pytest.mark.parametrize("objective", ["output_size", "knapsack"])
+def test_plan_is_optimal_and_verified(objective):
+    rng = random.Random(0)
+    planned = 0
+    while planned < 15:
+        layers, segments, _ = random_instance(rng, 12)
+        try:
+            allocations = solve_dp(layers, segments, objective)
+        except ds.NoSolutionError:
+            with pytest.raises(ds.NoSolutionError) as error:
+                plan(layers, segments, objective, deadline=5.0, config=CONFIG)
+            assert error.value.status == "INFEASIBLE"
+            continue
+        result = plan(layers, segments, objective, deadline=5.0, config=CONFIG)
+        _check(result, layers, segments, objective)
+        assert result.status == "OPTIMAL" and result.gap == 0.0
+        report = validation.validate(allocations, layers, segments)
+        assert result.objective == (
+            len(allocations) if objective == "knapsack" else report.total_output_size
+        )
+        assert result.engine in ENGINES
+        assert result.outcomes[result.engine] in ("OPTIMAL", "FEASIBLE")
+        planned += 1
+
+
+def test_invalid_solutions_are_discarded(monkeypatch):
+    layers = [ds.Layer(i, 2, 1, i) for i in range(6)]
+    segments = [ds.Segment(i, 6, 10) for i in range(3)]
+
+    def broken(layers, segments, objective, edges=None):
+        # Every layer inside the first segment, beyond its memory.
+        return [ds.Allocation(segments[0], list(layers))], 0
+
+    monkeypatch.setattr(greedy, "solve_greedy", broken)
+    result = plan(layers, segments, engines=("greedy", "dp"), config=CONFIG)
+    assert result.outcomes["greedy"] == "INVALID"
+    assert result.engine == "dp" and result.status == "OPTIMAL"
+    _check(result, layers, segments, "output_size")
+    with pytest.raises(ValueError):
+        plan(layers, segments, engines=("greedy", "simplex"))
+
+
+def test_deadline_stops_the_search():
+    layers, segments = hard_instance()
+    result = plan(
+        layers, segments, deadline=0.5, engines=("greedy", "cp_sat"), config=CONFIG
+    )
+    # The search is still running at the deadline, the greedy solution is kept.
+    assert result.status == "FEASIBLE" and result.gap > 0
+    assert 0.5 <= result.wall_time < 1.0
+    assert result.engine == "greedy" and result.outcomes["cp_sat"] == "CANCELLED"
+    _check(result, layers, segments, "output_size")
+    # The search thread ends soon after being stopped.
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and not thread.daemon:
+            thread.join(timeout=1.0)
+            assert not thread.is_alive()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+import src.data_structures as ds
+from src.presolve import InfeasibleLayerError, segment_windows
+from tests.helpers import random_instance
+
+
+def _placements(layers, segments) -> np.ndarray:
+    """The (layers x segments) mask of the placements of all the solutions, by
+    enumerating the segment of each layer: the first layer in the first segment,
+    and each next layer in the same segment or the next one."""
+    num_layers, num_segments = len(layers), len(segments)
+    memory = ds.column(layers, "memory")
+    runtime = ds.column(layers, "runtime")
+    placed = np.zeros((num_layers, num_segments), dtype=bool)
+    for steps in itertools.product((0, 1), repeat=num_layers - 1):
+        segment_of = np.cumsum((0,) + steps)
+        if segment_of[-1] >= num_segments:
+            continue
+        if all(
+            memory[segment_of == s].sum() <= segments[s].avail_memory
+            and runtime[segment_of == s].sum() <= segments[s].avail_time
+            for s in range(segment_of[-1] + 1)
+        ):
+            placed[np.arange(num_layers), segment_of] = True
+    return placed
+
+
+def test_windows_match_exhaustive_enumeration():
+    rng = random.Random(0)
+    feasible = exact = 0
+    for _ in range(300):
+        layers, segments, _ = random_instance(rng, 8, 5)
+        placed = _placements(layers, segments)
+        try:
+            windows = segment_windows(layers, segments)
+        except InfeasibleLayerError as error:
+            # The presolve only fails without any solution, e.g., at a layer which
+            # fits in no segment, or which the segments cannot reach.
+            assert not placed.any()
+            l = layers.index(error.layer)
+            if "alone" in str(error):
+                assert not _placements(layers[l : l + 1], segments).any()
+            elif "up to it" in str(error):
+                assert not _placements(layers[: l + 1], segments).any()
+            continue
+        if not placed.any():
+            continue
+        # Every placement of a solution is allowed, inside the bounds.
+        assert (windows.allowed | ~placed).all()
+        segment = np.arange(len(segments))
+        assert (
+            np.where(placed, segment, len(segments)).min(axis=1) >= windows.earliest
+        ).all()
+        assert (np.where(placed, segment, -1).max(axis=1) <= windows.latest).all()
+        assert windows.size() == len(windows.pairs())
+        feasible += 1
+        exact += (windows.allowed == placed).all()
+    # The windows are seldom looser than the placements.
+    assert feasible >= 100 and exact >= 0.8 * feasible
+
+
+@pytest.mark.parametrize(
+    "memory, runtime, avail_memory, reason",
+    [
+        # Layer 12 does not fit in any segment alone, the layers before it have
+        # no window either.
+        ([1, 1, 9, 1, 1], [1] * 5, [4, 4, 4], "it does not fit in any segment alone"),
+        ([1] * 5, [1, 1, 20, 1, 1], [4, 4, 4], "it does not fit in any segment alone"),
+        # The layers up to 12 need more than all the segments.
+        ([3, 3, 3, 1, 1], [1] * 5, [4, 4], "the layers up to it exceed"),
+    ],
+)
+def test_infeasible_layer_is_named(memory, runtime, avail_memory, reason):
+    # The ids of the layers are not their positions.
+    layers = [
+        ds.Layer(10 + l, m, t, 1) for l, (m, t) in enumerate(zip(memory, runtime))
+    ]
+    segments = [ds.Segment(s, size, 10) for s, size in enumerate(avail_memory)]
+    with pytest.raises(InfeasibleLayerError) as error:
+        segment_windows(layers, segments)
+    assert error.value.layer is layers[2] and error.value.status == "INFEASIBLE"
+    assert str(error.value).startswith("Layer 12 cannot be placed in any segment")
+    assert reason in str(error.value)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import pickle
+
+import numpy as np
+import pytest
+
+import src.data_structures as ds
+import src.profiles as profiles
+
+
+def _profile(num_layers: int = 7):
+    """A profile in the pickle layout, with fractional MB values."""
+    rng = np.random.default_rng(0)
+    return {
+        "layers_mem": rng.uniform(0, 4, num_layers).tolist(),
+        "layers_params": rng.integers(0, 1000, num_layers).tolist(),
+        "layers_runtime": rng.integers(0, 20, num_layers).tolist(),
+        "layers_out_size": rng.uniform(0, 2, num_layers).tolist(),
+    }
+
+
+def _rows(table: ds.LayerTable):
+    return table.data.tolist()
+
+
+@pytest.mark.parametrize("name, compressed", [("p.npy", False), ("p.npz", True)])
+def test_convert_pickle_round_trips(tmp_path, name, compressed):
+    source, destination = str(tmp_path / "p.pkl"), str(tmp_path / name)
+    with open(source, "wb") as file:
+        pickle.dump(_profile(), file)
+    table = profiles.convert_pickle(source, destination, compressed)
+    expected = ds.LayerTable.from_profile(_profile())
+    assert _rows(table) == _rows(expected)
+    assert _rows(profiles.load_profile(destination)) == _rows(expected)
+    assert _rows(profiles.load_profile(source)) == _rows(expected)
+    # The pickle layout is converted like `ds.parse_layer_data`.
+    assert [layer.memory for layer in ds.parse_layer_data(source)] == [
+        ds.megabytes_to_bytes(mb) for mb in _profile()["layers_mem"]
+    ]
+
+
+def test_npy_profiles_are_memory_mapped(tmp_path):
+    path = str(tmp_path / "p.npy")
+    table = ds.LayerTable.from_profile(_profile())
+    profiles.save_profile(path, table)
+    mapped = profiles.load_profile(path)
+    assert isinstance(mapped.data, np.memmap) and not mapped.data.flags.writeable
+    assert not isinstance(profiles.load_profile(path, mmap=False).data, np.memmap)
+    assert _rows(mapped) == _rows(table)
+
+
+def test_edges_and_errors(tmp_path):
+    table = ds.LayerTable.from_profile(_profile())
+    edges = np.array([[0, 3], [2, 5]])
+    path = str(tmp_path / "p.npz")
+    profiles.save_profile(path, table, edges=edges)
+    assert profiles.load_edges(path).tolist() == edges.tolist()
+    profiles.save_profile(path, table)
+    assert profiles.load_edges(path) is None
+    with pytest.raises(ValueError):
+        profiles.save_profile(str(tmp_path / "p.npy"), table, edges=edges)
+    with pytest.raises(ValueError):
+        profiles.save_profile(str(tmp_path / "p.bin"), table)
+    with pytest.raises(ValueError):
+        profiles.load_profile(str(tmp_path / "p.bin"))
+    # A structured array with other columns is not a profile.
+    other = str(tmp_path / "other.npy")
+    np.save(other, np.zeros(3, dtype=[("id", np.int64)]))
+    with pytest.raises(ValueError):
+        profiles.load_profile(other)
+
+
+def test_streaming_readers(tmp_path):
+    profile = _profile(10)
+    expected = _rows(ds.LayerTable.from_profile(profile))
+    csv, jsonl = str(tmp_path / "p.csv"), str(tmp_path / "p.jsonl")
+    with open(csv, "w") as file:
+        file.write(",".join(profiles.PICKLE_COLUMNS) + "\n")
+        for row in zip(*(profile[key] for key in profiles.PICKLE_COLUMNS)):
+            file.write(",".join(repr(value) for value in row) + "\n")
+    with open(jsonl, "w") as file:
+        for layer in ds.LayerTable.from_profile(profile).data:
+            row = {name: int(layer[name]) for name in ds.LAYER_DTYPE.names}
+            file.write(json.dumps(row) + "\n")
+    for reader, path in ((profiles.iter_csv, csv), (profiles.iter_jsonl, jsonl)):
+        chunks = list(reader(path, chunk_rows=4))
+        # The identifiers continue across the chunks.
+        assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+        assert sum((_rows(chunk) for chunk in chunks), []) == expected
+        assert _rows(profiles.load_profile(path)) == expected
+
+
+def test_missing_profiles_do_not_block(tmp_path, monkeypatch):
+    monkeypatch.setattr("builtins.input", pytest.fail)
+    assert ds.parse_layer_data(str(tmp_path / "missing.pkl")) == []
+    with pytest.raises(OSError):
+        profiles.load_profile(str(tmp_path / "missing.npy"))
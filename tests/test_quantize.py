@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+import numpy as np
+import pytest
+
+import src.data_structures as ds
+import src.optimizer as opt
+import src.validation as validation
+from src.quantize import Quantization
+from tests.helpers import CONFIG, random_instance
+
+
+def _random_instance(rng: random.Random, scale: int):
+    """A small random problem, whose values are multiples of `scale` plus some
+    noise (in about half of the problems)."""
+    noise = rng.choice([0, scale // 2])
+    draw = lambda low, high: rng.randint(low, high) * scale + rng.randint(0, noise)
+    layers, segments, _ = random_instance(rng, 8, 4, draw=draw)
+    return layers, segments
+
+
+def _solve(layers, segments, objective, quantization=None):
+    """The result of the model, or the status when there is no solution."""
+    try:
+        model = opt.LoScModel(layers, segments, "linear", quantization=quantization)
+        model.set_objective(objective)
+        return model.solve(CONFIG)
+    except ds.NoSolutionError as error:
+        return error.status
+
+
+def _value(result, layers, segments, objective):
+    """Checks the allocations against the exact values, and returns their
+    objective value."""
+    report = validation.validate(result.allocations, layers, segments)
+    assert report.valid, report.violations
+    value = (
+        len(result.allocations) if objective == "knapsack" else report.total_output_size
+    )
+    assert result.objective == pytest.approx(value)
+    return value
+
+
+def test_apply_rounds_conservatively_or_relaxed():
+    layers = [ds.Layer(0, 9, 7, 13)]
+    segments = [ds.Segment(0, 17, 15)]
+    quantization = Quantization(memory_unit=4, time_unit=2, output_unit=8)
+    quantized_layers, quantized_segments = quantization.apply(layers, segments)
+    assert quantized_layers.column("memory").tolist() == [3]
+    assert quantized_layers.column("runtime").tolist() == [4]
+    assert quantized_layers.column("output_size").tolist() == [2]
+    assert quantized_segments.column("avail_memory").tolist() == [4]
+    assert quantized_segments.column("avail_time").tolist() == [7]
+    relaxed_layers, relaxed_segments = quantization.relaxed().apply(layers, segments)
+    assert relaxed_layers.column("memory").tolist() == [2]
+    assert relaxed_layers.column("runtime").tolist() == [3]
+    assert relaxed_segments.column("avail_memory").tolist() == [5]
+    assert relaxed_segments.column("avail_time").tolist() == [8]
+
+
+@pytest.mark.parametrize("objective", opt.OBJECTIVES)
+def test_gcd_quantization_is_exact(objective):
+    rng = random.Random(0)
+    for _ in range(30):
+        layers, segments = _random_instance(rng, 8)
+        quantization = Quantization.fit(layers, segments)
+        assert quantization.exact_budgets and quantization.exact_objective
+        exact = _solve(layers, segments, objective)
+        quantized = _solve(layers, segments, objective, quantization)
+        if isinstance(exact, str):
+            assert quantized == exact
+            continue
+        assert quantized.status == "OPTIMAL" and quantized.error_bound == 0.0
+        assert _value(quantized, layers, segments, objective) == round(exact.objective)
+
+
+@pytest.mark.parametrize("objective", opt.OBJECTIVES)
+def test_coarse_quantization_is_bounded(objective):
+    rng = random.Random(1)
+    for _ in range(40):
+        layers, segments = _random_instance(rng, 8)
+        quantization = Quantization.fit(
+            layers,
+            segments,
+            memory_granularity=rng.choice([None, 8, 16]),
+            time_granularity=rng.choice([None, 8, 16]),
+            output_granularity=rng.choice([None, 16, 64]),
+        )
+        exact = _solve(layers, segments, objective)
+        quantized = _solve(layers, segments, objective, quantization)
+        if isinstance(quantized, str):
+            # The rounding may cut all the allocations off, that is not a proof.
+            expected = "INFEASIBLE" if quantization.exact_budgets else "UNKNOWN"
+            assert quantized == expected
+            continue
+        assert not isinstance(exact, str)
+        optimum = round(exact.objective)
+        value = _value(quantized, layers, segments, objective)
+        assert quantized.bound is not None and quantized.error_bound is not None
+        assert quantized.bound <= optimum + 1e-6
+        assert value - optimum <= quantized.error_bound + 1e-6
+        if quantized.status == "OPTIMAL" and quantized.error_bound == 0.0:
+            assert value == optimum
+
+
+def test_rounded_budget_keeps_a_bound():
+    # The memory budget of the segment is rounded from 10 to 8, cutting off the
+    # optimum, which places both layers in the first segment.
+    layers = [ds.Layer(0, 4, 1, 100), ds.Layer(1, 6, 1, 1)]
+    segments = [ds.Segment(0, 10, 10), ds.Segment(1, 8, 10)]
+    quantization = Quantization(memory_unit=4, exact_budgets=False)
+    result = _solve(layers, segments, "output_size", quantization)
+    assert result.status == "FEASIBLE"
+    assert result.objective == 101
+    assert result.bound == 1
+    assert result.error_bound == 100
+    assert result.gap == pytest.approx(100 / 101)
+    np.testing.assert_array_equal(
+        [len(allocation.layers) for allocation in result.allocations], [1, 1]
+    )
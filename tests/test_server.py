@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+import src.data_structures as ds
+import src.validation as validation
+from src.server import PlanningClient, PlanningServer, decode
+from tests.helpers import hard_instance
+
+
+def _request(layers, segments, **options):
+    return dict(
+        layers=[[l.memory, l.runtime, l.output_size] for l in layers],
+        segments=[[s.avail_memory, s.avail_time] for s in segments],
+        **options,
+    )
+
+
+def test_deadline_returns_incumbent_and_frees_the_slot():
+    layers, segments = hard_instance()
+
+    async def run():
+        server = PlanningServer(workers=1, threads=1)
+        try:
+            response = await server.handle(
+                _request(layers, segments, deadline=1.0, random_seed=0)
+            )
+            metrics = server.metrics.snapshot()
+            # The only worker is free again, a DP request is answered in time.
+            follow_up = await server.handle(
+                _request(layers, segments, engine="dp", deadline=1.0)
+            )
+        finally:
+            await server.close()
+        return response, metrics, follow_up
+
+    response, metrics, follow_up = asyncio.run(run())
+    assert response["status"] == "FEASIBLE"
+    assert response["objective"] is not None
+    allocations = decode(response, layers, segments)
+    report = validation.validate(allocations, layers, segments)
+    assert report.valid, report.violations
+    assert report.total_output_size == response["objective"]
+    assert metrics["running"] == 0 and metrics["queued"] == 0
+    assert follow_up["status"] == "OPTIMAL"
+    assert follow_up["objective"] <= response["objective"]
+
+
+def test_queued_past_the_deadline_expires():
+    layers, segments = hard_instance()
+
+    async def run():
+        server = PlanningServer(workers=1, threads=1)
+        try:
+            # The second request waits for the only worker until too late to solve.
+            return (
+                await asyncio.gather(
+                    server.handle(
+                        _request(layers, segments, deadline=1.0, random_seed=0)
+                    ),
+                    server.handle(
+                        _request(layers, segments, deadline=0.95, random_seed=1)
+                    ),
+                ),
+                server.metrics.snapshot(),
+            )
+        finally:
+            await server.close()
+
+    (first, second), metrics = asyncio.run(run())
+    assert first["status"] == "FEASIBLE"
+    assert second["status"] == "DEADLINE"
+    assert metrics["completed"] == 1 and metrics["expired"] == 1
+
+
+def test_identical_requests_share_a_solve():
+    layers, segments = hard_instance()
+    request = _request(layers, segments, time_limit=0.6, random_seed=0)
+
+    async def run():
+        server = PlanningServer(workers=2, threads=1)
+        try:
+            responses = await asyncio.gather(
+                server.handle(dict(request, id="a")),
+                server.handle(dict(request, id="b")),
+            )
+            return responses, server.metrics.snapshot()
+        finally:
+            await server.close()
+
+    (a, b), metrics = asyncio.run(run())
+    assert (a["id"], b["id"]) == ("a", "b")
+    assert a["status"] == b["status"] == "FEASIBLE"
+    assert a["blocks"] == b["blocks"] and a["wall_time"] == b["wall_time"]
+    assert metrics["coalesced"] == 1 and metrics["completed"] == 2
+
+
+def test_too_many_pending_solves_are_rejected():
+    layers, segments = hard_instance()
+
+    async def run():
+        server = PlanningServer(workers=1, max_pending=1, threads=1)
+        try:
+            responses = await asyncio.gather(
+                *(
+                    server.handle(
+                        _request(layers, segments, time_limit=0.6, random_seed=seed)
+                    )
+                    for seed in range(2)
+                )
+            )
+            return responses, server.metrics.snapshot()
+        finally:
+            await server.close()
+
+    responses, metrics = asyncio.run(run())
+    statuses = sorted(response["status"] for response in responses)
+    assert statuses == ["FEASIBLE", "OVERLOADED"]
+    assert metrics["rejected"] == 1 and metrics["completed"] == 1
+
+
+def test_tcp_round_trip():
+    layers = [ds.Layer(l, 2, 1, 10 - l) for l in range(8)]
+    segments = [ds.Segment(s, 6, 10) for s in range(4)]
+
+    async def run():
+        server = PlanningServer(workers=2, threads=1)
+        host, port = await server.start_tcp()
+        client = await PlanningClient.connect_tcp(host, port)
+        try:
+            # Pipelined requests, each matched to its response.
+            responses = await asyncio.gather(
+                client.plan(layers, segments, engine="dp"),
+                client.plan(layers, segments, "knapsack", deadline=5.0),
+                client.request(dict(layers=[[1, 2]], segments=[])),
+            )
+            return responses, await client.metrics()
+        finally:
+            await client.close()
+            await server.close()
+
+    (dp, knapsack, malformed), metrics = asyncio.run(run())
+    for response, objective in ((dp, "output_size"), (knapsack, "knapsack")):
+        assert response["status"] == "OPTIMAL"
+        allocations = decode(response, layers, segments)
+        report = validation.validate(allocations, layers, segments)
+        assert report.valid, report.violations
+        value = (
+            len(allocations) if objective == "knapsack" else report.total_output_size
+        )
+        assert response["objective"] == value
+    assert malformed["status"] == "ERROR"
+    assert metrics["received"] == 3 and metrics["failed"] == 1
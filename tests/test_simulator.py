@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+import src.data_structures as ds
+from src.simulator import Timeline, compare, simulate, uniform_jitter
+
+
+def _random_plan(rng: random.Random):
+    """A random plan over random segments, some skipped, with skip edges,
+    feasible or not."""
+    num_layers = rng.randint(1, 12)
+    layers = [
+        ds.Layer(i, rng.randint(0, 6), rng.randint(0, 4), rng.randint(0, 9))
+        for i in range(num_layers)
+    ]
+    cuts = sorted(rng.sample(range(1, num_layers), min(num_layers - 1, 3)))
+    bounds = [0] + cuts + [num_layers]
+    segments = [
+        ds.Segment(i, rng.randint(0, 30), rng.randint(0, 15))
+        for i in range(len(bounds) - 1 + rng.randint(0, 2))
+    ]
+    used = sorted(rng.sample(range(len(segments)), len(bounds) - 1))
+    allocations = [
+        ds.Allocation(segments[s], layers[start:end])
+        for s, start, end in zip(used, bounds, bounds[1:])
+    ]
+    edges = np.array(
+        [
+            (producer, consumer)
+            for producer in range(num_layers)
+            for consumer in range(producer + 2, num_layers)
+            if rng.random() < 0.2
+        ],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    return layers, segments, allocations, edges
+
+
+def _replay(allocations, segments, timeline, arrivals, runtimes):
+    """Replays the stream one segment at a time, for the given layer runtimes
+    (inferences x layers)."""
+    finish, overruns = [], 0
+    cycle, end = -1, -math.inf
+    for arrival, runtime in zip(arrivals, runtimes):
+        earliest = math.ceil((arrival - timeline.start[0]) / timeline.period)
+        cycle = max(earliest, 0, cycle + 1)
+        layer = 0
+        for allocation in allocations:
+            k = segments.index(allocation.segment)
+            window = cycle * timeline.period + timeline.start[k]
+            length = len(allocation.layers)
+            end = max(window, end) + sum(runtime[layer : layer + length])
+            overruns += end > window + timeline.length[k]
+            layer += length
+        finish.append(end)
+    return finish, overruns
+
+
+def _peaks(layers, allocations, edges, input_size):
+    """The peak memory and held output, from the tensors live after each layer."""
+    last_use = {l: l + 1 for l in range(len(layers))}
+    for producer, consumer in edges.tolist():
+        last_use[producer] = max(last_use[producer], consumer)
+    held = [
+        sum(layers[p].output_size for p in range(l + 1) if last_use[p] > l)
+        for l in range(len(layers))
+    ]
+    peak, peak_held, l = 0, 0, 0
+    for allocation in allocations:
+        memory = sum(layer.memory for layer in allocation.layers)
+        for layer in allocation.layers:
+            live = input_size if l == 0 else held[l - 1]
+            peak = max(peak, memory + live + layer.output_size)
+            l += 1
+        peak_held = max(peak_held, held[l - 1])
+    return peak, peak_held
+
+
+def test_simulate_matches_replay():
+    rng = random.Random(0)
+    for _ in range(100):
+        layers, segments, allocations, edges = _random_plan(rng)
+        timeline = Timeline.from_segments(segments, gap=rng.choice([0.0, 2.5]))
+        num_inferences, samples = rng.randint(1, 6), rng.randint(1, 3)
+        # Late, early, and bursty arrivals.
+        arrivals = np.sort(
+            [rng.uniform(-5, 3 * timeline.period + 1) for _ in range(num_inferences)]
+        )
+        factors = np.random.default_rng(0).uniform(
+            0.5, 2.0, (samples, num_inferences, len(layers))
+        )
+        result = simulate(
+            allocations,
+            segments,
+            arrivals=arrivals,
+            timeline=timeline,
+            jitter=lambda generator, shape: factors[: shape[0]],
+            samples=samples,
+            input_size=3,
+            edges=edges,
+        )
+        runtime = np.array([layer.runtime for layer in layers], dtype=np.float64)
+        for sample in range(samples):
+            finish, overruns = _replay(
+                allocations, segments, timeline, arrivals, runtime * factors[sample]
+            )
+            np.testing.assert_allclose(result.finish[sample], finish)
+            np.testing.assert_allclose(result.latency[sample], finish - arrivals)
+            assert result.overruns[sample] == overruns
+        assert (result.peak_memory, result.peak_held_output) == _peaks(
+            layers, allocations, edges, 3
+        )
+
+
+def test_default_stream_and_errors():
+    layers = [ds.Layer(i, 1, 2, 1) for i in range(4)]
+    segments = [ds.Segment(0, 10, 5), ds.Segment(1, 10, 5)]
+    allocations = [
+        ds.Allocation(segments[0], layers[:2]),
+        ds.Allocation(segments[1], []),
+        ds.Allocation(segments[1], layers[2:]),
+    ]
+    timeline = Timeline.from_segments(segments, gap=1.0)
+    assert timeline.start.tolist() == [0.0, 6.0] and timeline.period == 12.0
+    # One inference per cycle, the empty allocation is skipped.
+    result = simulate(allocations, segments, num_inferences=3, timeline=timeline)
+    assert result.finish.tolist() == [[10.0, 22.0, 34.0]]
+    assert result.latency.tolist() == [[10.0, 10.0, 10.0]]
+    assert result.overruns.tolist() == [0]
+    summary = simulate(
+        allocations,
+        segments,
+        num_inferences=3,
+        jitter=uniform_jitter(0.5),
+        samples=4,
+    ).summary()
+    assert summary["latency_max"] <= 1.5 * 8 + 5
+    frame = compare({"plan": allocations}, segments, num_inferences=2)
+    assert list(frame.index) == ["plan"] and frame.loc["plan", "latency_max"] == 9.0
+    with pytest.raises(ValueError):
+        simulate([ds.Allocation(segments[0], [])], segments)
+    with pytest.raises(ValueError):
+        simulate(allocations * 2, segments)
+
+
+def test_skipped_segments_keep_their_window():
+    layers = [ds.Layer(i, 1, 2, 1) for i in range(4)]
+    segments = [ds.Segment(s, 10, 5) for s in range(3)]
+    timeline = Timeline.from_segments(segments)
+    # The plan skips the segment 1, the table holds copies of the segments.
+    for schedule in (segments, ds.SegmentTable.from_segments(segments)):
+        plan = [
+            ds.Allocation(schedule[0], layers[:2]),
+            ds.Allocation(schedule[2], layers[2:]),
+        ]
+        result = simulate(plan, segments, num_inferences=2, timeline=timeline)
+        assert result.finish.tolist() == [[14.0, 29.0]]
+        assert result.overruns.tolist() == [0]
+    with pytest.raises(ValueError):
+        simulate([ds.Allocation(ds.Segment(3, 10, 5), layers)], segments)
+    with pytest.raises(ValueError):
+        simulate(plan[::-1], segments)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import dataclasses
+
+import pytest
+
+import src.data_structures as ds
+import src.optimizer as opt
+from tests.helpers import CONFIG, hard_instance
+
+
+def _model(layers, segments):
+    # Without presolve, an infeasible problem reaches the search.
+    model = opt.LoScModel(
+        layers, segments, "linear", presolve=False, output_encoding="linear"
+    )
+    model.set_objective("output_size")
+    return model
+
+
+def test_stats_of_a_search():
+    layers, segments = hard_instance()
+    model = _model(layers, segments)
+    sink, solutions = [], []
+    config = dataclasses.replace(
+        CONFIG,
+        time_limit=1.0,
+        stats_sink=sink.append,
+        solution_callback=lambda *solution: solutions.append(solution),
+    )
+    result = model.solve(config)
+    stats = result.stats
+    assert sink == [stats] and stats.status == result.status == "FEASIBLE"
+    assert (stats.num_layers, stats.num_segments) == (len(layers), len(segments))
+    # Every variable and constraint belongs to a family.
+    proto = model.model.Proto()
+    assert sum(stats.variables.values()) == len(proto.variables)
+    assert sum(stats.constraints.values()) == len(proto.constraints)
+    assert set(stats.build_times) == set(stats.variables)
+    assert sum(stats.build_times.values()) <= stats.build_time
+    # The progress is ordered, on a single clock.
+    times, objectives, bounds = zip(*stats.progress)
+    assert list(times) == sorted(times) and times[-1] <= stats.solve_time
+    assert [b for b in bounds if b is not None] == sorted(b for b in bounds if b)
+    found = [o for o in objectives if o is not None]
+    assert found and found == sorted(found, reverse=True)
+    assert found[-1] == result.objective and bounds[-1] <= result.objective
+    # The solutions are those of the progress.
+    assert [(t, o, b) for o, b, t in solutions] == [
+        entry
+        for k, entry in enumerate(stats.progress)
+        if entry[1] is not None and (k == 0 or entry[1] != stats.progress[k - 1][1])
+    ]
+
+
+@pytest.mark.parametrize(
+    "instance, time_limit, status",
+    [
+        # Infeasible once the layers share the segments.
+        (
+            ([ds.Layer(l, 4, 1, 1) for l in range(3)], [ds.Segment(0, 10, 9)]),
+            None,
+            "INFEASIBLE",
+        ),
+        (hard_instance(), 0.01, "UNKNOWN"),
+    ],
+)
+def test_stats_are_reported_on_failure(instance, time_limit, status):
+    sink = []
+    model = _model(*instance)
+    config = dataclasses.replace(CONFIG, time_limit=time_limit, stats_sink=sink.append)
+    with pytest.raises(ds.NoSolutionError) as error:
+        model.solve(config)
+    assert error.value.status == status
+    assert [stats.status for stats in sink] == [status]
+    assert sink[0].solve_time > 0 and sum(sink[0].variables.values()) > 0
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+import numpy as np
+import pytest
+
+import src.data_structures as ds
+import src.validation as validation
+from src.tenants import Tenant, plan_tenants
+from tests.helpers import random_layers, random_segments
+
+
+def _contended(first: int, second: int):
+    """Two networks which both fit inside the first segment only, the second one
+    storing more when split."""
+    segments = [ds.Segment(0, 12, 100), ds.Segment(1, 6, 100), ds.Segment(2, 6, 100)]
+    tenants = [
+        Tenant("light", [ds.Layer(0, 6, 1, 1), ds.Layer(1, 6, 1, 0)], first),
+        Tenant("heavy", [ds.Layer(0, 6, 1, 9), ds.Layer(1, 6, 1, 0)], second),
+    ]
+    return tenants, segments
+
+
+def _random_instance(rng: random.Random):
+    """A few small random networks with two priority levels, feasible or not."""
+    segments = random_segments(rng, rng.randint(2, 5), (5, 25), (5, 15))
+    tenants = [
+        Tenant(
+            f"network{t}",
+            random_layers(rng, rng.randint(1, 6), (1, 6), (1, 4)),
+            priority=rng.randint(0, 1),
+        )
+        for t in range(rng.randint(2, 3))
+    ]
+    return tenants, segments
+
+
+def _classes(plan, tenants):
+    """The stored output of each priority class, from the highest one."""
+    priorities = sorted({tenant.priority for tenant in tenants}, reverse=True)
+    return tuple(
+        sum(plan.stored_output[t.name] for t in tenants if t.priority == p)
+        for p in priorities
+    )
+
+
+def test_same_priority_networks_trade():
+    tenants, segments = _contended(0, 0)
+    # The light network is placed first, then gives way to the heavy one.
+    assert plan_tenants(tenants, segments, max_rounds=0).objective == 9
+    plan = plan_tenants(tenants, segments)
+    assert plan.stored_output == {"light": 1, "heavy": 0}
+
+
+@pytest.mark.parametrize("first, second", [(1, 0), (0, 1)])
+def test_higher_priority_keeps_its_placement(first, second):
+    tenants, segments = _contended(first, second)
+    plan = plan_tenants(tenants, segments)
+    high, low = ("light", "heavy") if first > second else ("heavy", "light")
+    # The total would be smaller if the light network gave way.
+    assert plan.stored_output[high] == 0 and plan.stored_output[low] > 0
+    assert [a.segment.id for a in plan.allocations[high]] == [0]
+
+
+def test_plans_are_valid_and_never_worsen_a_higher_class():
+    rng = random.Random(0)
+    planned = 0
+    while planned < 100:
+        tenants, segments = _random_instance(rng)
+        try:
+            first = plan_tenants(tenants, segments, max_rounds=0)
+        except ds.NoSolutionError:
+            continue
+        plan = plan_tenants(tenants, segments)
+        assert _classes(plan, tenants) <= _classes(first, tenants)
+        assert plan.bound <= plan.objective
+        used_memory = np.zeros(len(segments), dtype=np.int64)
+        used_time = np.zeros(len(segments), dtype=np.int64)
+        for tenant in tenants:
+            allocations = plan.allocations[tenant.name]
+            used = [allocation.segment for allocation in allocations]
+            report = validation.validate(allocations, tenant.layers, used)
+            assert report.valid, report.violations
+            assert report.total_output_size == plan.stored_output[tenant.name]
+            for allocation in allocations:
+                s = allocation.segment.id
+                used_memory[s] += sum(layer.memory for layer in allocation.layers)
+                used_time[s] += sum(layer.runtime for layer in allocation.layers)
+        # The combined usage fits inside the shared budgets.
+        assert np.array_equal(plan.used_memory, used_memory)
+        assert np.array_equal(plan.used_time, used_time)
+        assert np.all(used_memory <= ds.column(segments, "avail_memory"))
+        assert np.all(used_time <= ds.column(segments, "avail_time"))
+        planned += 1
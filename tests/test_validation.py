@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+import numpy as np
+
+import src.data_structures as ds
+import src.graph as graph
+from src.validation import validate, validate_batch
+
+LAYERS = [ds.Layer(i, 2, 1, 10 * (i + 1)) for i in range(6)]
+SEGMENTS = [ds.Segment(i, 6, 3) for i in range(3)]
+
+
+def _plan(*cuts):
+    """The allocations of the layers [0, c1), [c1, c2), ... to the first segments."""
+    bounds = (0,) + cuts + (len(LAYERS),)
+    return [
+        ds.Allocation(SEGMENTS[s], LAYERS[start:end])
+        for s, (start, end) in enumerate(zip(bounds, bounds[1:]))
+    ]
+
+
+def test_valid_plan_metrics():
+    report = validate(_plan(3), LAYERS, SEGMENTS)
+    assert report.valid and report.violations == []
+    assert report.segment_id.tolist() == [0, 1]
+    assert report.num_layers.tolist() == [3, 3]
+    assert report.used_memory.tolist() == [6, 6]
+    assert report.time_slack.tolist() == [0, 0]
+    assert report.split_point.tolist() == [2, 5]
+    assert report.stored_output.tolist() == [30, 60]
+    assert report.total_output_size == 90
+    assert report.memory_utilisation.tolist() == [1.0, 1.0]
+    assert list(report.to_frame().columns)[:3] == [
+        "segment_id",
+        "num_layers",
+        "used_memory",
+    ]
+
+
+def test_violations_are_flagged():
+    # Over budget, both in memory and in time.
+    report = validate(_plan(4), LAYERS, SEGMENTS)
+    assert not report.valid and len(report.violations) == 2
+    assert report.memory_slack.tolist() == [-2, 2]
+    # A missing layer, and a duplicated one.
+    for blocks in ([0, 1, 3], [4, 5]), ([0, 1, 2], [2, 3, 4], [5]):
+        plan = [
+            ds.Allocation(segment, [LAYERS[l] for l in layers])
+            for segment, layers in zip(SEGMENTS, blocks)
+        ]
+        assert validate(plan, LAYERS).violations == [
+            "The layers are not placed once each, in execution order"
+        ]
+    # Swapped layers.
+    swapped = [LAYERS[1], LAYERS[0]] + LAYERS[2:3]
+    plan = [ds.Allocation(SEGMENTS[0], swapped)] + _plan(3)[1:]
+    assert not validate(plan, LAYERS).valid
+    assert validate(plan).violations == ["The layer identifiers do not increase"]
+    # The used segments are not the first ones.
+    plan = [
+        ds.Allocation(SEGMENTS[0], LAYERS[:3]),
+        ds.Allocation(SEGMENTS[2], LAYERS[3:]),
+    ]
+    assert validate(plan, LAYERS).valid
+    assert validate(plan, LAYERS, SEGMENTS).violations == [
+        "Segment 2 is used in place of the segment in position 1"
+    ]
+
+
+def test_empty_allocations():
+    plan = _plan(3)
+    plan.insert(1, ds.Allocation(SEGMENTS[1], []))
+    plan[2] = ds.Allocation(SEGMENTS[2], LAYERS[3:])
+    report = validate(plan, LAYERS)
+    assert report.valid
+    assert report.split_point.tolist() == [2, ds.COLUMN_NO_ID, 5]
+    assert report.stored_output.tolist() == [30, 0, 60]
+    # An empty segment counts as unused.
+    assert not validate(plan, LAYERS, SEGMENTS).valid
+
+
+def test_skip_edges_are_stored():
+    edges = np.array([[0, 4], [1, 3]])
+    report = validate(_plan(2, 4), LAYERS, SEGMENTS, edges)
+    assert report.valid
+    costs = graph.split_costs(LAYERS, edges)
+    assert report.stored_output.tolist() == [costs[1], costs[3], costs[5]]
+    # Layers 0 and 1 are consumed after the first split, layer 0 after the second.
+    assert report.stored_output.tolist() == [10 + 20, 10 + 40, 60]
+
+
+def test_batch_matches_single_plans():
+    rng = random.Random(0)
+    plans = []
+    for _ in range(50):
+        cuts = sorted(rng.sample(range(1, len(LAYERS)), rng.randint(0, 2)))
+        plan = _plan(*cuts)
+        if rng.random() < 0.3:
+            # Drop a layer.
+            a = rng.randrange(len(plan))
+            plan[a] = ds.Allocation(plan[a].segment, plan[a].layers[1:])
+        plans.append(plan)
+    plans.append([])
+    for edges in (None, np.array([[0, 3], [2, 5]])):
+        reports = validate_batch(plans, LAYERS, SEGMENTS, edges)
+        for plan, report in zip(plans, reports):
+            single = validate(plan, LAYERS, SEGMENTS, edges)
+            assert report.violations == single.violations
+            assert report.stored_output.tolist() == single.stored_output.tolist()
+            assert report.used_time.tolist() == single.used_time.tolist()
+    assert validate_batch([[]], LAYERS)[0].violations == [
+        "The layers are not placed once each, in execution order"
+    ]